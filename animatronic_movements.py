@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import List, Optional, Callable, Any
+from typing import List, Optional, Callable, Any, Dict, Tuple
 from pydispatch import dispatcher
 from midi import MIDI
 import time
@@ -51,16 +51,46 @@ class MovementStruct:
 	key_is_pressed: bool = False  # Tracks if the key is currently pressed
 	pin1_time: float = 0  # Timer for output_pin1
 	pin2_time: float = 0  # Timer for output_pin2
+	open_lead_time: float = 0  # Seconds the valve takes to act on a press; commands are issued this much early
+	close_lead_time: float = 0  # Seconds the valve takes to act on a release
+
+class MovementTimeline:
+	"""
+	Runs a scripted sequence of movements against nominal times, issuing each command
+	early by its valve lead time so the movement lands when the script intended. If a stop
+	event is given, setting it cuts the current wait short and every later command is skipped.
+	"""
+	def __init__(self, movements: Any, stop_event: Optional[threading.Event] = None) -> None:
+		self.movements = movements
+		self.stop_event = stop_event
+		self.start_time: float = time.monotonic()
+		self.elapsed: float = 0  # Nominal time of the next command, relative to start_time
+
+	def sleep(self, seconds: float) -> None:
+		# Advance nominal time; the real waiting happens in execute() so it can be shortened by the lead time.
+		self.elapsed += seconds
+
+	def execute(self, key: str, val: int) -> bool:
+		issue_time = self.start_time + self.elapsed - self.movements.get_lead_time(key, val)
+		delay = issue_time - time.monotonic()
+		if self.stop_event is None:
+			if delay > 0:
+				time.sleep(delay)
+		elif self.stop_event.wait(max(0.0, delay)):
+			# Stopped while waiting: the command belongs to an animation that has ended.
+			return False
+		return self.movements.execute_movement(key, val)
 
 class Movement:
 	all: List[MovementStruct] = []
 
-	def __init__(self, gpio: Any) -> None:
+	def __init__(self, gpio: Any, midi: Optional[Any] = None) -> None:
 		self.b_mirrored: bool = False  # Swap left/right body movement to mirror animation
 		self.b_retro_mode_active: bool = False  # Retro mode disables any movement not part of the original Pasqually
 		self.gpio = gpio
-		self.midi = MIDI()
+		self.midi = midi if midi is not None else MIDI()
 		self.b_thread_started: bool = False
+		self.journal: Optional[Any] = None  # Records writes made here directly (animations), which skip the input arbiter
 
 		# Define movements
 		self.right_shoulder = MovementStruct()
@@ -217,6 +247,7 @@ class Movement:
 		self.all.append(self.body_lean_back)
 
 		self.animation_threads_active: bool = False
+		self.animation_stop = threading.Event()  # Set with animation_threads_active cleared, to wake animations mid-wait
 		self.blink_animation_thread: Optional[threading.Thread] = None  # Random blinking thread
 		self.eye_left_right_animation_thread: Optional[threading.Thread] = None  # Eye left/right animation thread
 		self.mustache_animation_thread: Optional[threading.Thread] = None  # Mustache animation thread
@@ -294,6 +325,29 @@ class Movement:
 			full_string += midi_note_str + "00" + ","
 		return full_string
 
+	def set_lead_times(self, lead_times: Dict[str, Tuple[float, float]]) -> None:
+		"""Set (open, close) valve lead times in seconds, keyed by each movement's original key."""
+		for movement in self.all:
+			if movement.key in lead_times:
+				movement.open_lead_time, movement.close_lead_time = lead_times[movement.key]
+
+	def get_lead_time(self, key: str, val: int) -> float:
+		for movement in self.all:
+			if movement.key == key and key:
+				if movement.linked_keys:
+					return max(self.get_lead_time(linked_key, val) for linked_key in movement.linked_keys)
+				return movement.open_lead_time if val else movement.close_lead_time
+		return 0
+
+	def get_lead_times(self) -> Dict[str, Tuple[float, float]]:
+		return {movement.key: (self.get_lead_time(movement.key, 1), self.get_lead_time(movement.key, 0)) for movement in self.all}
+
+	def get_midi_lead_time(self, midi_note: int, val: int) -> float:
+		for movement in self.all:
+			if movement.midi_note == midi_note:
+				return self.get_lead_time(movement.key, val)
+		return 0
+
 	def get_all_movement_info(self) -> List[List[Any]]:
 		all_movements = []
 		for movement in self.all:
@@ -318,7 +372,14 @@ class Movement:
 	def set_pin(self, pin: List[Any], val: int, movement: MovementStruct) -> None:
 		self.gpio.set_pin_from_address(pin[0], pin[1], val)
 
-	def execute_movement(self, key: str, val: int, b_mute_midi: bool = False) -> bool:
+	def is_key_pressed(self, key: str) -> bool:
+		for movement in self.all:
+			if movement.key == key and key:
+				return movement.key_is_pressed
+		return False
+
+	def execute_movement(self, key: str, val: int, b_mute_midi: bool = False, b_journal: bool = True) -> bool:
+		"""b_journal is cleared by callers whose input is already journalled (the input arbiter and show notes)."""
 		b_do_callback = False
 		for movement in self.all:
 			if movement.key == key and key:
@@ -329,9 +390,11 @@ class Movement:
 					movement.key_is_pressed = False
 					b_do_callback = True
 				if b_do_callback:
+					if b_journal and self.journal:
+						self.journal.record_direct(key, val)
 					if movement.linked_keys:
 						for linked_key in movement.linked_keys:
-							self.execute_movement(linked_key, val, b_mute_midi)
+							self.execute_movement(linked_key, val, b_mute_midi, False)
 						return True
 					if not b_mute_midi:
 						self.midi.send_message(movement.midi_note, val)
@@ -364,7 +427,7 @@ class Movement:
 	def execute_midi_note(self, midi_note: int, val: int) -> None:
 		for movement in self.all:
 			if movement.midi_note == midi_note:
-				self.execute_movement(movement.key, val, True)
+				self.execute_movement(movement.key, val, True, False)
 				break
 
 	def set_retro_mode(self, b_enable: bool) -> None:
@@ -374,8 +437,13 @@ class Movement:
 			if not movement.b_is_original_movement:
 				self.execute_movement(movement.key, 0)
 
+	def start_animation_threads(self) -> None:
+		self.animation_threads_active = True
+		self.animation_stop.clear()
+
 	def stop_all_animation_threads(self) -> None:
 		self.animation_threads_active = False
+		self.animation_stop.set()
 		def anim_shutdown() -> None:
 			self.execute_movement(self.head_nod.key, 1)
 			self.execute_movement(self.mustache.key, 0)
@@ -386,6 +454,7 @@ class Movement:
 				self.execute_movement(self.eyes_blink_full.key, 0)
 				self.execute_movement(self.eyes_left.key, 0)
 				self.execute_movement(self.eyes_right.key, 0)
+				self.execute_movement(self.head_right.key, 0)
 				self.execute_movement(self.head_left.key, 1)
 				time.sleep(1)
 				self.execute_movement(self.head_left.key, 0)
@@ -393,74 +462,83 @@ class Movement:
 
 	def play_wakeword_acknowledgement(self) -> None:
 		def mustache_shake() -> None:
+			timeline = MovementTimeline(self)
 			self.execute_movement(self.head_nod.key, 0)
-			self.execute_movement(self.mustache.key, 1)
-			time.sleep(0.2)
-			self.execute_movement(self.mustache.key, 0)
-			time.sleep(0.2)
-			self.execute_movement(self.mustache.key, 1)
-			time.sleep(0.2)
-			self.execute_movement(self.mustache.key, 0)
+			timeline.execute(self.mustache.key, 1)
+			timeline.sleep(0.2)
+			timeline.execute(self.mustache.key, 0)
+			timeline.sleep(0.2)
+			timeline.execute(self.mustache.key, 1)
+			timeline.sleep(0.2)
+			timeline.execute(self.mustache.key, 0)
 			time.sleep(0.2)
 		self.mustache_animation_thread = threading.Thread(target=mustache_shake, daemon=True)
 		self.mustache_animation_thread.start()
 
 	def play_blink_animation(self) -> None:
-		self.animation_threads_active = True
+		# Several voice events can start the same animation in a row; one thread per animation is enough.
+		if self.blink_animation_thread and self.blink_animation_thread.is_alive():
+			return
+		self.start_animation_threads()
 		max_time_between_blinks = 3  # Seconds
 		dispatcher.send(signal="keyEvent", key=self.head_nod.key, val=0)
 		def blink() -> None:
+			timeline = MovementTimeline(self, self.animation_stop)
 			while self.animation_threads_active:
-				self.execute_movement(self.eyes_blink_full.key, 1)
-				time.sleep(random.uniform(0.05, 0.2))
-				self.execute_movement(self.eyes_blink_full.key, 0)
-				time.sleep(random.uniform(0.25, max_time_between_blinks))
+				timeline.execute(self.eyes_blink_full.key, 1)
+				timeline.sleep(random.uniform(0.05, 0.2))
+				timeline.execute(self.eyes_blink_full.key, 0)
+				timeline.sleep(random.uniform(0.25, max_time_between_blinks))
 		self.blink_animation_thread = threading.Thread(target=blink, daemon=True)
 		self.blink_animation_thread.start()
 
 	def play_neck_animation(self) -> None:
-		self.animation_threads_active = True
+		if self.neck_animation_thread and self.neck_animation_thread.is_alive():
+			return
+		self.start_animation_threads()
 		def head_turn() -> None:
+			timeline = MovementTimeline(self, self.animation_stop)
 			while self.animation_threads_active:
-				time.sleep(random.uniform(0.5, 1.5))
+				timeline.sleep(random.uniform(0.5, 1.5))
 				if self.animation_threads_active:
-					self.execute_movement(self.head_left.key, 0)
-					self.execute_movement(self.head_right.key, 1)
-					time.sleep(random.uniform(0.1, 0.4))
+					timeline.execute(self.head_left.key, 0)
+					timeline.execute(self.head_right.key, 1)
+					timeline.sleep(random.uniform(0.1, 0.4))
 				if self.animation_threads_active:
-					self.execute_movement(self.head_right.key, 0)
-					self.execute_movement(self.head_left.key, 0)
-					time.sleep(random.uniform(0.25, 1.5))
+					timeline.execute(self.head_right.key, 0)
+					timeline.execute(self.head_left.key, 0)
+					timeline.sleep(random.uniform(0.25, 1.5))
 				if self.animation_threads_active:
-					self.execute_movement(self.head_right.key, 0)
-					self.execute_movement(self.head_left.key, 1)
-					time.sleep(random.uniform(0.5, 1))
+					timeline.execute(self.head_right.key, 0)
+					timeline.execute(self.head_left.key, 1)
+					timeline.sleep(random.uniform(0.5, 1))
 				if self.animation_threads_active:
-					self.execute_movement(self.head_right.key, 0)
-					self.execute_movement(self.head_left.key, 0)
+					timeline.execute(self.head_right.key, 0)
+					timeline.execute(self.head_left.key, 0)
 		self.neck_animation_thread = threading.Thread(target=head_turn, daemon=True)
 		self.neck_animation_thread.start()
 
 	def play_eye_left_right_animation(self) -> None:
 		if self.eye_left_right_animation_thread and self.eye_left_right_animation_thread.is_alive():
 			return
-		self.animation_threads_active = True
+		self.start_animation_threads()
 		def eyes() -> None:
 			b_move_left = random.choice([True, False])
 			eye_movement = self.eyes_right
+			timeline = MovementTimeline(self, self.animation_stop)
 			while self.animation_threads_active:
 				eye_movement = self.eyes_left if b_move_left else self.eyes_right
-				self.execute_movement(self.head_left.key, 1)
-				time.sleep(random.uniform(0.1, 0.3))
-				self.execute_movement(self.head_left.key, 0)
-				self.execute_movement(eye_movement.key, 1)
+				timeline.execute(self.head_left.key, 1)
+				timeline.sleep(random.uniform(0.1, 0.3))
+				timeline.execute(self.head_left.key, 0)
+				timeline.execute(eye_movement.key, 1)
 				if not self.animation_threads_active:
 					return
-				time.sleep(random.uniform(0, 2.5))
-				self.execute_movement(eye_movement.key, 0)
+				timeline.sleep(random.uniform(0, 2.5))
+				timeline.execute(eye_movement.key, 0)
 				if not self.animation_threads_active:
 					return
-				time.sleep(random.uniform(0, 2.5))
+				timeline.sleep(random.uniform(0, 2.5))
 				b_move_left = not b_move_left
 		self.eye_left_right_animation_thread = threading.Thread(target=eyes, daemon=True)
 		self.eye_left_right_animation_thread.start()
@@ -0,0 +1,225 @@
+import asyncio
+import configparser
+import json
+import os
+import threading
+import socketio
+from aiohttp import web
+from concurrent.futures import ThreadPoolExecutor
+from pydispatch import dispatcher
+from key_protocol import KeyProtocol
+from broadcast_hub import BroadcastHub
+from static_assets import StaticAssets
+from sequence_scheduler import SequenceScheduler
+from typing import Any, Callable, Dict, Optional
+
+class AsyncWebServer:
+	"""
+	The same Socket.IO event API as WebServer, served from a single asyncio event loop (python-socketio
+	on aiohttp) instead of a Werkzeug thread per connection. Handlers never block the loop: movement
+	events go to one worker thread, so presses and releases stay in order, and everything slower
+	(shows, TTS, Wi-Fi) goes to a small bounded pool.
+	"""
+	def __init__(self, config_file: str = "config.cfg", port: int = 80, broadcast_tick_seconds: float = 0.1) -> None:
+		self.config: configparser.ConfigParser = self.load_config(config_file)
+		self.port: int = port
+		script_dir = os.path.dirname(os.path.realpath(__file__))
+		self.assets = StaticAssets(os.path.join(script_dir, "webpage"), os.path.join(script_dir, "webpageCache"))
+
+		workers = self.config.getint("WebServer", "Workers", fallback=4)
+		self.movement_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="web-movement")
+		self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="web-worker")
+
+		self.sio = socketio.AsyncServer(async_mode="aiohttp", ping_timeout=30, logger=False, engineio_logger=False)
+		self.app = web.Application()
+		self.sio.attach(self.app)
+		self.app.router.add_get("/", self.index)
+		self.app.router.add_route("*", "/api/sequences", self.sequences_endpoint)
+		self.app.router.add_route("*", "/api/sequences/{job_id}", self.sequence_endpoint)
+		self.app.router.add_get("/{path:.*}", self.static_proxy)
+		self.register_events()
+		self.hub = BroadcastHub(self.emit_to, broadcast_tick_seconds)
+
+		self.key_protocol: Optional[KeyProtocol] = None  # Decodes binary key messages straight into the movement table
+		self.sequences: Optional[SequenceScheduler] = None  # Runs timed sequences posted to /api/sequences
+		self.loop: Optional[asyncio.AbstractEventLoop] = None
+		self.runner: Optional[web.AppRunner] = None
+
+		# Create a thread for the event loop only
+		self.threads: list[threading.Thread] = []
+		http_thread = threading.Thread(target=self.run_http, daemon=True)
+		self.threads.append(http_thread)
+		http_thread.start()
+
+	def load_config(self, config_file: str) -> configparser.ConfigParser:
+		config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), config_file)
+		if not os.path.exists(config_path):
+			raise FileNotFoundError(f"Configuration file not found: {config_path}")
+		config = configparser.ConfigParser()
+		config.read(config_path)
+		return config
+
+	async def index(self, request: web.Request) -> web.StreamResponse:
+		return await self.send_asset(request, "index.html")
+
+	async def static_proxy(self, request: web.Request) -> web.StreamResponse:
+		return await self.send_asset(request, request.match_info["path"])
+
+	async def send_asset(self, request: web.Request, path: str) -> web.StreamResponse:
+		result = self.assets.respond(path, request.query.get("v"), request.headers)
+		if result is None:
+			raise web.HTTPNotFound()
+		if not result.file_path:
+			return web.Response(body=result.body, status=result.status, headers=result.headers)
+		# Each chunk is read off the event loop so a large file never holds up socket events.
+		response = web.StreamResponse(status=result.status, headers=result.headers)
+		await response.prepare(request)
+		chunks = result.chunks()
+		loop = asyncio.get_running_loop()
+		while True:
+			chunk = await loop.run_in_executor(None, next, chunks, None)
+			if chunk is None:
+				break
+			await response.write(chunk)
+		await response.write_eof()
+		return response
+
+	async def sequences_endpoint(self, request: web.Request) -> web.StreamResponse:
+		if self.sequences is None:
+			return web.json_response({"error": "Sequence API unavailable"}, status=503)
+		if request.method == "GET":
+			return web.json_response(self.sequences.statuses())
+		if request.method != "POST":
+			raise web.HTTPMethodNotAllowed(request.method, ["GET", "POST"])
+		try:
+			spec = json.loads(await request.read())
+		except ValueError:
+			spec = None
+		try:
+			job = self.sequences.submit(spec)
+		except ValueError as e:
+			return web.json_response({"error": str(e)}, status=400)
+		except RuntimeError as e:
+			return web.json_response({"error": str(e)}, status=429)
+		return web.json_response(job.status(), status=201, headers={"Location": f"/api/sequences/{job.id}"})
+
+	async def sequence_endpoint(self, request: web.Request) -> web.StreamResponse:
+		if self.sequences is None:
+			return web.json_response({"error": "Sequence API unavailable"}, status=503)
+		job_id = request.match_info["job_id"]
+		if request.method == "DELETE":
+			# Cancelling releases the sequence's keys through the arbiter, so keep it off the event loop.
+			job = await asyncio.get_running_loop().run_in_executor(self.movement_executor, self.sequences.cancel, job_id)
+		elif request.method == "GET":
+			job = self.sequences.get(job_id)
+		else:
+			raise web.HTTPMethodNotAllowed(request.method, ["GET", "DELETE"])
+		if job is None:
+			return web.json_response({"error": "No such sequence"}, status=404)
+		return web.json_response(job.status())
+
+	def send(self, b_movement: bool, **kwargs: Any) -> None:
+		"""Hand a dispatcher signal to the worker threads so the event loop never waits on it."""
+		executor = self.movement_executor if b_movement else self.executor
+		executor.submit(self._send, kwargs)
+
+	@staticmethod
+	def _send(kwargs: Dict[str, Any]) -> None:
+		try:
+			dispatcher.send(**kwargs)
+		except Exception as e:
+			print(f"Error handling web event {kwargs.get('signal')}: {e}")
+
+	def send_key_bytes(self, sid: str, data: bytes, b_pose: bool) -> None:
+		if self.key_protocol:
+			self.movement_executor.submit(self.key_protocol.apply_pose if b_pose else self.key_protocol.apply_events, data, f"web:{sid}")
+
+	def on_disconnect(self, sid: str) -> None:
+		self.hub.remove_client(sid)
+		if self.key_protocol:
+			self.movement_executor.submit(self.key_protocol.release_source, f"web:{sid}")
+
+	def set_key_protocol(self, key_protocol: KeyProtocol) -> None:
+		self.key_protocol = key_protocol
+
+	def set_sequence_scheduler(self, sequences: SequenceScheduler) -> None:
+		self.sequences = sequences
+
+	def client_ip(self, sid: str) -> Optional[str]:
+		# engineio's aiohttp driver always puts 127.0.0.1 in REMOTE_ADDR, so ask the aiohttp request for the real peer.
+		environ = self.sio.get_environ(sid) or {}
+		request = environ.get("aiohttp.request")
+		if request is not None and request.remote:
+			return request.remote
+		return environ.get("REMOTE_ADDR")
+
+	def register_events(self) -> None:
+		handlers: Dict[str, Callable[..., None]] = {
+			"connect": lambda sid, environ, auth=None: self.hub.add_client(sid),
+			"disconnect": lambda sid, *args: self.on_disconnect(sid),
+			"onConnect": lambda sid, msg=None: self.send(False, signal="connectEvent", client_ip=self.client_ip(sid)),
+			"showPlay": lambda sid, show_name: self.send(False, signal="showPlay", show_name=show_name),
+			"showStop": lambda sid: self.send(False, signal="showStop"),
+			"showPause": lambda sid: self.send(False, signal="showPause"),
+			"onMirroredMode": lambda sid, bEnable: self.send(True, signal="onMirroredMode", val=bEnable),
+			"onRetroMode": lambda sid, bEnable: self.send(True, signal="onRetroMode", val=bEnable),
+			"onHeadNodInverted": lambda sid, bEnable: self.send(True, signal="onHeadNodInverted", val=bEnable),
+			"onKeyPress": lambda sid, data: self.send(True, signal="keyEvent", key=data["keyVal"], val=int(data["val"]), source=f"web:{sid}"),
+			"onKeyBytes": lambda sid, data: self.send_key_bytes(sid, data, False),
+			"onPose": lambda sid, data: self.send_key_bytes(sid, data, True),
+			"onConnectToWifi": lambda sid, data: self.send(False, signal="connectToWifi", ssid=data["ssid"], password=data["password"]),
+			"onSetHotspot": lambda sid, bEnable: self.send(False, signal="activateWifiHotspot", bActivate=bEnable),
+			"onWebTTSSubmit": lambda sid, inputText: self.send(False, signal="webTTSEvent", val=inputText),
+		}
+		for event, handler in handlers.items():
+			self.sio.on(event, handler)
+
+	def broadcast(self, signal_id: str, data: Any) -> None:
+		self.hub.publish(signal_id, data)
+
+	def broadcast_changes(self, signal_id: str, changes: Dict[str, Any]) -> None:
+		self.hub.update(signal_id, changes)
+
+	def emit_to(self, signal_id: str, data: Any, sid: str, callback: Callable[..., None]) -> None:
+		"""Emit to one client from any thread."""
+		if self.loop is None or not self.loop.is_running():
+			return
+		asyncio.run_coroutine_threadsafe(self.sio.emit(signal_id, data, to=sid, callback=callback), self.loop)
+
+	def emit_all(self, signal_id: str, data: Any) -> None:
+		"""Emit straight to every client, bypassing the hub, for streams that pace themselves."""
+		if self.loop is None or not self.loop.is_running():
+			return
+		asyncio.run_coroutine_threadsafe(self.sio.emit(signal_id, data), self.loop)
+
+	def run_http(self) -> None:
+		try:
+			print(f"Starting asyncio HTTP server on port {self.port}...")
+			self.loop = asyncio.new_event_loop()
+			asyncio.set_event_loop(self.loop)
+			self.runner = web.AppRunner(self.app, access_log=None)
+			self.loop.run_until_complete(self.runner.setup())
+			self.loop.run_until_complete(web.TCPSite(self.runner, "0.0.0.0", self.port).start())
+			self.loop.run_forever()
+		except Exception as e:
+			print(f"Error running HTTP server: {e}")
+
+	def shutdown(self) -> None:
+		print("Shutting down server...")
+		self.hub.shutdown()
+		if self.loop is not None and self.loop.is_running():
+			if self.runner is not None:
+				asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop)
+			self.loop.call_soon_threadsafe(self.loop.stop)
+		self.movement_executor.shutdown(wait=False)
+		self.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+	import time
+	server = AsyncWebServer()
+	try:
+		while True:
+			time.sleep(0.01)
+	except KeyboardInterrupt:
+		server.shutdown()
@@ -0,0 +1,144 @@
+import subprocess
+import threading
+import time
+import numpy as np
+from typing import List, Optional
+
+class CaptureCursor:
+	"""An independent read position into the capture ring, counted in frames since capture started."""
+	def __init__(self, capture: "AudioCapture", position: int) -> None:
+		self.capture = capture
+		self.position: int = position
+
+	def read(self, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+		"""
+		Return the next frame as a view into the ring (no copy), blocking until it has been captured.
+		Returns None if capture stops or the timeout passes first.
+		"""
+		if self.position < self.capture.oldest_position():
+			print("Audio capture reader fell behind; skipping overwritten audio.")
+			self.position = self.capture.oldest_position()
+		frame = self.capture.frame_at(self.position, timeout)
+		if frame is not None:
+			self.position += 1
+		return frame
+
+	def skip_to_live(self) -> None:
+		self.position = self.capture.write_position
+
+	def frames_behind(self) -> int:
+		return self.capture.write_position - self.position
+
+class AudioCapture:
+	"""
+	Keeps one arecord process open for the life of the program and writes its frames into a
+	ring buffer, so every stage reads the same continuous audio through its own cursor.
+	"""
+	def __init__(self, sample_rate: int = 16000, frame_length: int = 512, buffer_seconds: float = 30,
+				 device: str = "plughw:CARD=Device,DEV=0") -> None:
+		self.sample_rate: int = sample_rate
+		self.frame_length: int = frame_length
+		self.device: str = device
+		self.num_frames: int = int(buffer_seconds * sample_rate / frame_length)
+		self.ring: np.ndarray = np.zeros((self.num_frames, frame_length), dtype=np.int16)
+		self.write_position: int = 0  # Total frames captured so far; the ring slot is write_position % num_frames
+
+		self.condition = threading.Condition()
+		self.process: Optional[subprocess.Popen] = None
+		self.running: bool = False
+		self.thread: Optional[threading.Thread] = None
+
+	@staticmethod
+	def has_microphone() -> bool:
+		try:
+			result = subprocess.run(["arecord", "-l"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+			return "card" in result.stdout.lower()
+		except Exception as e:
+			print(f"Error checking microphone: {e}")
+			return False
+
+	def start(self) -> None:
+		if self.running:
+			return
+		self.running = True
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def _open_stream(self) -> Optional[subprocess.Popen]:
+		command = [
+			"arecord",
+			"-D", self.device,
+			"-f", "S16_LE",
+			"-r", str(self.sample_rate),
+			"-c", "1",
+			"--buffer-size=1920"
+		]
+		try:
+			return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+		except Exception as e:
+			print(f"Error starting audio stream: {e}")
+			return None
+
+	def run(self) -> None:
+		frame_bytes = self.frame_length * 2
+		while self.running:
+			self.process = self._open_stream()
+			if self.process is None:
+				time.sleep(1)
+				continue
+			try:
+				while self.running:
+					# Read straight into the next ring slot.
+					slot = self.ring[self.write_position % self.num_frames]
+					if self.process.stdout.readinto(memoryview(slot).cast('B')) < frame_bytes:
+						break
+					with self.condition:
+						self.write_position += 1
+						self.condition.notify_all()
+			except Exception as e:
+				print(f"Audio capture error: {e}")
+			self._close_stream()
+			if self.running:
+				print("Audio capture stream ended. Restarting...")
+				time.sleep(0.5)
+		with self.condition:
+			self.condition.notify_all()
+
+	def _close_stream(self) -> None:
+		if self.process is None:
+			return
+		try:
+			self.process.terminate()
+			self.process.wait(timeout=5)
+		except Exception:
+			self.process.kill()
+		self.process = None
+
+	def oldest_position(self) -> int:
+		# Keep one slot of margin, since the writer may be filling the oldest slot right now.
+		return max(0, self.write_position - self.num_frames + 1)
+
+	def cursor(self, frames_back: int = 0) -> CaptureCursor:
+		"""Create a cursor at the live edge, optionally rewound to include recent audio."""
+		return CaptureCursor(self, max(self.oldest_position(), self.write_position - frames_back))
+
+	def frame_at(self, position: int, timeout: Optional[float] = None) -> Optional[np.ndarray]:
+		with self.condition:
+			if not self.condition.wait_for(lambda: position < self.write_position or not self.running, timeout):
+				return None
+			if position >= self.write_position:
+				return None
+		return self.ring[position % self.num_frames]
+
+	def get_range(self, start: int, end: int) -> bytearray:
+		"""Copy captured frames [start, end) out of the ring as little-endian 16-bit PCM bytes."""
+		start = max(start, self.oldest_position())
+		end = min(end, self.write_position)
+		frames: List[bytes] = [self.ring[i % self.num_frames].tobytes() for i in range(start, end)]
+		return bytearray(b"".join(frames))
+
+	def shutdown(self) -> None:
+		self.running = False
+		self._close_stream()
+		with self.condition:
+			self.condition.notify_all()
@@ -0,0 +1,253 @@
+import threading
+import time
+import numpy as np
+from pydub import AudioSegment
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+MIXER_BUFFER_FRAMES = 2048  # Device buffer passed to pygame.mixer.init(); pygame can't report it back
+QUEUED_BLOCKS = 2  # Mixed blocks on the output channel: one playing and one queued behind it
+
+def decode_file(file_path: str, sample_rate: int = 44100, channels: int = 2) -> np.ndarray:
+	"""Decode any audio file pydub/ffmpeg understands into int16 PCM with shape (frames, channels)."""
+	audio = AudioSegment.from_file(file_path)
+	audio = audio.set_frame_rate(sample_rate).set_channels(channels).set_sample_width(2)
+	return np.frombuffer(audio.raw_data, dtype=np.int16).reshape(-1, channels)
+
+def convert_pcm(pcm: np.ndarray, from_rate: int, to_rate: int, channels: int = 2) -> np.ndarray:
+	"""Resample mono int16 PCM by linear interpolation and spread it across the output channels."""
+	mono = np.asarray(pcm, dtype=np.float32).reshape(-1)
+	if from_rate != to_rate and len(mono):
+		num_frames = int(round(len(mono) * to_rate / from_rate))
+		mono = np.interp(np.arange(num_frames) * (from_rate / to_rate), np.arange(len(mono)), mono)
+	out = np.clip(mono, -32768, 32767).astype(np.int16)
+	return np.repeat(out[:, None], channels, axis=1)
+
+@dataclass
+class AudioChannel:
+	name: str = ""
+	pcm: Optional[np.ndarray] = None  # int16 samples, shape (frames, channels)
+	position: int = 0  # Next frame to be mixed
+	volume: float = 1.0  # User volume for this channel (0-1)
+	gain: float = 1.0  # Current ducking gain, smoothed towards the target each block
+	paused: bool = False
+	b_streaming: bool = False  # More PCM is still being appended; running dry is an underrun, not the end
+	on_end: Optional[Callable[[], None]] = None  # Called once when the channel plays to the end
+	done: threading.Event = field(default_factory=threading.Event)
+
+	def is_busy(self) -> bool:
+		return self.pcm is not None and (self.position < len(self.pcm) or self.b_streaming)
+
+class AudioEngine:
+	"""
+	Mixes the show, voice and effects channels into a single output in one thread, so the
+	subsystems no longer fight over pygame.mixer.music and its end-of-track event.
+	"""
+	CHANNEL_NAMES = ("show", "voice", "effects")
+
+	def __init__(self, pygame_instance: Any, block_frames: int = 1024, device_buffer_frames: int = MIXER_BUFFER_FRAMES) -> None:
+		self.pygame = pygame_instance
+		mixer_settings = self.pygame.mixer.get_init() or (44100, -16, 2)
+		self.sample_rate: int = mixer_settings[0]
+		self.channels: int = mixer_settings[2]
+		self.block_frames: int = block_frames
+		# Frames mixed but not yet heard: the blocks on the output channel plus the sound card's buffer.
+		self.in_flight_frames: int = block_frames * QUEUED_BLOCKS + device_buffer_frames
+
+		# While the key channel is busy, each listed channel is ducked down to the given gain.
+		self.duck_rules: Dict[str, Dict[str, float]] = {
+			"voice": {"show": 0.3, "effects": 0.5},
+		}
+		self.duck_ramp: float = 0.15  # Maximum gain change per block, to avoid zipper noise
+
+		self.audio_channels: Dict[str, AudioChannel] = {name: AudioChannel(name=name) for name in self.CHANNEL_NAMES}
+		self.lock = threading.Lock()
+		self.wake_event = threading.Event()
+		self.running: bool = True
+
+		# Reserve one pygame channel for the mixed output so nothing else plays over it.
+		self.pygame.mixer.set_reserved(1)
+		self.output = self.pygame.mixer.Channel(0)
+
+		self.mix_thread = threading.Thread(target=self.run, daemon=True)
+		self.mix_thread.start()
+
+	def decode(self, file_path: str) -> np.ndarray:
+		return decode_file(file_path, self.sample_rate, self.channels)
+
+	def play(self, channel_name: str, pcm: np.ndarray, on_end: Optional[Callable[[], None]] = None) -> None:
+		"""Start playing PCM on a channel, replacing anything that channel was already playing."""
+		with self.lock:
+			channel = self.audio_channels[channel_name]
+			channel.pcm = pcm
+			channel.position = 0
+			channel.paused = False
+			channel.b_streaming = False
+			channel.on_end = on_end
+			channel.done.clear()
+		self.wake_event.set()
+
+	def open_stream(self, channel_name: str, on_end: Optional[Callable[[], None]] = None) -> None:
+		"""Start a channel whose PCM arrives in pieces through append(), e.g. from a speech synthesizer."""
+		with self.lock:
+			channel = self.audio_channels[channel_name]
+			channel.pcm = np.zeros((0, self.channels), dtype=np.int16)
+			channel.position = 0
+			channel.paused = False
+			channel.b_streaming = True
+			channel.on_end = on_end
+			channel.done.clear()
+		self.wake_event.set()
+
+	def append(self, channel_name: str, pcm: np.ndarray) -> None:
+		with self.lock:
+			channel = self.audio_channels[channel_name]
+			if not channel.b_streaming or channel.pcm is None:
+				return
+			# Drop what has already been mixed so the buffer doesn't grow for the whole utterance.
+			channel.pcm = np.concatenate((channel.pcm[channel.position:], pcm))
+			channel.position = 0
+		self.wake_event.set()
+
+	def close_stream(self, channel_name: str) -> None:
+		"""No more PCM is coming; the channel ends once what was appended has played."""
+		with self.lock:
+			channel = self.audio_channels[channel_name]
+			channel.b_streaming = False
+			if channel.pcm is not None and channel.position >= len(channel.pcm):
+				channel.done.set()
+				if channel.on_end is not None:
+					threading.Thread(target=channel.on_end, daemon=True).start()
+					channel.on_end = None
+		self.wake_event.set()
+
+	def play_file(self, channel_name: str, file_path: str, on_end: Optional[Callable[[], None]] = None) -> np.ndarray:
+		pcm = self.decode(file_path)
+		self.play(channel_name, pcm, on_end)
+		return pcm
+
+	def stop(self, channel_name: str) -> None:
+		with self.lock:
+			channel = self.audio_channels[channel_name]
+			channel.pcm = None
+			channel.position = 0
+			channel.paused = False
+			channel.b_streaming = False
+			channel.on_end = None
+			channel.done.set()
+
+	def pause(self, channel_name: str) -> None:
+		with self.lock:
+			self.audio_channels[channel_name].paused = True
+
+	def unpause(self, channel_name: str) -> None:
+		with self.lock:
+			self.audio_channels[channel_name].paused = False
+		self.wake_event.set()
+
+	def set_volume(self, channel_name: str, volume: float) -> None:
+		self.audio_channels[channel_name].volume = max(0.0, min(1.0, volume))
+
+	def set_ducking(self, key_channel: str, ducked_channel: str, gain: float) -> None:
+		self.duck_rules.setdefault(key_channel, {})[ducked_channel] = gain
+
+	def is_busy(self, channel_name: str) -> bool:
+		return self.audio_channels[channel_name].is_busy()
+
+	def is_paused(self, channel_name: str) -> bool:
+		return self.audio_channels[channel_name].paused
+
+	def output_latency(self) -> float:
+		"""Seconds between a channel starting and it being heard."""
+		return self.in_flight_frames / self.sample_rate
+
+	def get_pos_ms(self, channel_name: str) -> int:
+		"""Playback position of a channel as heard, accounting for audio that is mixed but not yet output."""
+		channel = self.audio_channels[channel_name]
+		if channel.pcm is None:
+			return -1
+		return int(max(0, channel.position - self.in_flight_frames) * 1000 / self.sample_rate)
+
+	def wait(self, channel_name: str, timeout: Optional[float] = None) -> bool:
+		"""Block until a channel finishes (or is stopped). Returns False on timeout."""
+		channel = self.audio_channels[channel_name]
+		if not channel.is_busy():
+			return True
+		return channel.done.wait(timeout)
+
+	def _target_gains(self) -> Dict[str, float]:
+		gains = {name: 1.0 for name in self.audio_channels}
+		for key_channel, rules in self.duck_rules.items():
+			key = self.audio_channels.get(key_channel)
+			if key is None or not key.is_busy() or key.paused:
+				continue
+			for ducked_channel, gain in rules.items():
+				if ducked_channel in gains:
+					gains[ducked_channel] = min(gains[ducked_channel], gain)
+		return gains
+
+	def _mix_block(self) -> Optional[np.ndarray]:
+		"""Mix the next block from every active channel. Returns None when nothing is playing."""
+		finished: List[Callable[[], None]] = []
+		with self.lock:
+			targets = self._target_gains()
+			mix = np.zeros((self.block_frames, self.channels), dtype=np.float32)
+			b_active = False
+			for channel in self.audio_channels.values():
+				if not channel.is_busy() or channel.paused:
+					continue
+				chunk = channel.pcm[channel.position:channel.position + self.block_frames]
+				if not len(chunk):
+					continue  # A stream waiting for its next piece
+				b_active = True
+				channel.position += len(chunk)
+
+				# Ramp from the current gain towards the ducking target across the block.
+				target = targets[channel.name]
+				step = max(-self.duck_ramp, min(self.duck_ramp, target - channel.gain))
+				ramp = np.linspace(channel.gain, channel.gain + step, len(chunk), dtype=np.float32)
+				channel.gain += step
+				mix[:len(chunk)] += chunk.astype(np.float32) * (ramp * channel.volume)[:, None]
+
+				if not channel.is_busy():
+					channel.done.set()
+					if channel.on_end is not None:
+						finished.append(channel.on_end)
+						channel.on_end = None
+
+		for callback in finished:
+			threading.Thread(target=callback, daemon=True).start()
+
+		if not b_active:
+			return None
+		return np.clip(mix, -32768, 32767).astype(np.int16)
+
+	def run(self) -> None:
+		while self.running:
+			try:
+				# Keep exactly one block queued behind the one currently playing.
+				if self.output.get_busy() and self.output.get_queue() is not None:
+					time.sleep(0.005)
+					continue
+
+				block = self._mix_block()
+				if block is None:
+					# Nothing to play: sleep until a channel starts instead of spinning.
+					self.wake_event.wait(0.1)
+					self.wake_event.clear()
+					continue
+
+				sound = self.pygame.sndarray.make_sound(block)
+				if self.output.get_busy():
+					self.output.queue(sound)
+				else:
+					self.output.play(sound)
+			except Exception as e:
+				print(f"Exception in audio engine thread: {e}")
+				time.sleep(0.1)
+
+	def shutdown(self) -> None:
+		self.running = False
+		self.wake_event.set()
+		for name in self.audio_channels:
+			self.stop(name)
@@ -1,15 +1,15 @@
-from pydub import AudioSegment
-from pydispatch import dispatcher
-from scipy.io import wavfile
-import pygame
+from lip_sync import LipSync
+from audio_engine import convert_pcm
 import numpy as np
+import queue
+import threading
 import time
-import io
-from typing import Tuple, List, Any
+from typing import Tuple, List, Any, Iterable, Optional
 
 class AutomatedPuppeteering:
-	def __init__(self, pygame_instance: Any, threshold: float = 0.15, interval_ms: int = 25) -> None:
-		self.pygame = pygame_instance
+	def __init__(self, audio_engine: Any, threshold: float = 0.15, interval_ms: int = 25, channel_name: str = "voice") -> None:
+		self.audio_engine = audio_engine
+		self.channel_name: str = channel_name  # Audio engine channel that puppeted speech plays on
 
 		# Ensure threshold is numeric
 		if not isinstance(threshold, (int, float)):
@@ -17,6 +17,7 @@ class AutomatedPuppeteering:
 		
 		self.threshold: float = threshold  # Audio level threshold to open/close mouth
 		self.interval_ms: int = interval_ms  # Time interval to monitor audio (in ms)
+		self.lip_sync = LipSync(interval_ms, threshold)
 
 	def normalize_rms(self, rms: float, max_rms: float) -> float:
 		"""Normalize RMS to be between 0 and 1 based on dynamic max RMS value."""
@@ -40,67 +41,71 @@ class AutomatedPuppeteering:
 		return rms_values
 
 	def load_audio_data(self, file_path: str) -> Tuple[int, np.ndarray]:
-		"""Load audio data and sample rate from various file formats."""
-		if file_path.endswith('.mp3'):
-			audio = AudioSegment.from_mp3(file_path)
-		elif file_path.endswith('.ogg'):
-			audio = AudioSegment.from_ogg(file_path)
-		elif file_path.endswith('.wav'):
-			audio = AudioSegment.from_wav(file_path)
-		else:
-			raise ValueError(f"Unsupported file format: {file_path}")
-
-		# Convert to raw audio data and retrieve sample rate
-		wav_io = io.BytesIO()
-		audio.export(wav_io, format="wav")
-		wav_io.seek(0)
-		sample_rate, data = wavfile.read(wav_io)
-
-		return sample_rate, data
+		"""Load audio data and sample rate from various file formats, decoded to the audio engine's output format."""
+		return self.audio_engine.sample_rate, self.audio_engine.decode(file_path)
+
+	def perform_speech(self, pcm: np.ndarray, sample_rate: int, envelope: Any = None) -> None:
+		"""Play PCM on the voice channel while the lip-sync engine drives the mouth, mustache and eyelids."""
+		events = self.lip_sync.plan(self.lip_sync.classify(pcm, sample_rate, envelope))
+		self.audio_engine.play(self.channel_name, pcm)
+		# Event times are relative to when the audio is actually heard, not when it was handed to the mixer.
+		start_time: float = time.monotonic() + self.audio_engine.output_latency()
+		self.lip_sync.perform(events, start_time, lambda: self.audio_engine.is_busy(self.channel_name))
+		# Wait for the audio to finish without busy-waiting
+		self.audio_engine.wait(self.channel_name)
+
+	def perform_stream(self, chunks: Iterable[np.ndarray], sample_rate: int) -> None:
+		"""
+		Play mono PCM pieces on the voice channel as they are produced (e.g. sentence by sentence from
+		LocalTTS), planning lip-sync for each piece as it arrives.
+		"""
+		engine = self.audio_engine
+		pieces: "queue.Queue[Optional[Tuple[np.ndarray, float]]]" = queue.Queue()
+		start: List[float] = []
+
+		def feed() -> None:
+			# Audio goes to the engine the moment it exists, never held up by the puppeteering below.
+			offset = 0
+			try:
+				for pcm in chunks:
+					out = convert_pcm(pcm, sample_rate, engine.sample_rate, engine.channels)
+					if not start:
+						engine.open_stream(self.channel_name)
+						start.append(time.monotonic() + engine.output_latency())
+					engine.append(self.channel_name, out)
+					pieces.put((out, offset / engine.sample_rate))
+					offset += len(out)
+			finally:
+				if start:
+					engine.close_stream(self.channel_name)
+				pieces.put(None)
+
+		threading.Thread(target=feed, daemon=True).start()
+		while True:
+			piece = pieces.get()
+			if piece is None:
+				break
+			out, piece_offset = piece
+			events = self.lip_sync.plan(self.lip_sync.classify(out, engine.sample_rate))
+			self.lip_sync.perform(events, start[0] + piece_offset, lambda: engine.is_busy(self.channel_name))
+		if start:
+			engine.wait(self.channel_name)
 
 	def monitor_audio(self, file_path: str) -> None:
 		"""Monitor the audio levels during playback with improved synchronization."""
 		try:
-			# Load audio data
 			sample_rate, data = self.load_audio_data(file_path)
-
-			# Calculate RMS values
-			rms_values: List[float] = self.calculate_rms(data, sample_rate)
-
-			# Play the audio file using pygame.mixer
-			self.pygame.mixer.music.load(file_path)
-			self.pygame.mixer.music.play()
-
-			# Use a monotonic clock for scheduling to prevent drift
-			start_time: float = time.monotonic()
-			iteration: int = 0
-			duration: float = len(data) / sample_rate  # Audio duration in seconds
-
-			for rms in rms_values:
-				# If playback duration is exceeded, break out of the loop
-				if time.monotonic() - start_time > duration:
-					break
-
-				# Trigger mouth movement based on the RMS threshold
-				if rms > self.threshold:
-					dispatcher.send(signal="keyEvent", key='x', val=1)  # Mouth open event
-				else:
-					dispatcher.send(signal="keyEvent", key='x', val=0)  # Mouth close event
-
-				iteration += 1
-				# Calculate target time for the next update
-				target_time: float = start_time + iteration * (self.interval_ms / 1000.0)
-				sleep_duration: float = target_time - time.monotonic()
-				if sleep_duration > 0:
-					time.sleep(sleep_duration)
-
-			# Wait for the music to finish without busy-waiting
-			while self.pygame.mixer.music.get_busy():
-				self.pygame.time.wait(10)  # Small wait to avoid a busy loop
-
+			self.perform_speech(data, sample_rate)
 		except Exception as e:
 			print(f"Error processing audio file {file_path}: {e}")
 
+	def play_clip_with_puppeting(self, clip: Any) -> None:
+		"""Play a pre-decoded VoiceClip using its cached envelope, skipping the decode and RMS pass."""
+		try:
+			self.perform_speech(clip.pcm, clip.sample_rate, clip.envelope)
+		except Exception as e:
+			print(f"Error playing cached clip {clip.name}: {e}")
+
 	def play_audio_with_puppeting(self, file_path: str) -> None:
 		"""Plays audio and synchronizes mouth state with the audio."""
 		try:
@@ -0,0 +1,120 @@
+import copy
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Tuple
+
+@dataclass
+class ClientState:
+	sent: Dict[str, Any] = field(default_factory=dict)  # Topic -> value this client last received
+	versions: Dict[str, int] = field(default_factory=dict)  # Topic -> version of that value
+	in_flight: Dict[str, float] = field(default_factory=dict)  # Topic -> time.monotonic() sent, until the client acknowledges it
+
+class BroadcastHub:
+	"""
+	Keeps the latest value of every broadcast topic and sends each client only what changed. Frames go
+	out on a fixed tick, so a burst of updates costs at most one frame per topic per tick. Each client
+	must acknowledge a frame before it gets the next one for that topic; until then newer values just
+	replace older ones, so a slow client skips stale intermediate states instead of queueing them.
+
+	Frames are {"v": value} for a full value, or {"d": changed fields, "r": removed fields} when the
+	value is a dict and a delta against what the client last received is smaller. A new client gets
+	every topic in full on the first tick after it connects.
+
+	Only state belongs here (system info, Wi-Fi scans, the show list): events the page must see
+	one by one, like voice command updates, go out through the web server's emit_all() instead.
+	"""
+	def __init__(self, emit: Callable[[str, Any, str, Callable[..., None]], None], tick_seconds: float = 0.1,
+				 ack_timeout_seconds: float = 5.0) -> None:
+		self.emit = emit  # emit(topic, frame, client_id, ack_callback)
+		self.tick_seconds: float = tick_seconds
+		self.ack_timeout_seconds: float = ack_timeout_seconds  # Unacknowledged frames stop blocking after this long
+		self.values: Dict[str, Any] = {}
+		self.versions: Dict[str, int] = {}
+		self.clients: Dict[str, ClientState] = {}
+		self.lock = threading.Lock()
+		self.wake = threading.Event()
+		self.b_running: bool = True
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def publish(self, topic: str, value: Any) -> None:
+		"""Set the value of a topic. Unchanged values are ignored."""
+		with self.lock:
+			if topic in self.values and self.values[topic] == value:
+				return
+			self.values[topic] = copy.deepcopy(value)
+			self.versions[topic] = self.versions.get(topic, 0) + 1
+		self.wake.set()
+
+	def update(self, topic: str, changes: Dict[str, Any]) -> None:
+		"""Merge fields into a dict topic, e.g. one key's state among many."""
+		with self.lock:
+			value = dict(self.values.get(topic) or {})
+		value.update(changes)
+		self.publish(topic, value)
+
+	def add_client(self, client_id: str) -> None:
+		with self.lock:
+			self.clients[client_id] = ClientState()
+		self.wake.set()
+
+	def remove_client(self, client_id: str) -> None:
+		with self.lock:
+			self.clients.pop(client_id, None)
+
+	def on_ack(self, client_id: str, topic: str) -> None:
+		with self.lock:
+			client = self.clients.get(client_id)
+			if client is not None:
+				client.in_flight.pop(topic, None)
+		self.wake.set()
+
+	@staticmethod
+	def frame(old: Any, new: Any) -> Dict[str, Any]:
+		if isinstance(old, dict) and isinstance(new, dict):
+			changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+			removed = [key for key in old if key not in new]
+			if len(changed) + len(removed) < len(new):
+				return {"d": changed, "r": removed}
+		return {"v": new}
+
+	def flush(self) -> bool:
+		"""Send every client the topics it is behind on. Returns True if some were held back by unacknowledged frames."""
+		now = time.monotonic()
+		frames: List[Tuple[str, Dict[str, Any], str]] = []
+		b_waiting = False
+		with self.lock:
+			for client_id, client in self.clients.items():
+				for topic, version in self.versions.items():
+					if client.versions.get(topic) == version:
+						continue
+					sent_time = client.in_flight.get(topic)
+					if sent_time is not None and now - sent_time < self.ack_timeout_seconds:
+						b_waiting = True
+						continue
+					value = self.values[topic]
+					frames.append((topic, self.frame(client.sent.get(topic), value), client_id))
+					client.sent[topic] = value
+					client.versions[topic] = version
+					client.in_flight[topic] = now
+		for topic, frame, client_id in frames:
+			try:
+				self.emit(topic, frame, client_id, lambda *args, client_id=client_id, topic=topic: self.on_ack(client_id, topic))
+			except Exception as e:
+				print(f"Broadcast error: {e}")
+		return b_waiting
+
+	def run(self) -> None:
+		b_waiting = False
+		while self.b_running:
+			self.wake.wait(self.tick_seconds if b_waiting else None)
+			self.wake.clear()
+			if not self.b_running:
+				return
+			b_waiting = self.flush()
+			time.sleep(self.tick_seconds)
+
+	def shutdown(self) -> None:
+		self.b_running = False
+		self.wake.set()
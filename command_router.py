@@ -0,0 +1,204 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+@dataclass
+class CommandRule:
+	name: str = ""  # VoiceEventHandler.commands key for "command" rules, or the dispatcher signal for "signal" rules
+	phrases: List[str] = field(default_factory=list)  # Token patterns; "{slot}" captures one or more words
+	action: str = "command"  # "command", "signal" or "say"
+	anchor: str = "contains"  # "contains": anywhere in the transcript, "start": must begin it, "exact": must be all of it
+
+@dataclass
+class CommandMatch:
+	rule: CommandRule = field(default_factory=CommandRule)
+	slots: Dict[str, str] = field(default_factory=dict)
+	covered_tokens: int = 0  # Transcript words matched by pattern words or slots; longer matches win
+	fuzzy_tokens: int = 0  # How many of those were near misses rather than exact
+
+# Declarative routing table. Add phrasings here rather than new if/elif branches.
+COMMAND_RULES: List[CommandRule] = [
+	CommandRule("say", ["say {text}", "repeat after me {text}"], action="say", anchor="start"),
+	# Questions that share words with ordinary conversation must be the whole transcript, or they steal it from the LLM.
+	CommandRule("IPAddress", ["ip address", "your ip address", "what is your ip", "whats your ip", "what is your ip address",
+							  "whats your ip address", "tell me your ip address"], anchor="exact"),
+	CommandRule("WifiNetwork", ["your wifi network", "what is your wifi network", "whats your wifi network", "what wifi network are you on",
+								"which wifi network are you on", "what network are you on", "which network are you on"], anchor="exact"),
+	# Switching the hotspot drops the Pi's wifi, so "how do I turn on the hotspot on my phone" must not trigger it.
+	CommandRule("HotspotStart", ["activate hotspot", "activate the hotspot", "turn on hotspot", "turn on the hotspot", "turn the hotspot on",
+								 "start hotspot", "start the hotspot"], anchor="exact"),
+	CommandRule("HotspotEnd", ["deactivate hotspot", "deactivate the hotspot", "turn off hotspot", "turn off the hotspot", "turn the hotspot off",
+							   "stop hotspot", "stop the hotspot"], anchor="exact"),
+	CommandRule("showStop", ["stop", "stop singing", "stop show", "stop the show", "stop the song", "be quiet"], action="signal", anchor="exact"),
+	CommandRule("PlaySong", ["sing a song", "sing me a song", "play a song", "sing something", "play a show"], anchor="exact"),
+	CommandRule("Encore", ["encore", "sing another song", "one more song", "sing it again"], anchor="exact"),
+	CommandRule("WhoAreYou", ["who are you", "what is your name", "whats your name", "introduce yourself"], anchor="exact"),
+	CommandRule("HowDoYouWork", ["how do you work", "how do you move", "how are you controlled"], anchor="exact"),
+	CommandRule("PSI", ["your psi", "what is your psi", "whats your psi", "what is the psi", "whats the psi",
+						"what is your air pressure", "whats your air pressure"], anchor="exact"),
+	CommandRule("LookUpAndDown", ["look up and down", "nod your head"], anchor="exact"),
+]
+
+# Leading words that are not part of the command (usually the tail of the wakeword).
+IGNORED_PREFIXES: List[str] = ["hey chef", "hey pasqually", "ok chef", "chef", "pasqually", "please", "can you", "could you"]
+
+# Trailing words that don't change the command, so "exact" rules still match "nod your head please".
+IGNORED_SUFFIXES: List[str] = ["please", "for me", "now"]
+
+# Spellings speech-to-text produces for the same word.
+TOKEN_ALIASES: Dict[str, str] = {
+	"wi-fi": "wifi",
+	"what's": "whats",
+	"i.p.": "ip",
+	"p.s.i.": "psi",
+	"hot-spot": "hotspot",
+}
+
+class _TrieNode:
+	def __init__(self) -> None:
+		self.children: Dict[str, "_TrieNode"] = {}
+		self.slot: Optional[str] = None  # Set when this node's next element is a slot
+		self.slot_node: Optional["_TrieNode"] = None
+		self.rules: List[CommandRule] = []  # Rules whose phrase ends here
+
+class CommandRouter:
+	"""
+	Matches transcripts against the command table with a word trie compiled once at startup. Words
+	are compared exactly first and then fuzzily (one edit, for longer words) so small
+	transcription slips still route locally instead of going to the LLM.
+	"""
+	def __init__(self, rules: Optional[List[CommandRule]] = None, min_fuzzy_length: int = 5) -> None:
+		self.rules: List[CommandRule] = rules if rules is not None else COMMAND_RULES
+		self.min_fuzzy_length: int = min_fuzzy_length  # Shorter words must match exactly
+		self.root: _TrieNode = _TrieNode()
+		self.prefixes: List[List[str]] = sorted((self.tokenize(prefix) for prefix in IGNORED_PREFIXES), key=len, reverse=True)
+		self.suffixes: List[List[str]] = sorted((self.tokenize(suffix) for suffix in IGNORED_SUFFIXES), key=len, reverse=True)
+		for rule in self.rules:
+			for phrase in rule.phrases:
+				self._insert(self.tokenize(phrase), rule)
+
+	@staticmethod
+	def tokenize_words(text: str) -> List[Tuple[str, str]]:
+		"""Normalized tokens paired with the original words they came from."""
+		pairs: List[Tuple[str, str]] = []
+		for word in text.split():
+			raw = word.lower()
+			raw = TOKEN_ALIASES.get(raw, raw)
+			if raw.startswith("{") and raw.endswith("}"):
+				pairs.append((raw, word))
+				continue
+			token = re.sub(r"[^a-z0-9']", "", raw).replace("'", "")
+			if token:
+				pairs.append((TOKEN_ALIASES.get(token, token), word))
+		return pairs
+
+	@staticmethod
+	def tokenize(text: str) -> List[str]:
+		return [token for token, _ in CommandRouter.tokenize_words(text)]
+
+	def _insert(self, tokens: List[str], rule: CommandRule) -> None:
+		node = self.root
+		for token in tokens:
+			if token.startswith("{"):
+				if node.slot_node is None:
+					node.slot = token[1:-1]
+					node.slot_node = _TrieNode()
+				node = node.slot_node
+			else:
+				node = node.children.setdefault(token, _TrieNode())
+		node.rules.append(rule)
+
+	@staticmethod
+	def _within_one_edit(a: str, b: str) -> bool:
+		if abs(len(a) - len(b)) > 1:
+			return False
+		if len(a) > len(b):
+			a, b = b, a
+		i = j = edits = 0
+		while i < len(a) and j < len(b):
+			if a[i] != b[j]:
+				edits += 1
+				if edits > 1:
+					return False
+				if len(a) == len(b):
+					i += 1
+				j += 1
+			else:
+				i += 1
+				j += 1
+		return edits + (len(b) - j) <= 1
+
+	def _next_nodes(self, node: _TrieNode, token: str) -> List[Tuple[_TrieNode, bool]]:
+		exact = node.children.get(token)
+		if exact is not None:
+			return [(exact, False)]
+		if len(token) < self.min_fuzzy_length:
+			return []
+		return [(child, True) for word, child in node.children.items()
+				if len(word) >= self.min_fuzzy_length and self._within_one_edit(token, word)]
+
+	def _walk(self, tokens: List[str], words: List[str], start: int, matches: List[CommandMatch]) -> None:
+		# Depth-first over (node, position, fuzzy count, slots, open slot start).
+		stack = [(self.root, start, 0, {}, None)]
+		while stack:
+			node, pos, fuzzy, slots, slot_start = stack.pop()
+			if slot_start is not None:
+				# Inside a slot: it can end here (once it holds a word) or swallow the next word.
+				if pos > slot_start:
+					closed = dict(slots)
+					closed[node.slot] = " ".join(words[slot_start:pos])  # Slots keep the original wording
+					stack.append((node.slot_node, pos, fuzzy, closed, None))
+				if pos < len(tokens):
+					stack.append((node, pos + 1, fuzzy, slots, slot_start))
+				continue
+
+			for rule in node.rules:
+				if rule.anchor == "exact" and (start != 0 or pos != len(tokens)):
+					continue
+				if rule.anchor == "start" and start != 0:
+					continue
+				matches.append(CommandMatch(rule, slots, pos - start, fuzzy))
+			if pos >= len(tokens):
+				continue
+			for child, b_fuzzy in self._next_nodes(node, tokens[pos]):
+				stack.append((child, pos + 1, fuzzy + (1 if b_fuzzy else 0), slots, None))
+			if node.slot_node is not None:
+				stack.append((node, pos, fuzzy, slots, pos))
+
+	def strip_prefixes(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+		b_stripped = True
+		while b_stripped and pairs:
+			b_stripped = False
+			for prefix in self.prefixes:
+				if [token for token, _ in pairs[:len(prefix)]] == prefix:
+					pairs = pairs[len(prefix):]
+					b_stripped = True
+					break
+		return pairs
+
+	def strip_suffixes(self, pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+		b_stripped = True
+		while b_stripped and pairs:
+			b_stripped = False
+			for suffix in self.suffixes:
+				if len(pairs) > len(suffix) and [token for token, _ in pairs[-len(suffix):]] == suffix:
+					pairs = pairs[:-len(suffix)]
+					b_stripped = True
+					break
+		return pairs
+
+	def match(self, transcript: str) -> Optional[CommandMatch]:
+		"""Best rule for a transcript: the most words covered, then the fewest fuzzy matches."""
+		pairs = self.strip_prefixes(self.tokenize_words(transcript))
+		# Trailing fillers are only dropped if the transcript doesn't match as spoken, so a "say" slot keeps them.
+		for candidate in (pairs, self.strip_suffixes(pairs)):
+			if not candidate:
+				return None
+			tokens = [token for token, _ in candidate]
+			words = [word for _, word in candidate]
+			matches: List[CommandMatch] = []
+			for start in range(len(tokens)):
+				self._walk(tokens, words, start, matches)
+			if matches:
+				return max(matches, key=lambda m: (m.covered_tokens, -m.fuzzy_tokens))
+		return None
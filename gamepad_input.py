@@ -62,9 +62,10 @@ class StickState:
 	y: int = 0
 
 class USBGamepadReader:
-	def __init__(self, movements: Any, web_server: Any) -> None:
+	def __init__(self, movements: Any, web_server: Any, arbiter: Any) -> None:
 		self.movements = movements
 		self.web_server = web_server
+		self.arbiter = arbiter  # Shares the movements fairly with the web operators
 
 		self.head_nod_inverted: bool = False
 
@@ -163,8 +164,8 @@ class USBGamepadReader:
 		if key == self.movements.head_nod.key and self.head_nod_inverted:
 			val = 1 - val
 		try:
-			if self.movements.execute_movement(str(key).lower(), val):
-				self.web_server.broadcast('gamepadKeyEvent', [str(key).lower(), val])
+			if self.arbiter.press("gamepad", str(key).lower(), val):
+				self.web_server.broadcast_changes('gamepadKeys', {str(key).lower(): val})
 		except Exception as e:
 			print(f"Invalid key: {e}")
 
@@ -1,5 +1,5 @@
-import smbus
-from typing import Optional
+import threading
+from typing import Any, List, Optional
 
 # MCP23008 Register Addresses
 IODIR   = 0x00   # GPIO direction register
@@ -8,7 +8,7 @@ GPIOREG = 0x09    # GPIO register
 OLAT    = 0x0A    # Output latch register
 
 class MCP23008:
-	def __init__(self, bus: smbus.SMBus, address: int) -> None:
+	def __init__(self, bus: Any, address: int) -> None:
 		self.bus = bus
 		self.address = address
 		self.init_device()
@@ -39,22 +39,55 @@ class MCP23008:
 
 class GPIO:
 	def __init__(self) -> None:
+		# I2C addresses of the MCP23008 devices
+		self.i2c_addresses: List[int] = [0x20, 0x21, 0x23]
+
+		# Copy of each device's output latch, one byte per device, so the valve state can be read without I2C traffic
+		self.latches = bytearray(len(self.i2c_addresses))
+		self.latch_lock = threading.Lock()
+
 		try:
+			import smbus
 			bus = smbus.SMBus(1)  # Initialize I2C bus
 
-			# I2C addresses of the MCP23008 devices
-			i2c_addresses = [0x20, 0x21, 0x23]
-
 			# Initialize MCP23008 devices and store them in a list
-			self.mcp_devices = [MCP23008(bus, addr) for addr in i2c_addresses]
+			self.mcp_devices = [MCP23008(bus, addr) for addr in self.i2c_addresses]
 		except Exception:
 			print("MCP23008 GPIO expanders not detected!")
 			self.mcp_devices = None
 
 	# Find MCP23008 device by I2C address
 	def set_pin_from_address(self, i2c_address: int, pin: int, value: int) -> None:
+		if i2c_address in self.i2c_addresses:
+			index = self.i2c_addresses.index(i2c_address)
+			with self.latch_lock:
+				if value:
+					self.latches[index] |= 1 << pin
+				else:
+					self.latches[index] &= ~(1 << pin) & 0xFF
 		if hasattr(self, "mcp_devices") and self.mcp_devices is not None:
 			for mcp in self.mcp_devices:
 				if mcp.address == i2c_address:
 					mcp.set_pin(pin, value)
 		return None
+
+	def get_latches(self) -> bytes:
+		"""All output pins, bit-packed: bit n of byte i is pin n of the device at i2c_addresses[i]."""
+		with self.latch_lock:
+			return bytes(self.latches)
+
+	def get_bit_index(self, i2c_address: int, pin: int) -> int:
+		return self.i2c_addresses.index(i2c_address) * 8 + pin
+
+class SimulatedGPIO(GPIO):
+	"""Keeps the output latches without any I2C hardware, for replaying recorded input off the Pi."""
+	def __init__(self) -> None:
+		self.i2c_addresses: List[int] = [0x20, 0x21, 0x23]
+		self.latches = bytearray(len(self.i2c_addresses))
+		self.latch_lock = threading.Lock()
+		self.mcp_devices = None
+		self.writes: int = 0  # Pin writes that would have gone over the bus
+
+	def set_pin_from_address(self, i2c_address: int, pin: int, value: int) -> None:
+		self.writes += 1
+		super().set_pin_from_address(i2c_address, pin, value)
@@ -0,0 +1,63 @@
+import threading
+import time
+import httpx
+from typing import Dict, Optional
+
+class HttpConnections:
+	"""
+	One keep-alive HTTP client shared by every cloud provider (the AI SDKs, ElevenLabs, DeepSeek and the
+	internet check), so each conversational turn reuses open TLS connections instead of paying for a
+	new handshake. Registered hosts are warmed up at startup and again whenever one has sat idle long
+	enough that the server has probably closed the connection.
+	"""
+	def __init__(self, pool_size: int = 8, idle_seconds: float = 50.0) -> None:
+		self.idle_seconds: float = idle_seconds  # Servers commonly drop idle keep-alive connections after about a minute
+		self.client: httpx.Client = httpx.Client(
+			timeout=httpx.Timeout(60.0, connect=10.0),
+			limits=httpx.Limits(max_connections=pool_size * 2, max_keepalive_connections=pool_size, keepalive_expiry=idle_seconds),
+			event_hooks={"response": [self._on_response]},
+		)
+		self.warm_urls: Dict[str, str] = {}  # Host -> URL to touch when warming it
+		self.last_used: Dict[str, float] = {}  # Host -> time.monotonic() of its last response
+		self.lock = threading.Lock()
+
+	def _on_response(self, response: httpx.Response) -> None:
+		with self.lock:
+			self.last_used[response.request.url.host] = time.monotonic()
+
+	def register(self, url: str) -> None:
+		"""Add a provider endpoint to keep warm."""
+		with self.lock:
+			self.warm_urls[httpx.URL(url).host] = url
+
+	def is_idle(self, host: str) -> bool:
+		last_used = self.last_used.get(host)
+		return last_used is None or time.monotonic() - last_used > self.idle_seconds
+
+	def warm_up(self, b_only_idle: bool = False) -> None:
+		"""Open connections to the registered hosts in the background, optionally only those gone idle."""
+		with self.lock:
+			urls = [url for host, url in self.warm_urls.items() if not b_only_idle or self.is_idle(host)]
+		for url in urls:
+			threading.Thread(target=self._warm, args=(url,), daemon=True).start()
+
+	def _warm(self, url: str) -> None:
+		try:
+			# Any response at all leaves a negotiated TLS connection in the pool.
+			self.client.head(url, timeout=5)
+		except httpx.HTTPError:
+			pass
+
+	def close(self) -> None:
+		self.client.close()
+
+_shared: Optional[HttpConnections] = None
+_shared_lock = threading.Lock()
+
+def shared_connections() -> HttpConnections:
+	"""The process-wide connection pool."""
+	global _shared
+	with _shared_lock:
+		if _shared is None:
+			_shared = HttpConnections()
+		return _shared
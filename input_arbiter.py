@@ -0,0 +1,111 @@
+import configparser
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from input_coalescer import InputCoalescer
+
+class InputArbiter:
+	"""
+	Sits between the operators' inputs (web pages, the gamepad) and the movement table. Each source's
+	presses are tracked separately, so a key stays held until every source holding it lets go, and a
+	key-up from one operator no longer drops another's hold. Keys that drive opposing valves (head
+	left/right, eyes left/right) form conflict groups, resolved by the configured policy:
+
+	- "latest": the most recent press in the group wins; the others resume when it is released.
+	- "priority": the key held by the highest priority source kind wins, then the most recent press.
+	- "refcount": while opposing keys are both held, the whole group goes neutral.
+
+	Net states are compared against the movement table's own key state (shows, retro mode and the
+	animations drive it directly too), and only differences reach execute_movement(), with releases
+	issued before presses so opposing valves are never open together.
+	"""
+	POLICIES = ("latest", "priority", "refcount")
+
+	def __init__(self, movements: Any, policy: str = "latest", priorities: Optional[List[str]] = None,
+				 conflicts: Optional[List[List[str]]] = None, journal: Optional[Any] = None) -> None:
+		self.movements = movements
+		self.journal = journal  # Records every event that comes in, for replaying later
+		self.policy: str = policy if policy in self.POLICIES else "latest"
+		self.priorities: List[str] = priorities or []  # Source kinds, highest priority first
+		self.groups: Dict[str, List[str]] = {}  # Key -> every key in its conflict group
+		for group in conflicts or []:
+			for key in group:
+				self.groups[key] = list(group)
+		self.holds: Dict[str, Dict[str, int]] = {}  # Key -> {source: press sequence number}
+		self.sequence: int = 0
+		self.lock = threading.Lock()
+
+	def source_priority(self, source: str) -> int:
+		kind = source.split(":")[0]
+		return len(self.priorities) - self.priorities.index(kind) if kind in self.priorities else 0
+
+	def press(self, source: str, key: str, val: int) -> bool:
+		"""Record one source's key event. Returns True if the net state of any key changed."""
+		key = str(key).lower()
+		with self.lock:
+			if self.journal:
+				self.journal.record_key(source, key, val)
+			if not self._set_hold(source, key, bool(val)):
+				return False
+			return self._apply({key})
+
+	def set_pose(self, source: str, keys: Iterable[str]) -> bool:
+		"""Make keys the complete set held by source."""
+		keys = {str(key).lower() for key in keys}
+		with self.lock:
+			if self.journal:
+				self.journal.record_pose(source, sorted(keys))
+			held = {key for key, sources in self.holds.items() if source in sources}
+			changed = {key for key in held - keys if self._set_hold(source, key, False)}
+			changed |= {key for key in keys - held if self._set_hold(source, key, True)}
+			return self._apply(changed)
+
+	def release_source(self, source: str) -> bool:
+		"""Drop every hold of a source, e.g. a web page that disconnected."""
+		return self.set_pose(source, [])
+
+	def _set_hold(self, source: str, key: str, b_pressed: bool) -> bool:
+		sources = self.holds.setdefault(key, {})
+		if b_pressed == (source in sources):
+			return False
+		if b_pressed:
+			self.sequence += 1
+			sources[source] = self.sequence
+		else:
+			del sources[source]
+		return True
+
+	def _net_states(self, keys: List[str]) -> Dict[str, int]:
+		held = [key for key in keys if self.holds.get(key)]
+		if len(held) < 2:
+			return {key: int(key in held) for key in keys}
+		if self.policy == "refcount":
+			return {key: 0 for key in keys}
+		if self.policy == "priority":
+			winner = max(held, key=lambda key: max((self.source_priority(source), sequence) for source, sequence in self.holds[key].items()))
+		else:
+			winner = max(held, key=lambda key: max(self.holds[key].values()))
+		return {key: int(key == winner) for key in keys}
+
+	def _apply(self, keys: Set[str]) -> bool:
+		states: Dict[str, int] = {}
+		for key in keys:
+			group = self.groups.get(key, [key])
+			states.update(self._net_states(group))
+		b_changed = False
+		for val in (0, 1):
+			for key, state in states.items():
+				if state == val and int(self.movements.is_key_pressed(key)) != state:
+					self.movements.execute_movement(key, state)
+					b_changed = True
+		return b_changed
+
+def create_input_arbiter(config: configparser.ConfigParser, movements: Any, journal: Optional[Any] = None,
+						 window_scale: float = 1.0) -> Tuple[InputArbiter, InputCoalescer]:
+	"""Build the arbiter and its coalescing stage from the [InputArbitration] section of config.cfg."""
+	priorities = [kind.strip() for kind in config.get("InputArbitration", "Priority", fallback="gamepad, web").split(",")]
+	conflicts = [group.split() for group in config.get("InputArbitration", "Conflicts", fallback="a d, q e").split(",")]
+	policy = config.get("InputArbitration", "Policy", fallback="latest").strip().lower()
+	window_seconds = config.getfloat("InputArbitration", "CoalesceWindowMs", fallback=20) / 1000 * window_scale
+	coalescer = InputCoalescer(movements, window_seconds)
+	arbiter = InputArbiter(coalescer, policy, priorities, [group for group in conflicts if len(group) > 1], journal)
+	return arbiter, coalescer
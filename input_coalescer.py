@@ -0,0 +1,85 @@
+import heapq
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+class InputCoalescer:
+	"""
+	Debounces movement commands on their way to the movement table. A key that has been quiet for
+	window_seconds passes straight through, so a deliberate press costs no latency. Presses arriving
+	within the window after that are held back and sent when the window closes, unless the key was
+	released again in the meantime. Releases are never held back: the input arbiter sends a release
+	before the press on an opposing key, and a delayed release would leave both valves open together.
+	"""
+	def __init__(self, movements: Any, window_seconds: float = 0.02) -> None:
+		self.movements = movements
+		self.window_seconds: float = window_seconds
+		self.emit_times: Dict[str, float] = {}  # Key -> time.monotonic() of that
+		self.pending: Dict[str, int] = {}  # Key -> newest state waiting for its window to close
+		self.deadlines: List[Tuple[float, str]] = []  # Heap of (time, key) when pending keys are flushed
+		self.received: int = 0
+		self.forwarded: int = 0
+		self.lock = threading.Condition()
+		self.thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	@property
+	def suppressed(self) -> int:
+		"""Events merged into a later one or cancelled out, never sent to the valves."""
+		with self.lock:
+			return self.received - self.forwarded - len(self.pending)
+
+	def execute_movement(self, key: str, val: int) -> bool:
+		"""Same call as Movement.execute_movement(), debounced per key."""
+		now = time.monotonic()
+		with self.lock:
+			self.received += 1
+			if not val:
+				# Drops any press still waiting; its deadline is skipped in run().
+				self.pending.pop(key, None)
+				return self._forward(key, val, now)
+			if key in self.pending:
+				self.pending[key] = val
+				return True
+			if now - self.emit_times.get(key, float("-inf")) >= self.window_seconds:
+				return self._forward(key, val, now)
+			self.pending[key] = val
+			heapq.heappush(self.deadlines, (self.emit_times[key] + self.window_seconds, key))
+			self.lock.notify()
+			return True
+
+	def is_key_pressed(self, key: str) -> bool:
+		"""The state the key is headed for: pending if a change is waiting, otherwise the movement table's."""
+		with self.lock:
+			if key in self.pending:
+				return bool(self.pending[key])
+		return self.movements.is_key_pressed(key)
+
+	def _forward(self, key: str, val: int, now: float) -> bool:
+		self.forwarded += 1
+		self.emit_times[key] = now
+		# Already journalled by the input arbiter under the source that sent it.
+		return self.movements.execute_movement(key, val, b_journal=False)
+
+	def run(self) -> None:
+		with self.lock:
+			while True:
+				if not self.deadlines:
+					self.lock.wait()
+					continue
+				deadline, key = self.deadlines[0]
+				now = time.monotonic()
+				if now < deadline:
+					self.lock.wait(deadline - now)
+					continue
+				heapq.heappop(self.deadlines)
+				# The press was cancelled by a release, or that release started a new window with its own deadline.
+				if key not in self.pending or now < self.emit_times[key] + self.window_seconds:
+					continue
+				val = self.pending.pop(key)
+				# Shows, retro mode and animations write to the movements directly, so check the table itself.
+				if val != int(self.movements.is_key_pressed(key)):
+					try:
+						self._forward(key, val, now)
+					except Exception as e:
+						print(f"Invalid key: {e}")
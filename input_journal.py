@@ -0,0 +1,226 @@
+import os
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+MAGIC = b"PQJ1"
+HEADER = struct.Struct("<4sdd")  # Magic, time.time() and time.monotonic() when the file was started
+RECORD = struct.Struct("<QBBBB")  # Microseconds since the file's monotonic start, kind, source id, code, value
+
+KIND_SOURCE = 0  # Names a source id: code is the name's length and the UTF-8 name follows
+KIND_KEY = 1  # code is the key character, value the new state
+KIND_POSE = 2  # code is the number of keys held, that many key characters follow
+KIND_MIDI = 3  # code is the MIDI note, value the new state
+KIND_DIRECT = 4  # A write straight to the movements (idle animations), bypassing the arbiter: code is the key character
+
+@dataclass
+class JournalEvent:
+	time: float = 0.0  # Wall-clock seconds when it happened (file start plus its monotonic offset)
+	kind: int = KIND_KEY
+	source: str = ""
+	code: int = 0  # Key character code or MIDI note
+	val: int = 0
+	keys: List[str] = field(default_factory=list)  # Pose only
+
+	@property
+	def key(self) -> str:
+		return chr(self.code)
+
+class InputJournal:
+	"""
+	Append-only binary record of every event that reaches the movement layer: operator key events and
+	poses as they enter the input arbiter (lip-sync included, as the "automation" source), show MIDI
+	notes, and the writes idle animations make straight to the movements. Records are 12 bytes plus the odd
+	source name, go through a buffered writer that is flushed every flush_seconds, and roll over to a
+	new file at max_megabytes, keeping the newest max_files files.
+	"""
+	def __init__(self, directory: str, max_megabytes: float = 8, max_files: int = 10, flush_seconds: float = 1.0) -> None:
+		self.directory: str = directory
+		self.max_bytes: int = int(max_megabytes * 1024 * 1024)
+		self.max_files: int = max_files
+		self.file: Optional[BinaryIO] = None
+		self.file_start: float = 0.0
+		self.file_bytes: int = 0
+		self.file_count: int = 0
+		self.sources: Dict[str, int] = {}  # Source name -> id, per file so every file stands alone
+		self.lock = threading.Lock()
+		self.b_running: bool = True
+		os.makedirs(directory, exist_ok=True)
+		self.thread = threading.Thread(target=self.flush_loop, args=(flush_seconds,), daemon=True)
+		self.thread.start()
+
+	def record_key(self, source: str, key: str, val: int) -> None:
+		if key:
+			self._write(KIND_KEY, source, ord(key[0]) & 0xFF, val)
+
+	def record_pose(self, source: str, keys: List[str]) -> None:
+		keys = [key[0] for key in keys if key][:255]
+		self._write(KIND_POSE, source, len(keys), 0, "".join(keys).encode("latin-1", "replace"))
+
+	def record_midi(self, source: str, note: int, val: int) -> None:
+		self._write(KIND_MIDI, source, int(note) & 0xFF, val)
+
+	def record_direct(self, key: str, val: int) -> None:
+		if key:
+			self._write(KIND_DIRECT, "direct", ord(key[0]) & 0xFF, val)
+
+	def _write(self, kind: int, source: str, code: int, val: int, extra: bytes = b"") -> None:
+		now = time.monotonic()
+		with self.lock:
+			if not self.b_running:
+				return
+			try:
+				if self.file is None or self.file_bytes >= self.max_bytes or len(self.sources) > 0xFF:
+					self._rotate()
+				source_id = self.sources.get(source)
+				if source_id is None:
+					source_id = len(self.sources)
+					self.sources[source] = source_id
+					name = source.encode("utf-8")[:255]
+					self._append(RECORD.pack(0, KIND_SOURCE, source_id, len(name), 0) + name)
+				offset = max(0, int((now - self.file_start) * 1_000_000))
+				self._append(RECORD.pack(offset, kind, source_id, code, 1 if val else 0) + extra)
+			except OSError as e:
+				print(f"Input journal write failed: {e}")
+
+	def _append(self, data: bytes) -> None:
+		self.file.write(data)
+		self.file_bytes += len(data)
+
+	def _rotate(self) -> None:
+		if self.file is not None:
+			self.file.close()
+		wall_start = time.time()
+		self.file_start = time.monotonic()
+		self.file_count += 1
+		# Names sort in recording order; the count keeps files rolled over within one microsecond apart.
+		name = time.strftime("input-%Y%m%d-%H%M%S", time.localtime(wall_start)) + f"-{int(wall_start * 1_000_000) % 1_000_000:06d}-{self.file_count:04d}.pqj"
+		self.file = open(os.path.join(self.directory, name), "wb", buffering=64 * 1024)
+		self.file_bytes = 0
+		self.sources = {}
+		self._append(HEADER.pack(MAGIC, wall_start, self.file_start))
+		for old_path in journal_files(self.directory)[:-self.max_files]:
+			try:
+				os.remove(old_path)
+			except OSError:
+				pass
+
+	def flush_loop(self, flush_seconds: float) -> None:
+		while self.b_running:
+			time.sleep(flush_seconds)
+			with self.lock:
+				if self.file is not None:
+					self.file.flush()
+
+	def close(self) -> None:
+		with self.lock:
+			self.b_running = False
+			if self.file is not None:
+				self.file.close()
+				self.file = None
+
+def journal_files(path: str) -> List[str]:
+	"""A journal file, or every journal file in a directory, oldest first."""
+	if os.path.isfile(path):
+		return [path]
+	return sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".pqj"))
+
+def read_journal(paths: List[str]) -> Iterator[JournalEvent]:
+	"""Events from journal files in order. A record cut short by a crash ends its file."""
+	for path in paths:
+		with open(path, "rb") as f:
+			data = f.read()
+		if len(data) < HEADER.size or data[:4] != MAGIC:
+			print(f"Not an input journal: {path}")
+			continue
+		# Offsets are monotonic within a file; anchoring them to the wall clock keeps files from different boots in order.
+		_, file_start, _ = HEADER.unpack_from(data)
+		sources: Dict[int, str] = {}
+		position = HEADER.size
+		while position + RECORD.size <= len(data):
+			offset, kind, source_id, code, val = RECORD.unpack_from(data, position)
+			position += RECORD.size
+			extra_length = code if kind in (KIND_SOURCE, KIND_POSE) else 0
+			if position + extra_length > len(data):
+				break
+			extra = data[position:position + extra_length]
+			position += extra_length
+			if kind == KIND_SOURCE:
+				sources[source_id] = extra.decode("utf-8", "replace")
+				continue
+			keys = list(extra.decode("latin-1")) if kind == KIND_POSE else []
+			yield JournalEvent(file_start + offset / 1_000_000, kind, sources.get(source_id, "?"), code, val, keys)
+
+def replay(events: List[JournalEvent], arbiter: Any, movements: Any, speed: float = 1.0) -> None:
+	"""
+	Feed events back in with their original spacing divided by speed (0 = as fast as possible). Key
+	events and poses go through the arbiter, and show notes and direct writes straight to the
+	movements, as they did live.
+	"""
+	if not events:
+		return
+	start_time = time.monotonic()
+	first_time = events[0].time
+	for event in events:
+		if speed > 0:
+			delay = start_time + (event.time - first_time) / speed - time.monotonic()
+			if delay > 0:
+				time.sleep(delay)
+		if event.kind == KIND_KEY:
+			arbiter.press(event.source, event.key, event.val)
+		elif event.kind == KIND_POSE:
+			arbiter.set_pose(event.source, event.keys)
+		elif event.kind == KIND_MIDI:
+			movements.execute_midi_note(event.code, event.val)
+		elif event.kind == KIND_DIRECT:
+			movements.execute_movement(event.key, event.val)
+
+
+if __name__ == "__main__":
+	# Replay a journal into simulated hardware: python3 input_journal.py <journal dir or file> [--speed N] [--trace]
+	# --speed 0 replays as fast as possible and reports dispatch throughput.
+	import argparse
+	import configparser
+	from animatronic_movements import Movement
+	from gpio import SimulatedGPIO
+	from input_arbiter import create_input_arbiter
+	from midi import SimulatedMIDI
+
+	parser = argparse.ArgumentParser(description="Replay a recorded input journal into simulated GPIO.")
+	parser.add_argument("path", help="Journal file or directory")
+	parser.add_argument("--speed", type=float, default=1.0, help="Playback speed multiplier; 0 for as fast as possible")
+	parser.add_argument("--trace", action="store_true", help="Print every event with the valve latches after it")
+	args = parser.parse_args()
+
+	journal_events = list(read_journal(journal_files(args.path)))
+	if not journal_events:
+		raise SystemExit("No events recorded.")
+	recorded_seconds = journal_events[-1].time - journal_events[0].time
+	print(f"{len(journal_events)} events over {recorded_seconds:.1f} s from {len({event.source for event in journal_events})} sources")
+
+	config = configparser.ConfigParser()
+	config.read(os.path.join(os.path.dirname(os.path.realpath(__file__)), "config.cfg"))
+	gpio = SimulatedGPIO()
+	midi = SimulatedMIDI()
+	movements = Movement(gpio, midi)
+	# The debounce window shrinks with the playback speed so events coalesce as they did live. Tracing steps
+	# through the events without their timing, so it (like --speed 0) turns the window off.
+	window_scale = 1 / args.speed if args.speed > 0 and not args.trace else 0
+	arbiter, coalescer = create_input_arbiter(config, movements, window_scale=window_scale)
+
+	if args.trace:
+		start = journal_events[0].time
+		for journal_event in journal_events:
+			replay([journal_event], arbiter, movements, 0)
+			detail = " ".join(journal_event.keys) if journal_event.kind == KIND_POSE else f"{journal_event.code} {journal_event.val}"
+			print(f"{journal_event.time - start:10.4f}  {journal_event.source:<16} kind {journal_event.kind}  {detail:<12} latches {gpio.get_latches().hex()}")
+	else:
+		start_time = time.perf_counter()
+		replay(journal_events, arbiter, movements, args.speed)
+		elapsed = time.perf_counter() - start_time
+		print(f"Replayed in {elapsed:.3f} s ({len(journal_events) / max(elapsed, 1e-9):,.0f} events/s)")
+	time.sleep(coalescer.window_seconds * 2)
+	print(f"Valve writes: {gpio.writes}, MIDI messages: {midi.messages}, suppressed inputs: {coalescer.suppressed}")
+	print(f"Final latches: {gpio.get_latches().hex()}")
@@ -0,0 +1,54 @@
+from typing import Any, List, Tuple
+
+class KeyProtocol:
+	"""
+	Compact binary key events for the web keypad. An events message is one byte per event: the low
+	7 bits index the key table and the high bit is the new state. A pose message is a bitmask over
+	the key table (bit i lives in byte i // 8) giving every key the sending page holds.
+
+	The key table is captured at startup, before mirroring can swap keys around, so an index always
+	means the key the operator pressed and mirroring still applies in execute_movement(). Events go
+	through the input arbiter under the sending page's own source name.
+	"""
+	STATE_BIT = 0x80
+	INDEX_MASK = 0x7F
+
+	def __init__(self, movements: Any, arbiter: Any) -> None:
+		self.arbiter = arbiter
+		self.keys: List[str] = [movement.key for movement in movements.all][:self.INDEX_MASK + 1]
+
+	@classmethod
+	def encode_event(cls, index: int, val: int) -> int:
+		return (index & cls.INDEX_MASK) | (cls.STATE_BIT if val else 0)
+
+	def decode_events(self, data: bytes) -> List[Tuple[str, int]]:
+		events = []
+		for byte in bytes(data):
+			index = byte & self.INDEX_MASK
+			if index < len(self.keys):
+				events.append((self.keys[index], 1 if byte & self.STATE_BIT else 0))
+		return events
+
+	def apply_events(self, data: bytes, source: str = "web") -> None:
+		try:
+			for key, val in self.decode_events(data):
+				self.arbiter.press(source, key, val)
+		except Exception as e:
+			print(f"Invalid key event message: {e}")
+
+	def encode_pose(self, pressed_keys: List[str]) -> bytes:
+		pose = 0
+		for index, key in enumerate(self.keys):
+			if key in pressed_keys:
+				pose |= 1 << index
+		return pose.to_bytes((len(self.keys) + 7) // 8, "little")
+
+	def apply_pose(self, data: bytes, source: str = "web") -> None:
+		try:
+			pose = int.from_bytes(bytes(data), "little")
+			self.arbiter.set_pose(source, [key for index, key in enumerate(self.keys) if pose >> index & 1])
+		except Exception as e:
+			print(f"Invalid pose message: {e}")
+
+	def release_source(self, source: str) -> None:
+		self.arbiter.release_source(source)
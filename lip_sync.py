@@ -0,0 +1,187 @@
+import time
+import numpy as np
+from enum import Enum
+from dataclasses import dataclass
+from pydispatch import dispatcher
+from typing import Callable, Dict, List, Optional, Tuple
+
+class Viseme(Enum):
+	REST = 'rest'            # Silence: mouth closed
+	VOWEL = 'vowel'          # Low-band dominated voiced sound: mouth open
+	FRICATIVE = 'fricative'  # High-band dominated hiss (s, f, sh): mouth nearly closed
+	PLOSIVE = 'plosive'      # Sudden broadband burst (p, b, t): mouth pops open, mustache twitches
+
+@dataclass
+class LipSyncEvent:
+	time: float = 0.0  # Seconds from the start of the audio at which to issue the command
+	key: str = ''  # Movement key
+	val: int = 0  # 1 = pressed, 0 = released
+
+class LipSync:
+	"""
+	Turns speech audio into a timed list of movement transitions. Each analysis window is
+	classified into a viseme from its loudness and band energies, then converted into mouth,
+	mustache and eyelid state changes that are issued ahead of time to cover valve lag.
+	"""
+	def __init__(self, interval_ms: int = 25, threshold: float = 0.15, lead_times: Optional[Dict[str, Tuple[float, float]]] = None) -> None:
+		self.interval_ms: int = interval_ms
+		self.threshold: float = threshold  # Normalized RMS needed to open the mouth
+		self.close_ratio: float = 0.7  # Hysteresis: the mouth closes below threshold * close_ratio
+		self.fricative_ratio: float = 0.55  # Share of energy above 2.5 kHz that marks a fricative
+		self.plosive_rise: float = 0.25  # Jump in normalized RMS between windows that marks a plosive burst
+
+		self.mouth_key: str = 'x'
+		self.mustache_key: str = 'z'
+		self.eyelid_key: str = 'w'
+
+		self.min_mouth_open: float = 0.05  # Seconds; shorter openings are merged away to stop valve chatter
+		self.min_mouth_closed: float = 0.04
+		self.mustache_pulse: float = 0.08  # Length of a mustache twitch on a plosive
+		self.blink_pause: float = 0.35  # A pause this long after speech counts as a phrase boundary
+		self.blink_length: float = 0.12
+
+		# (open, close) seconds to issue each key early so the valve lands on the sound; see Movement.get_lead_times().
+		self.lead_times: Dict[str, Tuple[float, float]] = lead_times or {}
+
+	def set_lead_times(self, lead_times: Dict[str, Tuple[float, float]]) -> None:
+		self.lead_times = dict(lead_times)
+
+	def lead_time(self, key: str, val: int) -> float:
+		open_lead, close_lead = self.lead_times.get(key, (0.0, 0.0))
+		return open_lead if val else close_lead
+
+	def features(self, pcm: np.ndarray, sample_rate: int, envelope: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+		"""Vectorized per-window loudness and high-band energy ratio."""
+		window_size = int(sample_rate * self.interval_ms / 1000.0)
+		mono = np.asarray(pcm, dtype=np.float32)
+		if mono.ndim > 1:
+			mono = mono.mean(axis=1)
+		num_windows = max(1, (len(mono) + window_size - 1) // window_size)
+		frames = np.zeros(num_windows * window_size, dtype=np.float32)
+		frames[:len(mono)] = mono
+		frames = frames.reshape(num_windows, window_size)
+
+		if envelope is not None and len(envelope) >= num_windows:
+			rms = np.asarray(envelope[:num_windows], dtype=np.float32)
+		else:
+			# Same normalization as AutomatedPuppeteering.calculate_rms, so thresholds mean the same thing.
+			peak = float(np.max(np.abs(mono))) or 1.0
+			rms = np.sqrt(np.mean(frames ** 2, axis=1)) / peak
+			rms = np.minimum(rms, 1.0)
+
+		power = np.abs(np.fft.rfft(frames * np.hanning(window_size), axis=1)) ** 2
+		freqs = np.fft.rfftfreq(window_size, 1.0 / sample_rate)
+		low = power[:, (freqs >= 80) & (freqs < 1000)].sum(axis=1)
+		high = power[:, freqs >= 2500].sum(axis=1)
+		high_ratio = high / (low + high + 1e-9)
+		return {'rms': rms, 'high_ratio': high_ratio}
+
+	def classify(self, pcm: np.ndarray, sample_rate: int, envelope: Optional[np.ndarray] = None) -> List[Viseme]:
+		feats = self.features(pcm, sample_rate, envelope)
+		rms = feats['rms']
+		high_ratio = feats['high_ratio']
+		rise = np.diff(rms, prepend=0.0)
+
+		visemes: List[Viseme] = []
+		b_open = False
+		for level, ratio, jump in zip(rms, high_ratio, rise):
+			# Hysteresis keeps the mouth from flickering around the threshold.
+			b_open = level > (self.threshold * self.close_ratio if b_open else self.threshold)
+			if not b_open:
+				visemes.append(Viseme.REST)
+			elif jump > self.plosive_rise:
+				visemes.append(Viseme.PLOSIVE)
+			elif ratio > self.fricative_ratio:
+				visemes.append(Viseme.FRICATIVE)
+			else:
+				visemes.append(Viseme.VOWEL)
+		return visemes
+
+	def _merge_short_runs(self, states: List[int], min_open: int, min_closed: int) -> List[int]:
+		"""Absorb runs too short for the valve to act on into the run before them."""
+		merged = list(states)
+		i = 0
+		while i < len(merged):
+			j = i
+			while j < len(merged) and merged[j] == merged[i]:
+				j += 1
+			min_len = min_open if merged[i] else min_closed
+			if i > 0 and j < len(merged) and (j - i) < min_len:
+				for k in range(i, j):
+					merged[k] = merged[i - 1]
+			i = j
+		return merged
+
+	def plan(self, visemes: List[Viseme]) -> List[LipSyncEvent]:
+		"""Convert visemes into only the state transitions, shifted earlier by each key's lead time."""
+		interval = self.interval_ms / 1000.0
+		windows = lambda seconds: max(1, int(round(seconds / interval)))
+
+		mouth = [1 if v in (Viseme.VOWEL, Viseme.PLOSIVE) else 0 for v in visemes]
+		mouth = self._merge_short_runs(mouth, windows(self.min_mouth_open), windows(self.min_mouth_closed))
+
+		events: List[LipSyncEvent] = []
+		state = 0
+		for i, val in enumerate(mouth):
+			if val != state:
+				events.append(LipSyncEvent(i * interval, self.mouth_key, val))
+				state = val
+		end_time = len(visemes) * interval
+		if state:
+			events.append(LipSyncEvent(end_time, self.mouth_key, 0))
+
+		# Mustache twitches on plosive bursts.
+		last_twitch = -1.0
+		for i, v in enumerate(visemes):
+			t = i * interval
+			if v == Viseme.PLOSIVE and t - last_twitch > self.mustache_pulse * 2:
+				events.append(LipSyncEvent(t, self.mustache_key, 1))
+				events.append(LipSyncEvent(t + self.mustache_pulse, self.mustache_key, 0))
+				last_twitch = t
+
+		# Blink at phrase boundaries: a long enough pause that follows speech.
+		pause_windows = windows(self.blink_pause)
+		silent_run = 0
+		b_spoken = False
+		for i, v in enumerate(visemes):
+			if v == Viseme.REST:
+				silent_run += 1
+				if b_spoken and silent_run == pause_windows:
+					t = (i - pause_windows + 1) * interval
+					events.append(LipSyncEvent(t, self.eyelid_key, 1))
+					events.append(LipSyncEvent(t + self.blink_length, self.eyelid_key, 0))
+					b_spoken = False
+			else:
+				silent_run = 0
+				b_spoken = True
+
+		events.sort(key=lambda e: e.time)
+		last_time_per_key: Dict[str, float] = {}
+		for event in events:
+			issue_time = max(0.0, event.time - self.lead_time(event.key, event.val))
+			# Different open/close leads must never swap the order of transitions on the same key.
+			issue_time = max(issue_time, last_time_per_key.get(event.key, 0.0))
+			last_time_per_key[event.key] = issue_time
+			event.time = issue_time
+		events.sort(key=lambda e: e.time)
+		return events
+
+	def perform(self, events: List[LipSyncEvent], start_time: float, b_keep_going: Optional[Callable[[], bool]] = None) -> None:
+		"""
+		Issue each event at start_time + event.time (monotonic clock), sleeping in between rather than
+		polling. If b_keep_going returns False the performance stops and anything still held is released.
+		"""
+		held: Dict[str, int] = {}
+		for event in events:
+			if b_keep_going is not None and not b_keep_going():
+				break
+			sleep_duration = start_time + event.time - time.monotonic()
+			if sleep_duration > 0:
+				time.sleep(sleep_duration)
+			if held.get(event.key, 0) != event.val:
+				held[event.key] = event.val
+				dispatcher.send(signal="keyEvent", key=event.key, val=event.val)
+
+		for key, val in held.items():
+			if val:
+				dispatcher.send(signal="keyEvent", key=key, val=0)
@@ -0,0 +1,161 @@
+import os
+import queue
+import threading
+import time
+import wave
+import numpy as np
+from typing import Any, Iterator, List, Optional, Tuple
+
+class SpeechStream:
+	"""PCM for one utterance, produced sentence by sentence by the LocalTTS worker."""
+	def __init__(self, text: str, sample_rate: int) -> None:
+		self.text: str = text
+		self.sample_rate: int = sample_rate
+		self.chunks: "queue.Queue[Optional[np.ndarray]]" = queue.Queue()  # None marks the end
+		self.pieces: List[np.ndarray] = []  # Everything produced so far, for saving afterwards
+		self.error: Optional[Exception] = None
+		self.first_chunk = threading.Event()
+		self.cancelled = threading.Event()
+
+	def put(self, pcm: Optional[np.ndarray]) -> None:
+		if pcm is not None:
+			self.pieces.append(pcm)
+		self.chunks.put(pcm)
+		self.first_chunk.set()
+
+	def cancel(self) -> None:
+		"""Stop synthesis after the current sentence, e.g. when another voice won the race to speak."""
+		self.cancelled.set()
+
+	def wait_for_audio(self, timeout: Optional[float] = None) -> bool:
+		"""Block until the first sentence is ready (or synthesis failed). Raises the synthesis error if any."""
+		ready = self.first_chunk.wait(timeout)
+		if self.error is not None:
+			raise self.error
+		return ready
+
+	def __iter__(self) -> Iterator[np.ndarray]:
+		while True:
+			pcm = self.chunks.get()
+			if pcm is None:
+				return
+			yield pcm
+
+	def pcm(self) -> np.ndarray:
+		return np.concatenate(self.pieces) if self.pieces else np.zeros(0, dtype=np.int16)
+
+	def save_wav(self, file_path: str) -> str:
+		with wave.open(file_path, "wb") as wf:
+			wf.setnchannels(1)
+			wf.setsampwidth(2)
+			wf.setframerate(self.sample_rate)
+			wf.writeframes(self.pcm().tobytes())
+		return file_path
+
+class LocalTTS:
+	"""
+	Keeps a Piper voice loaded in a long-lived worker thread for the life of the program, instead of
+	starting the piper command (and reloading the ONNX model) for every utterance. Each request comes
+	back as a SpeechStream that fills one sentence at a time, so playback can start after the first.
+	"""
+	def __init__(self, model_path: str, config_path: Optional[str] = None) -> None:
+		self.model_path: str = model_path
+		self.config_path: Optional[str] = config_path
+		self.voice: Optional[Any] = None
+		self.sample_rate: int = 22050  # Replaced by the voice's own rate once loaded
+		self.load_error: Optional[Exception] = None
+		self.loaded = threading.Event()
+
+		self.jobs: "queue.Queue[Optional[SpeechStream]]" = queue.Queue()
+		self.thread: threading.Thread = threading.Thread(target=self.run, daemon=True)
+		self.thread.start()
+
+	def load(self) -> None:
+		from piper.voice import PiperVoice  # Installed by setup.py as piper-tts
+		self.voice = PiperVoice.load(self.model_path, config_path=self.config_path)
+		self.sample_rate = self.voice.config.sample_rate
+
+	def is_ready(self) -> bool:
+		return self.voice is not None
+
+	def _sentences(self, text: str) -> Iterator[np.ndarray]:
+		if hasattr(self.voice, "synthesize_stream_raw"):
+			# piper-tts 1.2: raw int16 bytes per sentence
+			for audio_bytes in self.voice.synthesize_stream_raw(text):
+				yield np.frombuffer(audio_bytes, dtype=np.int16)
+		else:
+			# piper-tts 1.3+: AudioChunk objects per sentence
+			for chunk in self.voice.synthesize(text):
+				yield np.frombuffer(chunk.audio_int16_bytes, dtype=np.int16)
+
+	def run(self) -> None:
+		try:
+			self.load()
+		except Exception as e:
+			print(f"Local TTS voice could not be loaded: {e}")
+			self.load_error = e
+		self.loaded.set()
+
+		while True:
+			stream = self.jobs.get()
+			if stream is None:
+				return
+			if stream.cancelled.is_set():
+				stream.put(None)
+				continue
+			stream.sample_rate = self.sample_rate
+			try:
+				if self.voice is None:
+					raise RuntimeError(f"Local TTS voice not loaded: {self.load_error}")
+				for pcm in self._sentences(stream.text):
+					# Checked between sentences so a cancelled stream frees the worker for the next utterance.
+					if stream.cancelled.is_set():
+						break
+					stream.put(pcm)
+			except Exception as e:
+				stream.error = e
+			stream.put(None)
+
+	def stream(self, text: str) -> SpeechStream:
+		"""Queue text for synthesis and return its stream straight away."""
+		stream = SpeechStream(text, self.sample_rate)
+		self.jobs.put(stream)
+		return stream
+
+	def shutdown(self) -> None:
+		self.jobs.put(None)
+
+
+if __name__ == "__main__":
+	# Benchmark: python3 local_tts.py ["text to speak" ...]
+	import sys
+
+	script_dir = os.path.dirname(os.path.realpath(__file__))
+	sentences = sys.argv[1:] or [
+		"Hello, I'm Pasqually!",
+		"Itsa wonderful day to make a pizza. Letsa sing a song together, my friends!",
+		"I was born in 1981, fell into disrepair, and now I'm back to entertain you all once again.",
+	]
+
+	start_time = time.monotonic()
+	tts = LocalTTS(os.path.join(script_dir, "en_US-ryan-low.onnx"), os.path.join(script_dir, "en_US-ryan-low.json"))
+	tts.loaded.wait()
+	if not tts.is_ready():
+		sys.exit(1)
+	print(f"Model loaded in {(time.monotonic() - start_time) * 1000:.0f} ms ({tts.sample_rate} Hz)")
+
+	results: List[Tuple[float, float]] = []
+	for text in sentences:
+		start_time = time.monotonic()
+		speech = tts.stream(text)
+		speech.wait_for_audio()
+		first_audio = time.monotonic() - start_time
+		for _ in speech:
+			pass
+		total = time.monotonic() - start_time
+		audio_seconds = len(speech.pcm()) / speech.sample_rate
+		results.append((first_audio, total / max(audio_seconds, 1e-9)))
+		print(f"{audio_seconds:5.2f}s audio: first audio after {first_audio * 1000:.0f} ms, "
+			  f"done in {total * 1000:.0f} ms, RTF {total / max(audio_seconds, 1e-9):.2f}  \"{text[:40]}\"")
+	print(f"Mean first audio {np.mean([r[0] for r in results]) * 1000:.0f} ms, mean RTF {np.mean([r[1] for r in results]):.2f}")
+	tts.shutdown()
@@ -60,6 +60,14 @@ class MIDI:
 		self.outport.send(msg)
 		# print(f"Sent MIDI message: {msg}")
 
+class SimulatedMIDI:
+	"""Stands in for the MIDI ports when replaying recorded input off the Pi; only counts messages."""
+	def __init__(self) -> None:
+		self.messages: int = 0
+
+	def send_message(self, note: int, value: int) -> None:
+		self.messages += 1
+
 # Example usage:
 if __name__ == "__main__":
 	midi = MIDI()
@@ -0,0 +1,393 @@
+import configparser
+import heapq
+import itertools
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+OSC_PREFIX = "/pasqually/"
+OSC_IMMEDIATELY = 1  # The OSC timetag meaning "as soon as it arrives"
+OSC_MAX_AHEAD_SECONDS = 10  # Timetags further ahead than this mean the sender's clock isn't synced; they play on arrival
+NTP_EPOCH_OFFSET = 2208988800  # Seconds from 1900 (OSC timetags) to 1970 (time.time())
+APPLEMIDI_SIGNATURE = 0xFFFF
+APPLEMIDI_CLOCK_RATE = 10000  # AppleMIDI timestamps and RTP-MIDI delta times count 100 µs ticks
+VELOCITY_ON = 100  # Like the local MIDI port, a note opens its valve at this velocity or more
+
+# Data bytes after each MIDI status (high nibble for channel messages, full byte for system common)
+CHANNEL_DATA_LENGTHS = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+SYSTEM_DATA_LENGTHS = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+def read_osc_string(data: bytes, position: int) -> Tuple[str, int]:
+	end = data.index(b"\0", position)
+	return data[position:end].decode("utf-8", "replace"), (end + 4) & ~3
+
+def parse_osc_message(data: bytes) -> Tuple[str, List[Any]]:
+	"""Address and arguments of one OSC message. Arguments stop at the first type this doesn't read."""
+	address, position = read_osc_string(data, 0)
+	if position >= len(data) or data[position:position + 1] != b",":
+		return address, []
+	type_tags, position = read_osc_string(data, position)
+	args: List[Any] = []
+	for tag in type_tags[1:]:
+		if tag == "i":
+			args.append(struct.unpack_from(">i", data, position)[0])
+			position += 4
+		elif tag == "f":
+			args.append(struct.unpack_from(">f", data, position)[0])
+			position += 4
+		elif tag == "h":
+			args.append(struct.unpack_from(">q", data, position)[0])
+			position += 8
+		elif tag == "d":
+			args.append(struct.unpack_from(">d", data, position)[0])
+			position += 8
+		elif tag == "s":
+			value, position = read_osc_string(data, position)
+			args.append(value)
+		elif tag in "TF":
+			args.append(tag == "T")
+		else:
+			break
+	return address, args
+
+def parse_osc_packet(data: bytes, timetag: int = OSC_IMMEDIATELY) -> List[Tuple[int, str, List[Any]]]:
+	"""Every message in an OSC packet as (timetag, address, args), unpacking nested bundles."""
+	if not data.startswith(b"#bundle\0"):
+		return [(timetag, *parse_osc_message(data))]
+	bundle_timetag = struct.unpack_from(">Q", data, 8)[0]
+	messages = []
+	position = 16
+	while position + 4 <= len(data):
+		size = struct.unpack_from(">i", data, position)[0]
+		position += 4
+		messages.extend(parse_osc_packet(data[position:position + size], bundle_timetag))
+		position += size
+	return messages
+
+def parse_rtp_midi(data: bytes) -> Tuple[int, int, List[Tuple[int, int, int, int]]]:
+	"""
+	SSRC, RTP timestamp and MIDI commands of an RTP-MIDI packet (RFC 6295). Commands are (timestamp
+	of the command, status, data1, data2); the recovery journal after the command list is skipped.
+	"""
+	if len(data) < 13 or data[0] & 0xC0 != 0x80:
+		return 0, 0, []
+	timestamp, ssrc = struct.unpack_from(">II", data, 4)
+	position = 12 + (data[0] & 0x0F) * 4  # Skip any CSRC entries
+	flags = data[position]
+	length = flags & 0x0F
+	position += 1
+	if flags & 0x80:
+		length = (length << 8) | data[position]
+		position += 1
+	end = min(len(data), position + length)
+
+	commands = []
+	command_time = timestamp
+	running_status = 0
+	b_has_delta = bool(flags & 0x20)
+	while position < end:
+		if b_has_delta:
+			delta = 0
+			for _ in range(4):
+				byte = data[position]
+				position += 1
+				delta = (delta << 7) | (byte & 0x7F)
+				if not byte & 0x80:
+					break
+			command_time += delta
+		b_has_delta = True
+		if position >= end:
+			break
+		status = data[position]
+		if status & 0x80:
+			position += 1
+			if status < 0xF0:
+				running_status = status
+			elif status < 0xF8:
+				running_status = 0
+		else:
+			status = running_status
+			if not status:
+				break
+		if status == 0xF0 or status == 0xF7:
+			# SysEx (or a segment of one) runs to the next end, cancel or continue marker
+			while position < end and data[position] not in (0xF0, 0xF4, 0xF7):
+				position += 1
+			position += 1
+			continue
+		data_length = CHANNEL_DATA_LENGTHS.get(status & 0xF0, 0) if status < 0xF0 else SYSTEM_DATA_LENGTHS.get(status, 0)
+		command = data[position:position + data_length]
+		position += data_length
+		if len(command) == data_length:
+			commands.append((command_time, status, command[0] if data_length else 0, command[1] if data_length > 1 else 0))
+	return ssrc, timestamp, commands
+
+class JitterBuffer:
+	"""
+	Maps one RTP-MIDI sender's session clock onto the local clock. The smallest arrival-minus-timestamp
+	of the packets seen over the last window or two is taken as the path's base latency, and each
+	event is played delay_seconds after that, so the spacing the sender intended survives network
+	jitter up to the delay. Events later than that play as soon as they arrive.
+	"""
+	def __init__(self, delay_seconds: float, window_seconds: float = 10.0) -> None:
+		self.delay_seconds: float = delay_seconds
+		self.window_seconds: float = window_seconds
+		self.window_start: float = float("-inf")
+		self.previous_min: float = float("inf")
+		self.current_min: float = float("inf")
+
+	def observe(self, sender_seconds: float, arrival: float) -> None:
+		"""Note a packet sent at sender_seconds (its last command) that arrived at arrival."""
+		if arrival - self.window_start >= self.window_seconds:
+			# Two overlapping windows let the estimate follow clock drift without ever jumping up mid-burst.
+			self.previous_min, self.current_min, self.window_start = self.current_min, float("inf"), arrival
+		self.current_min = min(self.current_min, arrival - sender_seconds)
+
+	def due_time(self, sender_seconds: float) -> float:
+		return sender_seconds + min(self.previous_min, self.current_min) + self.delay_seconds
+
+class NetworkMIDI:
+	"""
+	Lets show consoles and lighting desks on the network drive the movements, over OSC or RTP-MIDI
+	(the protocol behind macOS "Network" MIDI sessions), without going through the web page.
+
+	Notes map to movements through the same midi_note table the local MIDI port uses, captured at
+	startup like the web key table, so mirroring still applies. RTP-MIDI timestamps go through a
+	per-sender jitter buffer; OSC bundle timetags are absolute wall-clock times, as the spec has
+	them, so a rig with a synced clock can schedule ahead and have events land exactly. Events then
+	go through the input arbiter as "osc:<ip>" or "rtpmidi:<ip>" sources.
+
+	OSC messages: /pasqually/note <note> <value>, /pasqually/key <key> <value> and
+	/pasqually/pose <keys held, e.g. "ax">. Values of 0.5 or more press. OSC runs over plain UDP with
+	no goodbye, so a sender silent for osc_idle_seconds is taken to be gone and what it holds is
+	released, as a web page's is when it disconnects.
+	"""
+	def __init__(self, movements: Any, arbiter: Any, osc_port: int = 9000, rtp_midi_port: int = 5004,
+				 jitter_buffer_ms: float = 5, session_name: str = "Pasqually", osc_idle_seconds: float = 30) -> None:
+		self.arbiter = arbiter
+		self.note_keys: List[Optional[str]] = [None] * 128
+		for movement in movements.all:
+			if movement.key and 0 <= movement.midi_note < 128:
+				self.note_keys[movement.midi_note] = movement.key
+		self.delay_seconds: float = jitter_buffer_ms / 1000
+		self.session_name: str = session_name
+		self.ssrc: int = int.from_bytes(session_name.encode("utf-8")[:4].ljust(4, b"\0"), "big") ^ int(time.time())
+		self.clock_start: float = time.monotonic()
+		self.buffers: Dict[int, JitterBuffer] = {}  # RTP-MIDI sender SSRC -> its jitter buffer
+		self.sessions: Dict[int, str] = {}  # RTP-MIDI sender SSRC -> source name
+		self.osc_idle_seconds: float = osc_idle_seconds  # 0 keeps OSC holds until the sender releases them
+		self.osc_last_seen: Dict[str, float] = {}  # OSC source -> time.monotonic() of its last message (or latest scheduled event)
+		self.received: int = 0
+		self.late: int = 0  # Events that arrived after their slot in the jitter buffer
+
+		self.queue: List[Tuple[float, int, str, Any, int]] = []  # Heap of (due time, sequence, source, key or keys, value)
+		self.sequence = itertools.count()
+		self.lock = threading.Condition()
+		self.b_running: bool = True
+
+		self.sockets: Dict[socket.socket, str] = {}
+		self.open_socket(osc_port, "osc")
+		if rtp_midi_port:
+			self.open_socket(rtp_midi_port, "control")
+			self.open_socket(rtp_midi_port + 1, "data")
+		self.zeroconf = self.advertise(rtp_midi_port) if rtp_midi_port else None
+
+		self.threads: List[threading.Thread] = [threading.Thread(target=self.receive_loop, daemon=True),
+												 threading.Thread(target=self.play_loop, daemon=True)]
+		for thread in self.threads:
+			thread.start()
+
+	def open_socket(self, port: int, role: str) -> None:
+		if not port:
+			return
+		try:
+			sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+			sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+			sock.bind(("0.0.0.0", port))
+			self.sockets[sock] = role
+			print(f"Listening for {'OSC' if role == 'osc' else 'RTP-MIDI ' + role} on UDP port {port}")
+		except OSError as e:
+			print(f"Could not open UDP port {port}: {e}")
+
+	def advertise(self, port: int) -> Optional[Any]:
+		"""Announce the RTP-MIDI session over Bonjour so it shows up in macOS Audio MIDI Setup."""
+		try:
+			from zeroconf import ServiceInfo, Zeroconf  # Optional dependency: pip install zeroconf
+		except ImportError:
+			return None
+		try:
+			zeroconf = Zeroconf()
+			zeroconf.register_service(ServiceInfo("_apple-midi._udp.local.", f"{self.session_name}._apple-midi._udp.local.",
+												  port=port, server=f"{socket.gethostname()}.local."))
+			return zeroconf
+		except Exception as e:
+			print(f"Could not advertise the RTP-MIDI session: {e}")
+			return None
+
+	def clock(self) -> int:
+		"""Our session clock in 100 µs ticks, for AppleMIDI clock sync."""
+		return int((time.monotonic() - self.clock_start) * APPLEMIDI_CLOCK_RATE)
+
+	def receive_loop(self) -> None:
+		while self.b_running:
+			try:
+				readable, _, _ = select.select(list(self.sockets), [], [], 0.5)
+			except (OSError, ValueError):
+				return
+			for sock in readable:
+				try:
+					data, address = sock.recvfrom(65535)
+				except OSError:
+					continue
+				arrival = time.monotonic()
+				try:
+					role = self.sockets[sock]
+					if role == "osc":
+						self.on_osc(data, address, arrival)
+					elif len(data) >= 4 and struct.unpack_from(">H", data)[0] == APPLEMIDI_SIGNATURE:
+						self.on_session(sock, data, address)
+					elif role == "data":
+						self.on_rtp_midi(data, address, arrival)
+				except (IndexError, ValueError, struct.error) as e:
+					print(f"Invalid network MIDI packet from {address[0]}: {e}")
+			self.release_idle_osc(time.monotonic())
+
+	def release_idle_osc(self, now: float) -> None:
+		if self.osc_idle_seconds <= 0:
+			return
+		for source, last_seen in list(self.osc_last_seen.items()):
+			if now - last_seen >= self.osc_idle_seconds:
+				del self.osc_last_seen[source]
+				self.arbiter.release_source(source)
+				print(f"No OSC from {source[len('osc:'):]} for {self.osc_idle_seconds:g} s, releasing its keys")
+
+	def on_osc(self, data: bytes, address: Tuple[str, int], arrival: float) -> None:
+		source = f"osc:{address[0]}"
+		wall_offset = time.time() - arrival
+		self.osc_last_seen[source] = max(arrival, self.osc_last_seen.get(source, arrival))
+		for timetag, osc_address, args in parse_osc_packet(data):
+			if not osc_address.startswith(OSC_PREFIX) or not args:
+				continue
+			command = osc_address[len(OSC_PREFIX):]
+			value = 1 if len(args) < 2 or float(args[1]) >= 0.5 else 0
+			if command == "note":
+				key = self.note_keys[int(args[0]) & 0x7F]
+			elif command == "key":
+				key = str(args[0]).lower()
+			elif command == "pose":
+				key, value = list(str(args[0]).lower()), 0
+			else:
+				continue
+			if key is None:
+				continue
+			due = arrival
+			if timetag != OSC_IMMEDIATELY:
+				due = (timetag >> 32) - NTP_EPOCH_OFFSET + (timetag & 0xFFFFFFFF) / 2 ** 32 - wall_offset
+				if due - arrival > OSC_MAX_AHEAD_SECONDS:
+					due = arrival
+			# A bundle scheduled ahead keeps its sender alive until it has played.
+			self.osc_last_seen[source] = max(self.osc_last_seen[source], due)
+			self.schedule(due, arrival, source, key, value)
+
+	def on_session(self, sock: socket.socket, data: bytes, address: Tuple[str, int]) -> None:
+		"""AppleMIDI session handshake: accept invitations, answer clock sync and drop senders that say goodbye."""
+		command = data[2:4]
+		if command == b"IN":
+			_, _, version, token, ssrc = struct.unpack_from(">H2sIII", data)
+			sock.sendto(struct.pack(">H2sIII", APPLEMIDI_SIGNATURE, b"OK", version, token, self.ssrc)
+						+ self.session_name.encode("utf-8") + b"\0", address)
+			if self.sockets[sock] == "data":
+				self.sessions[ssrc] = f"rtpmidi:{address[0]}"
+				self.buffers.pop(ssrc, None)
+				print(f"RTP-MIDI session started with {address[0]}")
+		elif command == b"CK":
+			ssrc, count = struct.unpack_from(">IB", data, 4)
+			timestamps = list(struct.unpack_from(">QQQ", data, 12))
+			if count == 0:
+				timestamps[1] = self.clock()
+				sock.sendto(struct.pack(">H2sIB3xQQQ", APPLEMIDI_SIGNATURE, b"CK", self.ssrc, 1, *timestamps), address)
+		elif command == b"BY":
+			ssrc = struct.unpack_from(">I", data, 12)[0]
+			source = self.sessions.pop(ssrc, None)
+			if source:
+				self.buffers.pop(ssrc, None)
+				self.arbiter.release_source(source)
+				print(f"RTP-MIDI session ended with {address[0]}")
+
+	def on_rtp_midi(self, data: bytes, address: Tuple[str, int], arrival: float) -> None:
+		ssrc, _, commands = parse_rtp_midi(data)
+		if not commands:
+			return
+		source = self.sessions.get(ssrc, f"rtpmidi:{address[0]}")
+		buffer = self.buffers.get(ssrc)
+		if buffer is None:
+			buffer = self.buffers[ssrc] = JitterBuffer(self.delay_seconds)
+		# The packet went out once its last command had happened; earlier commands in it are already that much older.
+		buffer.observe(commands[-1][0] / APPLEMIDI_CLOCK_RATE, arrival)
+		for command_time, status, note, velocity in commands:
+			kind = status & 0xF0
+			if kind not in (0x80, 0x90):
+				continue
+			key = self.note_keys[note]
+			if key is None:
+				continue
+			value = 1 if kind == 0x90 and velocity >= VELOCITY_ON else 0
+			due = buffer.due_time(command_time / APPLEMIDI_CLOCK_RATE)
+			self.schedule(due, arrival, source, key, value)
+
+	def schedule(self, due: float, arrival: float, source: str, key: Any, value: int) -> None:
+		self.received += 1
+		if due < arrival:
+			self.late += 1
+		if due <= arrival:
+			self.deliver(source, key, value)
+			return
+		with self.lock:
+			heapq.heappush(self.queue, (due, next(self.sequence), source, key, value))
+			self.lock.notify()
+
+	def deliver(self, source: str, key: Any, value: int) -> None:
+		try:
+			if isinstance(key, list):
+				self.arbiter.set_pose(source, key)
+			else:
+				self.arbiter.press(source, key, value)
+		except Exception as e:
+			print(f"Invalid key: {e}")
+
+	def play_loop(self) -> None:
+		while self.b_running:
+			with self.lock:
+				if not self.queue:
+					self.lock.wait(0.5)
+					continue
+				now = time.monotonic()
+				if now < self.queue[0][0]:
+					self.lock.wait(self.queue[0][0] - now)
+					continue
+				_, _, source, key, value = heapq.heappop(self.queue)
+			# Delivered outside the lock so a slow valve write never holds up incoming packets.
+			self.deliver(source, key, value)
+
+	def shutdown(self) -> None:
+		self.b_running = False
+		with self.lock:
+			self.lock.notify()
+		if self.zeroconf is not None:
+			self.zeroconf.close()
+		for sock in self.sockets:
+			sock.close()
+
+def create_network_midi(config: configparser.ConfigParser, movements: Any, arbiter: Any) -> Optional[NetworkMIDI]:
+	"""Build the network MIDI listener from the [NetworkMIDI] section of config.cfg, or None if it is disabled."""
+	if not config.getboolean("NetworkMIDI", "Enabled", fallback=True):
+		return None
+	return NetworkMIDI(movements, arbiter,
+					   config.getint("NetworkMIDI", "OscPort", fallback=9000),
+					   config.getint("NetworkMIDI", "RtpMidiPort", fallback=5004),
+					   config.getfloat("NetworkMIDI", "JitterBufferMs", fallback=5),
+					   config.get("NetworkMIDI", "SessionName", fallback="Pasqually"),
+					   config.getfloat("NetworkMIDI", "OscIdleSeconds", fallback=30))
@@ -0,0 +1,139 @@
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+@dataclass
+class ProviderStats:
+	name: str = ""
+	latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=20))  # Seconds, successful calls only
+	outcomes: Deque[bool] = field(default_factory=lambda: deque(maxlen=20))  # True = success
+	consecutive_failures: int = 0
+	open_until: float = 0.0  # time.monotonic() until which the provider is skipped after repeated failures
+
+class ProviderRouter:
+	"""
+	Chooses between interchangeable providers using their recent latency and error rate. Healthy
+	providers go first, ordered by median latency (or by the given preference order when
+	b_prefer_order is set, e.g. for TTS voices of differing quality). A call can be hedged: if the
+	first provider hasn't answered after hedge_after seconds the next one is started as well, and
+	whichever succeeds first wins. Failures move straight on to the next provider.
+	"""
+	def __init__(self, names: List[str], window: int = 20, max_error_rate: float = 0.5, failure_limit: int = 3,
+				 cooldown_seconds: float = 60.0, b_prefer_order: bool = False) -> None:
+		self.names: List[str] = list(names)
+		self.max_error_rate: float = max_error_rate
+		self.failure_limit: int = failure_limit  # Consecutive failures before the provider is skipped for cooldown_seconds
+		self.cooldown_seconds: float = cooldown_seconds
+		self.b_prefer_order: bool = b_prefer_order
+		self.stats: Dict[str, ProviderStats] = {
+			name: ProviderStats(name, deque(maxlen=window), deque(maxlen=window)) for name in self.names
+		}
+		self.lock = threading.Lock()
+		self.executor = ThreadPoolExecutor(max_workers=max(2, len(self.names)), thread_name_prefix="provider")
+
+	def record(self, name: str, latency: float, b_success: bool) -> None:
+		with self.lock:
+			stats = self.stats[name]
+			stats.outcomes.append(b_success)
+			if b_success:
+				stats.latencies.append(latency)
+				stats.consecutive_failures = 0
+			else:
+				stats.consecutive_failures += 1
+				if stats.consecutive_failures >= self.failure_limit:
+					stats.open_until = time.monotonic() + self.cooldown_seconds
+
+	def is_healthy(self, name: str) -> bool:
+		stats = self.stats[name]
+		if time.monotonic() < stats.open_until:
+			return False
+		if len(stats.outcomes) < 2:
+			return True
+		error_rate = stats.outcomes.count(False) / len(stats.outcomes)
+		return error_rate <= self.max_error_rate
+
+	def expected_latency(self, name: str) -> float:
+		"""Median of recent successful calls; unmeasured providers sort after measured ones."""
+		latencies = self.stats[name].latencies
+		return statistics.median(latencies) if latencies else float("inf")
+
+	def ranked(self, names: Optional[List[str]] = None) -> List[str]:
+		names = [name for name in self.names if names is None or name in names]
+		with self.lock:
+			def sort_key(name: str) -> Tuple[bool, float, int]:
+				latency = 0.0 if self.b_prefer_order else self.expected_latency(name)
+				return (not self.is_healthy(name), latency, self.names.index(name))
+			return sorted(names, key=sort_key)
+
+	def _timed(self, name: str, call: Callable[[], Any]) -> Tuple[bool, Any]:
+		start_time = time.monotonic()
+		try:
+			value = call()
+			if value is None:
+				raise ValueError("empty result")
+		except Exception as e:
+			self.record(name, time.monotonic() - start_time, False)
+			print(f"Provider '{name}' failed: {e}")
+			return False, None
+		self.record(name, time.monotonic() - start_time, True)
+		return True, value
+
+	def call(self, calls: Dict[str, Callable[[], Any]], hedge_after: Optional[float] = None,
+			 discard: Optional[Callable[[str, Any], None]] = None) -> Optional[Tuple[str, Any]]:
+		"""
+		Run calls[name] in ranked order until one succeeds. Returns (name, result), or None if all fail.
+		A slower call that loses a hedge still runs to completion and its latency is recorded; if it
+		succeeds, discard(name, result) is called so work it started in the background can be stopped.
+		"""
+		order = self.ranked(list(calls))
+		pending: Dict[Future, str] = {}
+		next_index = 0
+		last_launch = 0.0
+
+		def launch() -> None:
+			nonlocal next_index, last_launch
+			name = order[next_index]
+			next_index += 1
+			last_launch = time.monotonic()
+			pending[self.executor.submit(self._timed, name, calls[name])] = name
+
+		if not order:
+			return None
+		launch()
+		while pending:
+			timeout = None
+			if hedge_after is not None and hedge_after > 0 and next_index < len(order):
+				timeout = max(0.0, last_launch + hedge_after - time.monotonic())
+			done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+			if not done:
+				print(f"Provider '{pending[next(iter(pending))]}' is slow. Hedging with '{order[next_index]}'.")
+				launch()
+				continue
+			for future in done:
+				name = pending.pop(future)
+				b_success, value = future.result()
+				if b_success:
+					# Everything still pending (including calls that finished alongside the winner) lost.
+					if discard is not None:
+						for loser, loser_name in pending.items():
+							loser.add_done_callback(lambda f, loser_name=loser_name: self._discard(loser_name, f, discard))
+					return name, value
+			if next_index < len(order):
+				launch()
+		return None
+
+	@staticmethod
+	def _discard(name: str, future: Future, discard: Callable[[str, Any], None]) -> None:
+		b_success, value = future.result()
+		if b_success:
+			try:
+				discard(name, value)
+			except Exception as e:
+				print(f"Could not discard result of provider '{name}': {e}")
+
+	def shutdown(self) -> None:
+		self.executor.shutdown(wait=False)
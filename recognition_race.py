@@ -0,0 +1,132 @@
+import threading
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+@dataclass
+class RecognitionResult:
+	source: str = ""  # "intent" (Rhino) or "transcript" (speech-to-text)
+	intent: Optional[str] = None
+	slots: Dict[str, str] = field(default_factory=dict)
+	text: Optional[str] = None
+	confidence: float = 0.0  # 0 when the recognizer did not report one
+
+class RecognitionRace:
+	"""
+	Streams the same utterance to Rhino and to a speech-to-text session while the user is still
+	speaking. The first confident result wins and the other recognizer is cancelled. Rhino drops
+	out as soon as it decides it did not understand; a transcript below min_confidence is only
+	used if nothing better arrives.
+	"""
+	def __init__(self, rhino: Optional[Any], transcriber: Optional[Any], min_confidence: float = 0.5) -> None:
+		self.rhino = rhino
+		self.transcriber = transcriber
+		self.min_confidence: float = min_confidence
+
+		self.lock = threading.Lock()
+		self.finished = threading.Event()
+		self.winner: Optional[RecognitionResult] = None
+		self.fallback: Optional[RecognitionResult] = None
+		self.b_rhino_active: bool = rhino is not None
+		self.b_transcriber_active: bool = transcriber is not None
+		self.rhino_pending: np.ndarray = np.zeros(0, dtype=np.int16)  # Samples waiting for a full Rhino frame
+
+		if self.transcriber is not None:
+			self.transcriber.on_done = self.on_transcript
+			self.transcriber.start()
+		self._check_finished()
+
+	def feed(self, frame: np.ndarray) -> None:
+		if self.finished.is_set():
+			return
+		if self.b_transcriber_active:
+			self.transcriber.feed(frame)
+		if self.b_rhino_active:
+			self._feed_rhino(frame)
+
+	def _feed_rhino(self, frame: np.ndarray) -> None:
+		frame_length = self.rhino.frame_length
+		samples = np.concatenate((self.rhino_pending, frame)) if len(self.rhino_pending) else frame
+		offset = 0
+		while self.b_rhino_active and len(samples) - offset >= frame_length:
+			if self.rhino.process(samples[offset:offset + frame_length]):
+				inference = self.rhino.get_inference()
+				if inference.is_understood:
+					self._post(RecognitionResult(source="intent", intent=inference.intent, slots=dict(inference.slots or {})))
+				else:
+					with self.lock:
+						self.b_rhino_active = False
+					self._check_finished()
+			offset += frame_length
+		self.rhino_pending = np.array(samples[offset:], dtype=np.int16)
+
+	def on_transcript(self, text: Optional[str], confidence: float) -> None:
+		with self.lock:
+			self.b_transcriber_active = False
+		if text:
+			result = RecognitionResult(source="transcript", text=text, confidence=confidence)
+			# Google leaves confidence at 0 when it has none to report; don't treat that as doubt.
+			if confidence == 0.0 or confidence >= self.min_confidence:
+				self._post(result)
+				return
+			self.fallback = result
+		self._check_finished()
+
+	def _post(self, result: RecognitionResult) -> None:
+		with self.lock:
+			if self.winner is not None:
+				return
+			self.winner = result
+			b_cancel_transcriber = self.b_transcriber_active and result.source != "transcript"
+			b_reset_rhino = self.b_rhino_active and result.source != "intent"
+			self.b_rhino_active = False
+			self.b_transcriber_active = False
+		if b_cancel_transcriber:
+			self.transcriber.cancel()
+		if b_reset_rhino:
+			self._reset_rhino()
+		self.finished.set()
+
+	def _reset_rhino(self) -> None:
+		try:
+			self.rhino.reset()
+		except Exception:
+			pass
+
+	def _check_finished(self) -> None:
+		with self.lock:
+			if not self.b_rhino_active and not self.b_transcriber_active:
+				self.finished.set()
+
+	def finish(self) -> None:
+		"""The utterance has ended: Rhino gets no more audio and the transcriber is told to wrap up."""
+		with self.lock:
+			b_reset_rhino = self.b_rhino_active
+			self.b_rhino_active = False
+		if b_reset_rhino:
+			# Rhino never reached a decision, so clear its state for the next utterance.
+			self._reset_rhino()
+		if self.b_transcriber_active:
+			self.transcriber.finish()
+		self._check_finished()
+
+	def cancel(self) -> None:
+		with self.lock:
+			b_cancel_transcriber = self.b_transcriber_active
+			b_reset_rhino = self.b_rhino_active
+			self.b_rhino_active = False
+			self.b_transcriber_active = False
+		if b_cancel_transcriber:
+			self.transcriber.cancel()
+		if b_reset_rhino:
+			self._reset_rhino()
+		self.finished.set()
+
+	def has_winner(self) -> bool:
+		return self.winner is not None
+
+	def wait(self, timeout: Optional[float] = None) -> Optional[RecognitionResult]:
+		"""Block until a recognizer wins or both give up. Returns the result, if any."""
+		if not self.finished.wait(timeout):
+			self.cancel()
+		return self.winner or self.fallback
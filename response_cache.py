@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set
+from command_router import CommandRouter
+
+@dataclass
+class CachedResponse:
+	key: str = ""  # Normalized question
+	question: str = ""  # Question as first transcribed
+	text: str = ""  # AI answer
+	audio_file: str = ""  # TTS audio of the answer, relative to the cache directory
+	created: float = 0.0  # time.time() when stored
+	last_used: float = 0.0
+	hits: int = 0
+	embedding: Optional[List[float]] = field(default=None, repr=False)
+
+class ResponseCache:
+	"""
+	Remembers AI answers together with their synthesized speech, so a question that has been asked
+	before is answered straight from disk. Questions are matched on their normalized wording and,
+	if sentence-transformers is installed and enabled, on embedding similarity. Entries expire after
+	ttl_seconds and the least recently used are evicted once the cache grows past its limits.
+	Questions containing any of skip_words (time, weather, ...) have answers that go stale and are
+	never cached.
+	"""
+	def __init__(self, cache_dir: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 200, max_megabytes: float = 100,
+				 context: str = "", b_use_embeddings: bool = False, similarity_threshold: float = 0.9,
+				 embedding_model: str = "all-MiniLM-L6-v2", skip_words: Optional[List[str]] = None,
+				 save_delay_seconds: float = 30) -> None:
+		self.cache_dir: str = cache_dir
+		self.index_path: str = os.path.join(cache_dir, "index.json")
+		self.ttl_seconds: float = ttl_seconds
+		self.max_entries: int = max_entries
+		self.max_bytes: int = int(max_megabytes * 1024 * 1024)
+		self.similarity_threshold: float = similarity_threshold
+		self.skip_words: Set[str] = {CommandRouter.tokenize(word)[0] for word in skip_words or [] if CommandRouter.tokenize(word)}
+		self.save_delay_seconds: float = save_delay_seconds  # Hit counts are written at most this often
+		self.save_timer: Optional[threading.Timer] = None
+		# Answers depend on the AI context, so changing it in config.cfg empties the cache.
+		self.context_hash: str = hashlib.sha1(context.encode("utf-8")).hexdigest()
+
+		self.entries: Dict[str, CachedResponse] = {}
+		self.lock = threading.Lock()
+
+		self.embedder: Optional[Any] = None
+		if b_use_embeddings:
+			try:
+				from sentence_transformers import SentenceTransformer  # Optional dependency: pip install sentence-transformers
+				self.embedder = SentenceTransformer(embedding_model)
+			except Exception as e:
+				print(f"Response cache embeddings unavailable, matching on wording only: {e}")
+
+		os.makedirs(cache_dir, exist_ok=True)
+		self.load()
+
+	@staticmethod
+	def normalize(question: str) -> str:
+		tokens = CommandRouter.tokenize(question)
+		for prefix in ("hey chef", "hey pasqually", "pasqually", "chef", "please"):
+			prefix_tokens = prefix.split()
+			if tokens[:len(prefix_tokens)] == prefix_tokens:
+				tokens = tokens[len(prefix_tokens):]
+		return " ".join(tokens)
+
+	def load(self) -> None:
+		if not os.path.exists(self.index_path):
+			return
+		try:
+			with open(self.index_path, "r") as f:
+				index = json.load(f)
+		except Exception as e:
+			print(f"Response cache index unreadable, starting empty: {e}")
+			return
+		for item in index.get("entries", []):
+			entry = CachedResponse(**item)
+			if os.path.exists(self.audio_path(entry)):
+				self.entries[entry.key] = entry
+		if index.get("context") != self.context_hash:
+			print("AI context changed. Clearing the response cache.")
+			self.clear()
+
+	def save(self) -> None:
+		if self.save_timer is not None:
+			self.save_timer.cancel()
+			self.save_timer = None
+		index = {"context": self.context_hash, "entries": [asdict(entry) for entry in self.entries.values()]}
+		temp_path = self.index_path + ".tmp"
+		with open(temp_path, "w") as f:
+			json.dump(index, f)
+		os.replace(temp_path, self.index_path)
+
+	def clear(self) -> None:
+		with self.lock:
+			for entry in self.entries.values():
+				self._delete_audio(entry)
+			self.entries = {}
+			self.save()
+
+	def _delete_audio(self, entry: CachedResponse) -> None:
+		try:
+			os.remove(os.path.join(self.cache_dir, entry.audio_file))
+		except OSError:
+			pass
+
+	def _is_expired(self, entry: CachedResponse, now: float) -> bool:
+		return now - entry.created > self.ttl_seconds
+
+	def _embed(self, key: str) -> Optional[np.ndarray]:
+		if self.embedder is None:
+			return None
+		vector = np.asarray(self.embedder.encode(key), dtype=np.float32)
+		return vector / (np.linalg.norm(vector) or 1.0)
+
+	def is_volatile(self, key: str) -> bool:
+		return any(token in self.skip_words for token in key.split())
+
+	def get(self, question: str) -> Optional[CachedResponse]:
+		"""Return a fresh cached answer for the question, or None."""
+		key = self.normalize(question)
+		if not key or self.is_volatile(key):
+			return None
+		now = time.time()
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None and self.embedder is not None:
+				entry = self._nearest(key, now)
+			if entry is None or self._is_expired(entry, now):
+				return None
+			entry.last_used = now
+			entry.hits += 1
+			# Only usage changed, which can wait: batch the index write instead of rewriting it on every hit.
+			if self.save_timer is None:
+				self.save_timer = threading.Timer(self.save_delay_seconds, self.flush)
+				self.save_timer.daemon = True
+				self.save_timer.start()
+			return entry
+
+	def flush(self) -> None:
+		with self.lock:
+			self.save_timer = None
+			self.save()
+
+	def _nearest(self, key: str, now: float) -> Optional[CachedResponse]:
+		candidates = [entry for entry in self.entries.values() if entry.embedding is not None and not self._is_expired(entry, now)]
+		if not candidates:
+			return None
+		query = self._embed(key)
+		similarities = np.asarray([entry.embedding for entry in candidates], dtype=np.float32) @ query
+		best = int(np.argmax(similarities))
+		return candidates[best] if similarities[best] >= self.similarity_threshold else None
+
+	def audio_path(self, entry: CachedResponse) -> str:
+		return os.path.join(self.cache_dir, entry.audio_file)
+
+	def put(self, question: str, text: str, audio_file: str) -> None:
+		"""Store an answer and a copy of its TTS audio."""
+		key = self.normalize(question)
+		if not key or not text or self.is_volatile(key) or not os.path.exists(audio_file):
+			return
+		file_name = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + os.path.splitext(audio_file)[1]
+		try:
+			shutil.copy(audio_file, os.path.join(self.cache_dir, file_name))
+			embedding = self._embed(key)
+		except Exception as e:
+			print(f"Could not store response in cache: {e}")
+			return
+		now = time.time()
+		with self.lock:
+			old_entry = self.entries.get(key)
+			if old_entry is not None and old_entry.audio_file != file_name:
+				self._delete_audio(old_entry)
+			self.entries[key] = CachedResponse(key, question, text, file_name, now, now, 0,
+											   embedding.tolist() if embedding is not None else None)
+			self._evict(now)
+			self.save()
+
+	def _evict(self, now: float) -> None:
+		for key in [key for key, entry in self.entries.items() if self._is_expired(entry, now)]:
+			self._delete_audio(self.entries.pop(key))
+
+		sizes = {key: self._file_size(entry) for key, entry in self.entries.items()}
+		total = sum(sizes.values())
+		for entry in sorted(self.entries.values(), key=lambda e: e.last_used):
+			if len(self.entries) <= self.max_entries and total <= self.max_bytes:
+				break
+			total -= sizes[entry.key]
+			self._delete_audio(self.entries.pop(entry.key))
+
+	def _file_size(self, entry: CachedResponse) -> int:
+		try:
+			return os.path.getsize(self.audio_path(entry))
+		except OSError:
+			return 0
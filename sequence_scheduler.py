@@ -0,0 +1,213 @@
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+@dataclass
+class SequenceStep:
+	time: float = 0.0  # Seconds after the sequence starts that the movement should land
+	key: str = ""  # Key step: the movement key
+	val: int = 0  # Key step: the new state
+	keys: Optional[List[str]] = None  # Pose step: every key held from this point on
+	lead_time: float = 0.0  # Seconds early the step is issued so its valves land on time
+
+@dataclass
+class SequenceJob:
+	id: str = ""
+	source: str = ""  # Input arbiter source the sequence presses keys as
+	steps: List[SequenceStep] = field(default_factory=list)
+	b_hold: bool = False  # Keep the final pose held when the sequence ends, until it is cancelled
+	state: str = "scheduled"  # scheduled, running, done, cancelled, failed, or released (a held sequence let go)
+	executed: int = 0
+	max_late_ms: float = 0.0  # Worst lateness of a step against its issue time
+	start_time: float = 0.0  # time.monotonic() of step time zero
+	end_time: float = 0.0
+	error: str = ""
+	cancelled: threading.Event = field(default_factory=threading.Event)
+
+	@property
+	def duration(self) -> float:
+		# Steps run in issue order, so the last one to land isn't necessarily last in the list.
+		return max((step.time for step in self.steps), default=0.0)
+
+	def status(self) -> Dict[str, Any]:
+		now = self.end_time or time.monotonic()
+		return {
+			"id": self.id,
+			"state": self.state,
+			"steps": len(self.steps),
+			"executed": self.executed,
+			"duration": self.duration,
+			"elapsed": round(max(0.0, now - self.start_time), 4) if self.start_time else 0.0,
+			"maxLateMs": round(self.max_late_ms, 3),
+			"hold": self.b_hold,
+			"error": self.error,
+		}
+
+class SequenceScheduler:
+	"""
+	Runs timed sequences posted to the HTTP API on the Pi itself, so an external show controller
+	sends a whole sequence in one request instead of hundreds of key events with network jitter
+	between them. A sequence is either key steps ({"t", "key", "val"}) or poses ({"t", "keys"}),
+	with t in seconds from the start. Like MovementTimeline, every step is issued early by its valve
+	lead time so the movement lands at t.
+
+	Each sequence presses keys through the input arbiter as its own "api:<id>" source, so it mixes
+	with the operators like any other input and cancelling it releases exactly what it held.
+	"""
+	def __init__(self, movements: Any, arbiter: Any, max_steps: int = 10000, max_active: int = 4, max_finished: int = 32) -> None:
+		self.movements = movements
+		self.arbiter = arbiter
+		self.keys: Set[str] = {movement.key for movement in movements.all if movement.key}
+		self.max_steps: int = max_steps
+		self.max_active: int = max_active  # Sequences scheduled or running at once
+		self.max_finished: int = max_finished  # Finished sequences kept for status queries
+		self.jobs: Dict[str, SequenceJob] = {}
+		self.lock = threading.Lock()
+
+	def parse(self, spec: Any) -> List[SequenceStep]:
+		"""Validate a posted sequence. Raises ValueError with a message fit for the client."""
+		if not isinstance(spec, dict):
+			raise ValueError("Expected a JSON object")
+		if ("steps" in spec) == ("poses" in spec):
+			raise ValueError("Give either 'steps' or 'poses'")
+		b_pose = "poses" in spec
+		entries = spec["poses"] if b_pose else spec["steps"]
+		if not isinstance(entries, list) or not entries:
+			raise ValueError("The sequence is empty")
+		if len(entries) > self.max_steps:
+			raise ValueError(f"At most {self.max_steps} steps per sequence")
+
+		steps = []
+		for index, entry in enumerate(entries):
+			try:
+				step_time = float(entry["t"])
+				if b_pose:
+					keys = sorted({str(key).lower() for key in entry["keys"]})
+					unknown = [key for key in keys if key not in self.keys]
+					step = SequenceStep(step_time, keys=keys)
+				else:
+					key = str(entry["key"]).lower()
+					unknown = [key] if key not in self.keys else []
+					step = SequenceStep(step_time, key, 1 if int(entry["val"]) else 0)
+			except (KeyError, TypeError, ValueError) as e:
+				raise ValueError(f"Step {index} is malformed: {e}")
+			if unknown:
+				raise ValueError(f"Step {index} has unknown keys: {' '.join(unknown)}")
+			if not 0 <= step_time < 24 * 60 * 60:
+				raise ValueError(f"Step {index} time is out of range")
+			steps.append(step)
+		# A stable sort keeps steps given for the same time in the order they were posted.
+		steps.sort(key=lambda step: step.time)
+		self.set_lead_times(steps)
+		self.sort_by_issue_time(steps)
+		return steps
+
+	def submit(self, spec: Any) -> SequenceJob:
+		"""Schedule a sequence to start now. Raises ValueError if it is invalid, RuntimeError if too many are running."""
+		steps = self.parse(spec)
+		b_hold = spec.get("hold", False)
+		if not isinstance(b_hold, bool):
+			raise ValueError("'hold' must be true or false")
+		job_id = uuid.uuid4().hex[:12]
+		job = SequenceJob(job_id, f"api:{job_id}", steps, b_hold)
+		# Steps too close to the start to be issued early push the whole sequence back just enough for them to land on time.
+		start_delay = max(step.lead_time - step.time for step in steps)
+		with self.lock:
+			active = [other for other in self.jobs.values() if other.state in ("scheduled", "running")]
+			if len(active) >= self.max_active:
+				raise RuntimeError(f"{len(active)} sequences are already running")
+			self.jobs[job_id] = job
+			self.prune()
+		job.start_time = time.monotonic() + max(0.0, start_delay)
+		threading.Thread(target=self.run, args=(job,), daemon=True).start()
+		return job
+
+	def get(self, job_id: str) -> Optional[SequenceJob]:
+		with self.lock:
+			return self.jobs.get(job_id)
+
+	def statuses(self) -> List[Dict[str, Any]]:
+		with self.lock:
+			return [job.status() for job in self.jobs.values()]
+
+	def cancel(self, job_id: str) -> Optional[SequenceJob]:
+		"""Stop a sequence and release everything it holds, including the final pose of a held one."""
+		job = self.get(job_id)
+		if job is None:
+			return None
+		job.cancelled.set()
+		with self.lock:
+			if job.state in ("scheduled", "running"):
+				job.state = "cancelled"
+				job.end_time = time.monotonic()
+			elif job.state == "done" and job.b_hold:
+				job.state = "released"
+		self.arbiter.release_source(job.source)
+		return job
+
+	def prune(self) -> None:
+		# A held sequence that finished still owns its final pose, so it stays until cancelled, or it could never be released.
+		finished = [job_id for job_id, job in self.jobs.items()
+					if job.state not in ("scheduled", "running") and not (job.b_hold and job.state == "done")]
+		for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+			del self.jobs[job_id]
+
+	def set_lead_times(self, steps: List[SequenceStep]) -> None:
+		# A pose is issued early enough for the slowest valve it opens or closes.
+		held: Set[str] = set()
+		for step in steps:
+			if step.keys is None:
+				step.lead_time = self.movements.get_lead_time(step.key, step.val)
+				held = held | {step.key} if step.val else held - {step.key}
+			else:
+				changes = [(key, 1) for key in step.keys if key not in held] + [(key, 0) for key in held if key not in step.keys]
+				step.lead_time = max((self.movements.get_lead_time(key, val) for key, val in changes), default=0)
+				held = set(step.keys)
+
+	def sort_by_issue_time(self, steps: List[SequenceStep]) -> None:
+		"""
+		Order steps by when they are issued rather than when they land, so a step on a slow valve can go out
+		before an earlier step on a fast one. Steps on the same key keep their order, as does every pose
+		(each one replaces the whole held set), by issuing them no earlier than the step before.
+		"""
+		last_issue: Dict[Optional[str], float] = {}  # Key (None for poses) -> issue time of its latest step
+		for step in steps:
+			key = step.key if step.keys is None else None
+			issue_time = max(step.time - step.lead_time, last_issue.get(key, float("-inf")))
+			step.lead_time = step.time - issue_time
+			last_issue[key] = issue_time
+		steps.sort(key=lambda step: step.time - step.lead_time)
+
+	def run(self, job: SequenceJob) -> None:
+		with self.lock:
+			if job.state == "scheduled":
+				job.state = "running"
+		try:
+			for step in job.steps:
+				issue_time = job.start_time + step.time - step.lead_time
+				delay = issue_time - time.monotonic()
+				# Waiting on the cancel event rather than sleeping lets a cancel take effect immediately.
+				if delay > 0 and job.cancelled.wait(delay):
+					return
+				# A press racing a cancel is undone by the release in finally.
+				if job.cancelled.is_set():
+					return
+				job.max_late_ms = max(job.max_late_ms, (time.monotonic() - issue_time) * 1000)
+				if step.keys is None:
+					self.arbiter.press(job.source, step.key, step.val)
+				else:
+					self.arbiter.set_pose(job.source, step.keys)
+				job.executed += 1
+		except Exception as e:
+			print(f"Sequence {job.id} failed: {e}")
+			job.error = str(e)
+			job.state = "failed"
+		finally:
+			with self.lock:
+				if job.state == "running":
+					job.state = "done"
+				job.end_time = job.end_time or time.monotonic()
+			if not job.b_hold or job.state != "done":
+				self.arbiter.release_source(job.source)
@@ -1,23 +1,22 @@
 import os
 import mido
 import time
-import pygame
 import random
 from pydispatch import dispatcher
 import threading
-from typing import List, Optional
+from typing import Any, Callable, List, Optional
 
 class ShowPlayer:
-	def __init__(self, pygame_instance) -> None:
-		self.pygame = pygame_instance
-		self.MUSIC_END = self.pygame.USEREVENT + 1
-		self.pygame.mixer.music.set_endevent(self.MUSIC_END)
+	def __init__(self, audio_engine: Any) -> None:
+		self.audio_engine = audio_engine
+		self.channel_name: str = "show"  # Audio engine channel that shows play on
 
 		self.show_list: List[str] = []
 		self.active_show_name: Optional[str] = None
 		self.paused: bool = False
 		self.midi_file_data: List[List[float]] = []  # Each entry: [time_ms, midi_note, on/off state]
 		self.midi_states: dict = {}    # Track current state of MIDI notes
+		self.lead_time_lookup: Optional[Callable[[int, int], float]] = None  # (midi_note, state) -> valve lead time in seconds
 
 		script_dir = os.path.dirname(os.path.abspath(__file__))
 		self.show_dir = os.path.join(script_dir, "shows")
@@ -34,13 +33,8 @@ class ShowPlayer:
 		last_checked_time = 0  # Keep track of the last update time
 		while True:
 			try:
-				for event in self.pygame.event.get():
-					if event.type == self.MUSIC_END and self.active_show_name is not None:
-						dispatcher.send(signal="showEnd")
-						self.stop_show()
-
-				if self.pygame.mixer.music.get_busy():  # Check if music is playing
-					current_time_ms = self.pygame.mixer.music.get_pos()  # Get playback time in milliseconds
+				if self.audio_engine.is_busy(self.channel_name):  # Check if the show is playing
+					current_time_ms = self.audio_engine.get_pos_ms(self.channel_name)  # Get playback time in milliseconds
 
 					# Process MIDI data for the current time
 					if current_time_ms != last_checked_time:
@@ -51,6 +45,28 @@ class ShowPlayer:
 			except Exception as e:
 				print(f"Exception in update thread: {e}")
 
+	def on_show_audio_end(self, show_name: str) -> None:
+		# Only the show channel reports here, so voice or TTS playback can never end a show.
+		if self.active_show_name == show_name:
+			dispatcher.send(signal="showEnd")
+			self.stop_show()
+
+	def set_lead_time_lookup(self, lead_time_lookup: Callable[[int, int], float]) -> None:
+		self.lead_time_lookup = lead_time_lookup
+
+	def apply_lead_times(self) -> None:
+		# Move each event earlier by its valve's lead time so the movement lands on the music, then keep the list in time order.
+		if self.lead_time_lookup is None:
+			return
+		last_time_per_note: dict = {}
+		for entry in self.midi_file_data:
+			issue_time = max(0, entry[0] - self.lead_time_lookup(entry[1], entry[2]) * 1000)
+			# Different open/close leads must never swap the order of events on the same note.
+			issue_time = max(issue_time, last_time_per_note.get(entry[1], 0))
+			last_time_per_note[entry[1]] = issue_time
+			entry[0] = issue_time
+		self.midi_file_data.sort(key=lambda entry: entry[0])
+
 	def process_midi_states(self, current_time_ms: int) -> None:
 		# Iterate over midi_file_data and find events that occur at or before the current time
 		for entry in self.midi_file_data:
@@ -82,10 +98,10 @@ class ShowPlayer:
 				file_path = os.path.join(self.show_dir, show_name + ext)
 				if os.path.isfile(file_path):
 					if self.parse_midi_file(show_name):
+						self.apply_lead_times()
 						self.active_show_name = show_name
 						self.midi_states.clear()  # Reset MIDI states for a new show
-						self.pygame.mixer.music.load(file_path)
-						self.pygame.mixer.music.play()
+						self.audio_engine.play_file(self.channel_name, file_path, on_end=lambda: self.on_show_audio_end(show_name))
 						print(f"Playing show: {file_path}")
 						return
 
@@ -98,17 +114,17 @@ class ShowPlayer:
 
 	def stop_show(self) -> None:
 		if self.active_show_name is not None:
-			self.pygame.mixer.music.stop()
+			self.audio_engine.stop(self.channel_name)
 			self.paused = False
 			self.active_show_name = None
 
 	def toggle_pause(self) -> None:
 		if not self.paused:
 			self.paused = True
-			self.pygame.mixer.music.pause()
+			self.audio_engine.pause(self.channel_name)
 		else:
 			self.paused = False
-			self.pygame.mixer.music.unpause()
+			self.audio_engine.unpause(self.channel_name)
 
 	def parse_midi_file(self, show_name: str) -> bool:
 		if self.show_dir is None:
@@ -0,0 +1,283 @@
+import abc
+import configparser
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+class RecognitionSession(abc.ABC):
+	"""
+	One utterance being recognized on its own thread. Frames are handed to the backend as they are
+	fed in; partial transcripts go to on_partial while the user speaks, and the final transcript is
+	delivered once through on_done after finish().
+	"""
+	def __init__(self, recognizer: "SpeechRecognizer") -> None:
+		self.recognizer: "SpeechRecognizer" = recognizer
+		self.sample_rate: int = recognizer.sample_rate
+		self.on_partial: Optional[Callable[[str], None]] = None
+		self.on_done: Optional[Callable[[Optional[str], float], None]] = None  # Called once with (transcript or None, confidence)
+
+		self.audio_queue: "queue.Queue[Optional[bytes]]" = queue.Queue()
+		self.b_cancelled: bool = False
+		self.error: Optional[Exception] = None
+		self.thread: threading.Thread = threading.Thread(target=self.run, daemon=True)
+
+	def start(self) -> None:
+		self.thread.start()
+
+	def feed(self, frame: np.ndarray) -> None:
+		if not self.b_cancelled:
+			self.audio_queue.put(np.ascontiguousarray(frame, dtype=np.int16).tobytes())
+
+	def finish(self) -> None:
+		"""No more audio is coming; the backend produces its final result after this."""
+		self.audio_queue.put(None)
+
+	def cancel(self) -> None:
+		self.b_cancelled = True
+		self.audio_queue.put(None)
+
+	def chunks(self) -> Iterator[bytes]:
+		while True:
+			chunk = self.audio_queue.get()
+			if chunk is None or self.b_cancelled:
+				return
+			yield chunk
+
+	def partial(self, text: str) -> None:
+		if text and self.on_partial is not None and not self.b_cancelled:
+			self.on_partial(text)
+
+	@abc.abstractmethod
+	def recognize(self) -> Tuple[Optional[str], float]:
+		"""Consume chunks() until it ends and return (final transcript, confidence). Confidence 0 means unknown."""
+
+	def run(self) -> None:
+		transcript, confidence = None, 0.0
+		try:
+			transcript, confidence = self.recognize()
+		except Exception as e:
+			if not self.b_cancelled:
+				print(f"Error during streaming transcription: {e}")
+				self.error = e
+		if self.b_cancelled or self.on_done is None:
+			return
+		self.on_done(transcript or None, confidence)
+
+class SpeechRecognizer(abc.ABC):
+	"""Loads a speech-to-text backend once and opens a streaming session for each utterance."""
+	def __init__(self, sample_rate: int) -> None:
+		self.sample_rate: int = sample_rate
+
+	@abc.abstractmethod
+	def create_session(self) -> RecognitionSession:
+		"""Return a new, not yet started, session for one utterance."""
+
+class GoogleStreamingSession(RecognitionSession):
+	def __init__(self, recognizer: "GoogleRecognizer") -> None:
+		super().__init__(recognizer)
+		self.responses: Optional[Any] = None
+
+	def cancel(self) -> None:
+		super().cancel()
+		try:
+			if self.responses is not None:
+				self.responses.cancel()
+		except Exception:
+			pass
+
+	def recognize(self) -> Tuple[Optional[str], float]:
+		speech = self.recognizer.speech
+		config = speech.StreamingRecognitionConfig(
+			config=speech.RecognitionConfig(
+				encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+				sample_rate_hertz=self.sample_rate,
+				language_code=self.recognizer.language_code,
+			),
+			interim_results=True,
+		)
+		requests = (speech.StreamingRecognizeRequest(audio_content=chunk) for chunk in self.chunks())
+		transcripts: List[str] = []
+		confidences: List[float] = []
+		self.responses = self.recognizer.client.streaming_recognize(config, requests)
+		for response in self.responses:
+			for result in response.results:
+				if not result.alternatives:
+					continue
+				alternative = result.alternatives[0]
+				if result.is_final:
+					transcripts.append(alternative.transcript.strip())
+					confidences.append(alternative.confidence)
+				else:
+					self.partial(" ".join(transcripts + [alternative.transcript.strip()]))
+		transcript = " ".join(t for t in transcripts if t)
+		return transcript, (min(confidences) if confidences else 0.0)
+
+class GoogleRecognizer(SpeechRecognizer):
+	def __init__(self, sample_rate: int, language_code: str = "en-US") -> None:
+		super().__init__(sample_rate)
+		from google.cloud import speech
+		self.speech = speech
+		self.language_code: str = language_code
+		self.client = speech.SpeechClient()
+
+	def create_session(self) -> RecognitionSession:
+		return GoogleStreamingSession(self)
+
+class VoskSession(RecognitionSession):
+	def recognize(self) -> Tuple[Optional[str], float]:
+		recognizer = self.recognizer.vosk.KaldiRecognizer(self.recognizer.model, self.sample_rate)
+		transcripts: List[str] = []
+		for chunk in self.chunks():
+			if recognizer.AcceptWaveform(chunk):
+				# Vosk closed a segment at a pause; keep it and carry on.
+				transcripts.append(json.loads(recognizer.Result()).get("text", ""))
+			else:
+				self.partial(" ".join(t for t in transcripts + [json.loads(recognizer.PartialResult()).get("partial", "")] if t))
+		if self.b_cancelled:
+			return None, 0.0
+		transcripts.append(json.loads(recognizer.FinalResult()).get("text", ""))
+		return " ".join(t for t in transcripts if t), 0.0
+
+class VoskRecognizer(SpeechRecognizer):
+	"""Offline recognition with a Vosk model directory (https://alphacephei.com/vosk/models)."""
+	def __init__(self, sample_rate: int, model_path: str) -> None:
+		super().__init__(sample_rate)
+		import vosk  # Optional dependency: pip install vosk
+		vosk.SetLogLevel(-1)
+		self.vosk = vosk
+		self.model = vosk.Model(model_path)
+
+	def create_session(self) -> RecognitionSession:
+		return VoskSession(self)
+
+class WhisperSession(RecognitionSession):
+	def _transcribe(self, audio: np.ndarray) -> str:
+		segments, _ = self.recognizer.model.transcribe(audio, language="en", beam_size=1)
+		return " ".join(segment.text.strip() for segment in segments)
+
+	def recognize(self) -> Tuple[Optional[str], float]:
+		# Whisper decodes whole buffers, so partials come from re-decoding what has arrived so far.
+		buffer = bytearray()
+		interval = self.recognizer.partial_interval
+		last_partial = time.monotonic()
+		for chunk in self.chunks():
+			buffer.extend(chunk)
+			if interval > 0 and time.monotonic() - last_partial >= interval:
+				self.partial(self._transcribe(np.frombuffer(buffer, dtype=np.int16).astype(np.float32) / 32768.0))
+				last_partial = time.monotonic()
+		if self.b_cancelled or not buffer:
+			return None, 0.0
+		return self._transcribe(np.frombuffer(buffer, dtype=np.int16).astype(np.float32) / 32768.0), 0.0
+
+class WhisperRecognizer(SpeechRecognizer):
+	"""Offline recognition with faster-whisper. Needs 16 kHz audio."""
+	def __init__(self, sample_rate: int, model_name: str = "tiny.en", partial_interval: float = 1.0) -> None:
+		super().__init__(sample_rate)
+		from faster_whisper import WhisperModel  # Optional dependency: pip install faster-whisper
+		self.model = WhisperModel(model_name, device="cpu", compute_type="int8")
+		self.partial_interval: float = partial_interval  # Seconds between partial re-decodes; 0 disables partials
+
+	def create_session(self) -> RecognitionSession:
+		return WhisperSession(self)
+
+RECOGNIZERS: Dict[str, Type[SpeechRecognizer]] = {
+	"google": GoogleRecognizer,
+	"vosk": VoskRecognizer,
+	"whisper": WhisperRecognizer,
+}
+
+def create_recognizer(engine: str, sample_rate: int, **options: Any) -> Optional[SpeechRecognizer]:
+	"""Build the named recognizer. Returns None if it is unknown or cannot be loaded."""
+	recognizer_class = RECOGNIZERS.get(engine.lower())
+	if recognizer_class is None:
+		print(f"Unknown speech-to-text engine '{engine}' in config.cfg.")
+		return None
+	try:
+		return recognizer_class(sample_rate, **options)
+	except Exception as e:
+		print(f"Could not start '{engine}' speech-to-text: {e}")
+		return None
+
+def create_recognizer_from_config(config: configparser.ConfigParser, sample_rate: int, engine: Optional[str] = None) -> Optional[SpeechRecognizer]:
+	"""Build the recognizer chosen in the [SpeechToText] section of config.cfg (or the given engine)."""
+	section = "SpeechToText"
+	engine = (engine or config.get(section, "Engine", fallback="google")).lower()
+	options: Dict[str, Any] = {}
+	if engine == "vosk":
+		model_path = config.get(section, "VoskModelPath", fallback="vosk-model-small-en-us")
+		options["model_path"] = os.path.join(os.path.dirname(os.path.realpath(__file__)), model_path)
+	elif engine == "whisper":
+		options["model_name"] = config.get(section, "WhisperModel", fallback="tiny.en")
+		options["partial_interval"] = config.getfloat(section, "WhisperPartialSeconds", fallback=1.0)
+	return create_recognizer(engine, sample_rate, **options)
+
+def benchmark(recognizer: SpeechRecognizer, pcm: np.ndarray, frame_length: int = 512, b_realtime: bool = False) -> Dict[str, Any]:
+	"""
+	Stream mono int16 PCM through one session and time it. 'final_latency' is the delay between the
+	last frame going in and the final transcript coming out, which is what the listener waits for.
+	"""
+	done = threading.Event()
+	stats: Dict[str, Any] = {"first_partial": None, "partials": 0, "text": None}
+	session = recognizer.create_session()
+	start_time = time.monotonic()
+
+	def on_partial(text: str) -> None:
+		if stats["first_partial"] is None:
+			stats["first_partial"] = time.monotonic() - start_time
+		stats["partials"] += 1
+
+	def on_done(text: Optional[str], confidence: float) -> None:
+		stats["text"] = text
+		done.set()
+
+	session.on_partial = on_partial
+	session.on_done = on_done
+	session.start()
+	frame_seconds = frame_length / recognizer.sample_rate
+	for i in range(0, len(pcm), frame_length):
+		if b_realtime:
+			time.sleep(max(0.0, start_time + (i // frame_length) * frame_seconds - time.monotonic()))
+		session.feed(pcm[i:i + frame_length])
+	end_of_audio = time.monotonic()
+	session.finish()
+	done.wait()
+	finished = time.monotonic()
+
+	stats["audio_seconds"] = len(pcm) / recognizer.sample_rate
+	stats["final_latency"] = finished - end_of_audio
+	stats["real_time_factor"] = (finished - start_time) / max(stats["audio_seconds"], 1e-9)
+	return stats
+
+
+if __name__ == "__main__":
+	# Offline benchmark: python3 speech_recognizer.py <google|vosk|whisper> [--realtime] <audio file> [<audio file> ...]
+	import sys
+	from audio_engine import decode_file
+
+	args = [arg for arg in sys.argv[1:] if arg != "--realtime"]
+	b_realtime = "--realtime" in sys.argv
+	if len(args) < 2:
+		print("Usage: python3 speech_recognizer.py <google|vosk|whisper> [--realtime] <audio file> [<audio file> ...]")
+		sys.exit(1)
+
+	config = configparser.ConfigParser()
+	config.read(os.path.join(os.path.dirname(os.path.realpath(__file__)), "config.cfg"))
+	sample_rate = 16000
+	recognizer = create_recognizer_from_config(config, sample_rate, args[0])
+	if recognizer is None:
+		sys.exit(1)
+
+	latencies: List[float] = []
+	for file_path in args[1:]:
+		pcm = decode_file(file_path, sample_rate, 1)[:, 0]
+		stats = benchmark(recognizer, pcm, b_realtime=b_realtime)
+		latencies.append(stats["final_latency"])
+		first_partial = f"{stats['first_partial']:.2f}s" if stats["first_partial"] is not None else "none"
+		print(f"{os.path.basename(file_path)}: {stats['audio_seconds']:.1f}s audio, final after {stats['final_latency'] * 1000:.0f} ms, "
+			  f"RTF {stats['real_time_factor']:.2f}, first partial {first_partial} ({stats['partials']} partials)")
+		print(f"    \"{stats['text']}\"")
+	print(f"Median final latency: {sorted(latencies)[len(latencies) // 2] * 1000:.0f} ms over {len(latencies)} file(s)")
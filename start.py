@@ -13,6 +13,8 @@ import time
 import threading
 import pygame
 import ctypes
+import configparser
+from typing import Any, Optional
 from pydispatch import dispatcher
 from web_io import WebServer
 from system_info import SystemInfo
@@ -23,6 +25,14 @@ from show_player import ShowPlayer
 from voice_input_processor import VoiceInputProcessor
 from voice_event_handler import VoiceEventHandler
 from wifi_management import WifiManagement
+from audio_engine import MIXER_BUFFER_FRAMES, AudioEngine
+from valve_latency import ValveLatency
+from key_protocol import KeyProtocol
+from input_arbiter import create_input_arbiter
+from input_journal import InputJournal
+from sequence_scheduler import SequenceScheduler
+from network_midi import create_network_midi
+from valve_state_stream import ValveStateStream
 
 
 class Pasqually:
@@ -30,22 +40,47 @@ class Pasqually:
 		self.is_running: bool = True
 
 		# Initialize pygame for managing audio playback
-		pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=2048)
+		pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=MIXER_BUFFER_FRAMES)
 		pygame.display.init()
 		pygame.display.set_mode((1, 1))
 
+		# All playback (shows, voice assets, TTS) is mixed by one engine instead of sharing mixer.music
+		self.audio_engine = AudioEngine(pygame)
+
 		self.wifi_access_points = None
 
+		self.config = configparser.ConfigParser()
+		self.config.read(os.path.join(os.path.dirname(os.path.realpath(__file__)), "config.cfg"))
+
 		# Initialize components
 		self.gpio = GPIO()
 		self.movements = Movement(self.gpio)
-		self.web_server = WebServer()
+		self.input_journal = self.create_input_journal()
+		self.movements.journal = self.input_journal
+		self.input_arbiter, self.input_coalescer = create_input_arbiter(self.config, self.movements, self.input_journal)
+		self.web_server = self.create_web_server()
+		self.key_protocol = KeyProtocol(self.movements, self.input_arbiter)
+		self.web_server.set_key_protocol(self.key_protocol)
+		self.sequence_scheduler = SequenceScheduler(self.movements, self.input_arbiter,
+													self.config.getint("WebServer", "MaxSequenceSteps", fallback=10000),
+													self.config.getint("WebServer", "MaxActiveSequences", fallback=4))
+		self.web_server.set_sequence_scheduler(self.sequence_scheduler)
+		self.network_midi = create_network_midi(self.config, self.movements, self.input_arbiter)
+		self.valve_state_stream = ValveStateStream(self.gpio, self.movements, self.web_server,
+												   self.config.getfloat("WebServer", "ValveStateFps", fallback=15))
 		self.wifi_management = WifiManagement()
 		self.system_info = SystemInfo()
-		self.gamepad = USBGamepadReader(self.movements, self.web_server)
-		self.show_player = ShowPlayer(pygame)
-		self.voice_input_processor = VoiceInputProcessor(pygame)
-		self.voice_event_handler = VoiceEventHandler(pygame, self.voice_input_processor)
+		self.gamepad = USBGamepadReader(self.movements, self.web_server, self.input_arbiter)
+		self.show_player = ShowPlayer(self.audio_engine)
+		self.voice_input_processor = VoiceInputProcessor(self.audio_engine)
+		self.voice_event_handler = VoiceEventHandler(self.audio_engine, self.voice_input_processor)
+
+		# Issue movements early by each valve's lead time, for shows, lip-sync and animations alike
+		ValveLatency().apply(self.movements)
+		lead_times = self.movements.get_lead_times()
+		self.show_player.set_lead_time_lookup(self.movements.get_midi_lead_time)
+		self.voice_input_processor.puppeteer.lip_sync.set_lead_times(lead_times)
+		self.voice_event_handler.puppeteer.lip_sync.set_lead_times(lead_times)
 
 		self.set_dispatch_events()
 
@@ -55,6 +90,23 @@ class Pasqually:
 
 		self.movements.set_default_animation(True)
 
+	def create_input_journal(self) -> Optional[InputJournal]:
+		if not self.config.getboolean("InputJournal", "Enabled", fallback=True):
+			return None
+		directory = os.path.join(os.path.dirname(os.path.realpath(__file__)), self.config.get("InputJournal", "Directory", fallback="inputJournal"))
+		return InputJournal(directory, self.config.getfloat("InputJournal", "MaxMegabytes", fallback=8),
+							self.config.getint("InputJournal", "MaxFiles", fallback=10))
+
+	def create_web_server(self) -> Any:
+		broadcast_tick_seconds = self.config.getfloat("WebServer", "BroadcastTickSeconds", fallback=0.1)
+		if self.config.get("WebServer", "Mode", fallback="threading").strip().lower() == "asyncio":
+			try:
+				from async_web_io import AsyncWebServer
+				return AsyncWebServer(broadcast_tick_seconds=broadcast_tick_seconds)
+			except ImportError as e:
+				print(f"Asyncio web server unavailable, using threading mode: {e}")
+		return WebServer(broadcast_tick_seconds)
+
 	def set_dispatch_events(self) -> None:
 		dispatcher.connect(self.on_key_event, signal='keyEvent', sender=dispatcher.Any)
 		dispatcher.connect(self.on_system_info_update, signal='systemInfoUpdate', sender=dispatcher.Any)
@@ -99,12 +151,24 @@ class Pasqually:
 			if self.voice_input_processor:
 				self.voice_input_processor.shutdown()
 
+			if self.valve_state_stream:
+				self.valve_state_stream.shutdown()
+
 			if self.web_server:
 				self.web_server.shutdown()
 
+			if self.network_midi:
+				self.network_midi.shutdown()
+
+			if self.input_journal:
+				self.input_journal.close()
+
 			if self.show_player:
 				self.show_player.stop_show()
 
+			if self.audio_engine:
+				self.audio_engine.shutdown()
+
 			# Ensure all non-main threads exit before quitting pygame
 			for thread in threading.enumerate():
 				if thread is not threading.main_thread():
@@ -129,11 +193,15 @@ class Pasqually:
 			sys.exit(1)
 
 	def on_system_info_update(self) -> None:
-		self.web_server.broadcast('systemInfo', self.system_info.get())
+		info = self.system_info.get()
+		if info is not None:
+			info = dict(info, suppressed_inputs=self.input_coalescer.suppressed)
+		self.web_server.broadcast('systemInfo', info)
 
 	# Event handling methods
 	def on_voice_input_event(self, id: str, value: any = None) -> None:
-		self.web_server.broadcast('voiceCommandUpdate', {"id": id, "value": value})
+		# Voice updates are a stream of events the page acts on one by one, so they skip the hub's latest-value topics.
+		self.web_server.emit_all('voiceCommandUpdate', {"id": id, "value": value})
 
 		# Play various animations to show Pasqually is listening and processing voice commands.
 		if id in ("idle", "ttsComplete"):
@@ -179,6 +247,8 @@ class Pasqually:
 		self.show_player.toggle_pause()
 
 	def on_show_playback_midi_event(self, midi_note: any, val: any) -> None:
+		if self.input_journal:
+			self.input_journal.record_midi("show", midi_note, val)
 		self.movements.execute_midi_note(midi_note, val)
 
 	def on_connect_event(self, client_ip: str) -> None:
@@ -186,18 +256,19 @@ class Pasqually:
 
 		# Tell the web frontend what the current voice command status is.
 		command = self.voice_input_processor.get_last_voice_command()
-		self.web_server.broadcast('voiceCommandUpdate', command)
+		self.web_server.emit_all('voiceCommandUpdate', command)
 
 		self.on_system_info_update()
 		self.show_player.get_show_list()
 		self.web_server.broadcast('movementInfo', self.movements.get_all_movement_info())
+		self.web_server.broadcast('keyTable', self.key_protocol.keys)
 		self.web_server.broadcast('wifiScan', self.wifi_access_points)
 		self.wifi_management.scan_wifi_access_points()
 
-	def on_key_event(self, key: any, val: any) -> None:
-		# Receive key events from the HTML front end and execute any specified movement
+	def on_key_event(self, key: any, val: any, source: str = "automation") -> None:
+		# Receive key events from the HTML front end (or lip-sync and animations) and execute any specified movement
 		try:
-			self.movements.execute_movement(str(key).lower(), val)
+			self.input_arbiter.press(source, str(key).lower(), val)
 		except Exception as e:
 			print(f"Invalid key: {e}")
 
@@ -0,0 +1,223 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Mapping, Optional, Set, Tuple
+
+mimetypes.add_type("font/woff", ".woff")
+mimetypes.add_type("font/woff2", ".woff2")
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json", ".svg", ".txt", ".ttf", ".otf", ".eot")
+LONG_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CHUNK_SIZE = 64 * 1024  # Files not kept in memory are sent in pieces this size
+
+@dataclass
+class StaticAsset:
+	file_path: str = ""
+	content_type: str = "application/octet-stream"
+	digest: str = ""  # SHA-1 of the content as served without encoding
+	size: int = 0
+	body: Optional[bytes] = None  # Kept in memory for pages rewritten at build time; other files are read on demand
+	encodings: Dict[str, bytes] = field(default_factory=dict)  # Content-Encoding -> pre-compressed body
+
+	@property
+	def version(self) -> str:
+		return self.digest[:10]
+
+	def etag(self, encoding: Optional[str] = None) -> str:
+		# Strong ETags must differ between encodings of the same resource.
+		return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+@dataclass
+class StaticResponse:
+	status: int = 200
+	headers: Dict[str, str] = field(default_factory=dict)
+	body: bytes = b""
+	file_path: Optional[str] = None  # When set, the body is streamed from this file with chunks() instead
+	offset: int = 0
+	length: int = 0
+
+	def chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+		with open(self.file_path, "rb") as f:
+			f.seek(self.offset)
+			remaining = self.length
+			while remaining > 0:
+				chunk = f.read(min(chunk_size, remaining))
+				if not chunk:
+					return
+				remaining -= len(chunk)
+				yield chunk
+
+class StaticAssets:
+	"""
+	Serves the control page's static files the way a phone on the hotspot wants them. Everything is
+	hashed once at startup: text assets get gzip (and brotli, if installed) variants, every file gets a
+	strong ETag, and index.html is rewritten so its scripts, styles and images carry a ?v=<hash> that
+	lets them be cached for a year. Range requests are honoured, so the banner video can seek and resume.
+	"""
+	def __init__(self, root_dir: str, cache_dir: Optional[str] = None) -> None:
+		self.root_dir: str = root_dir
+		self.cache_dir: Optional[str] = cache_dir  # Compressed variants are kept here so restarts don't redo them
+		self.assets: Dict[str, StaticAsset] = {}
+		self.cached_variants: Set[str] = set()  # Cache file names used by this build; the rest are stale
+		self.compressors = {"gzip": lambda data: gzip.compress(data, 9, mtime=0)}
+		try:
+			import brotli  # Optional dependency: pip install brotli
+			self.compressors["br"] = lambda data: brotli.compress(data, quality=11)
+		except ImportError:
+			pass
+		if cache_dir:
+			os.makedirs(cache_dir, exist_ok=True)
+		self.build()
+
+	def build(self) -> None:
+		pages: List[str] = []
+		for dir_path, _, file_names in os.walk(self.root_dir):
+			for file_name in file_names:
+				file_path = os.path.join(dir_path, file_name)
+				path = os.path.relpath(file_path, self.root_dir).replace(os.sep, "/")
+				if path.endswith(".html"):
+					pages.append(path)
+					continue
+				with open(file_path, "rb") as f:
+					self.assets[path] = self.make_asset(file_path, f.read(), b_keep_body=False)
+
+		# Pages last, once every asset they reference has a version to stamp on its URL.
+		for path in pages:
+			file_path = os.path.join(self.root_dir, path)
+			with open(file_path, "rb") as f:
+				page = self.version_urls(os.path.dirname(path), f.read().decode("utf-8"))
+			self.assets[path] = self.make_asset(file_path, page.encode("utf-8"), b_keep_body=True)
+		self.remove_stale_variants()
+
+	def make_asset(self, file_path: str, data: bytes, b_keep_body: bool) -> StaticAsset:
+		content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+		if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+			content_type += "; charset=utf-8"
+		asset = StaticAsset(file_path, content_type, hashlib.sha1(data).hexdigest(), len(data), data if b_keep_body else None)
+		if file_path.endswith(COMPRESSIBLE_EXTENSIONS):
+			for encoding, compress in self.compressors.items():
+				compressed = self.load_variant(asset.digest, encoding, data, compress)
+				if len(compressed) < asset.size * 0.9:
+					asset.encodings[encoding] = compressed
+		return asset
+
+	def load_variant(self, digest: str, encoding: str, data: bytes, compress) -> bytes:
+		if not self.cache_dir:
+			return compress(data)
+		cache_path = os.path.join(self.cache_dir, f"{digest}.{encoding}")
+		self.cached_variants.add(os.path.basename(cache_path))
+		if os.path.exists(cache_path):
+			with open(cache_path, "rb") as f:
+				return f.read()
+		compressed = compress(data)
+		try:
+			with open(cache_path + ".tmp", "wb") as f:
+				f.write(compressed)
+			os.replace(cache_path + ".tmp", cache_path)
+		except OSError as e:
+			print(f"Could not cache compressed asset: {e}")
+		return compressed
+
+	def remove_stale_variants(self) -> None:
+		"""Delete compressed variants of files that have since changed or been removed."""
+		if not self.cache_dir:
+			return
+		for file_name in os.listdir(self.cache_dir):
+			if re.fullmatch(r"[0-9a-f]{40}\.\w+(\.tmp)?", file_name) and file_name not in self.cached_variants:
+				try:
+					os.remove(os.path.join(self.cache_dir, file_name))
+				except OSError as e:
+					print(f"Could not remove stale compressed asset: {e}")
+
+	def version_urls(self, base: str, page: str) -> str:
+		def add_version(match: re.Match) -> str:
+			url = match.group(2)
+			asset = self.assets.get(os.path.normpath(os.path.join(base, url)).replace(os.sep, "/"))
+			return f'{match.group(1)}="{url}?v={asset.version}"' if asset else match.group(0)
+		return re.sub(r'\b(src|href)="([^"#?:]+)"', add_version, page)
+
+	@staticmethod
+	def accepted_encodings(accept_encoding: str) -> List[str]:
+		encodings = []
+		for part in accept_encoding.split(","):
+			token, _, params = part.strip().partition(";")
+			if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+				encodings.append(token.strip().lower())
+		return encodings
+
+	@staticmethod
+	def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+		"""
+		Single 'bytes=' range as (start, end inclusive), with start > end if it can't be satisfied. None if
+		the header is malformed or reversed (e.g. bytes=100-50), which RFC 7233 says to ignore.
+		"""
+		match = re.fullmatch(r"\s*bytes=(\d*)-(\d*)\s*", range_header)
+		if not match or not (match.group(1) or match.group(2)):
+			return None
+		if match.group(1):
+			start = int(match.group(1))
+			if match.group(2) and int(match.group(2)) < start:
+				return None
+			end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+		else:
+			# Suffix range: the last N bytes. bytes=-0 asks for nothing and can't be satisfied.
+			suffix = int(match.group(2))
+			start = max(0, size - suffix) if suffix else size
+			end = size - 1
+		return (start, end)
+
+	def body_response(self, asset: StaticAsset, status: int, headers: Dict[str, str], start: int, length: int) -> StaticResponse:
+		if asset.body is not None:
+			return StaticResponse(status, headers, asset.body[start:start + length])
+		# Files read on demand are streamed, so serving the banner video doesn't load it all into memory.
+		headers["Content-Length"] = str(length)
+		return StaticResponse(status, headers, file_path=asset.file_path, offset=start, length=length)
+
+	def respond(self, path: str, version: Optional[str], headers: Mapping[str, str]) -> Optional[StaticResponse]:
+		"""Build the response for a GET of path, or None if there is no such asset."""
+		asset = self.assets.get(path)
+		if asset is None:
+			return None
+
+		range_header = headers.get("Range")
+		if range_header and headers.get("If-Range") not in (None, asset.etag()):
+			range_header = None
+
+		# Ranges are served from the unencoded file; anything else gets the best encoding the client accepts.
+		encoding = None
+		if not range_header:
+			accepted = self.accepted_encodings(headers.get("Accept-Encoding", ""))
+			encoding = next((name for name in ("br", "gzip") if name in asset.encodings and name in accepted), None)
+
+		response_headers = {
+			"Content-Type": asset.content_type,
+			"ETag": asset.etag(encoding),
+			"Cache-Control": LONG_CACHE if version == asset.version else REVALIDATE,
+			"Accept-Ranges": "bytes",
+		}
+		if asset.encodings:
+			response_headers["Vary"] = "Accept-Encoding"
+
+		if_none_match = headers.get("If-None-Match", "")
+		if if_none_match.strip() == "*" or asset.etag(encoding) in [tag.strip() for tag in if_none_match.split(",")]:
+			return StaticResponse(304, response_headers)
+
+		if encoding:
+			response_headers["Content-Encoding"] = encoding
+			return StaticResponse(200, response_headers, asset.encodings[encoding])
+
+		byte_range = self.parse_range(range_header, asset.size) if range_header else None
+		if byte_range is not None:
+			start, end = byte_range
+			if start > end:
+				response_headers["Content-Range"] = f"bytes */{asset.size}"
+				return StaticResponse(416, response_headers)
+			# Even a range covering the whole file (bytes=0-) gets a 206, which players probing for seek support expect.
+			response_headers["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+			return self.body_response(asset, 206, response_headers, start, end - start + 1)
+
+		return self.body_response(asset, 200, response_headers, 0, asset.size)
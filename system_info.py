@@ -41,16 +41,20 @@ class SystemInfo:
 			dispatcher.send(signal="systemInfoUpdate")
 			time.sleep(2)
 
+	def get_pressure_counts(self) -> int:
+		# Read the raw 14-bit count from the ABPDANV150PGSA3 sensor
+		spi = spidev.SpiDev()
+		spi.open(0, 0)
+		spi.max_speed_hz = 500000      # Adjust the speed as needed
+		spi.mode = 0b00                # SPI mode (clock polarity and phase)
+		response = spi.xfer2([0x00, 0x00])
+		spi.close()
+		return (response[0] << 8) | response[1]
+
 	def get_psi(self) -> Union[int, str]:
 		# Read PSI from the ABPDANV150PGSA3 sensor
 		try:
-			spi = spidev.SpiDev()
-			spi.open(0, 0)
-			spi.max_speed_hz = 500000      # Adjust the speed as needed
-			spi.mode = 0b00                # SPI mode (clock polarity and phase)
-			response = spi.xfer2([0x00, 0x00])
-			raw_value = (response[0] << 8) | response[1]
-			spi.close()
+			raw_value = self.get_pressure_counts()
 			offset = 1600
 			span = 9339 - offset  # 9339 - 1600 = 7739 counts
 			scale = 90.0 / span   # ≈ 0.01163 PSI per count
@@ -0,0 +1,94 @@
+import configparser
+import os
+import statistics
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+class ValveLatency:
+	"""
+	Loads per-movement pneumatic lead times from config.cfg and can measure them by firing a
+	valve and timing how long the air pressure takes to react.
+	"""
+	def __init__(self, config_file: str = "config.cfg") -> None:
+		self.config: configparser.ConfigParser = self.load_config(config_file)
+
+	def load_config(self, config_file: str) -> configparser.ConfigParser:
+		config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), config_file)
+		if not os.path.exists(config_path):
+			raise FileNotFoundError(f"Configuration file not found: {config_path}")
+		config = configparser.ConfigParser()
+		config.read(config_path)
+		return config
+
+	def get_lead_times(self) -> Dict[str, Tuple[float, float]]:
+		"""Read '<key> = <open seconds>, <close seconds>' entries from the [ValveLatency] section."""
+		lead_times: Dict[str, Tuple[float, float]] = {}
+		if not self.config.has_section("ValveLatency"):
+			return lead_times
+		for key, value in self.config["ValveLatency"].items():
+			try:
+				parts = [float(part) for part in value.split(",")]
+				open_lead = parts[0]
+				close_lead = parts[1] if len(parts) > 1 else open_lead
+				lead_times[key] = (max(0.0, open_lead), max(0.0, close_lead))
+			except (ValueError, IndexError):
+				print(f"Invalid ValveLatency entry in config.cfg: {key} = {value}")
+		return lead_times
+
+	def apply(self, movements: Any) -> None:
+		movements.set_lead_times(self.get_lead_times())
+
+	def measure(self, movements: Any, key: str, read_pressure: Callable[[], float], repetitions: int = 5,
+				threshold: float = 8, timeout: float = 0.5, settle_time: float = 0.75) -> Tuple[Optional[float], Optional[float]]:
+		"""
+		Fire a movement repeatedly and time how long the supply pressure takes to move more than
+		'threshold' sensor counts away from its resting value. Returns median (open, close) delays.
+		"""
+		def time_response(val: int) -> Optional[float]:
+			baseline = statistics.mean(read_pressure() for _ in range(10))
+			start_time = time.monotonic()
+			movements.execute_movement(key, val, True)
+			while time.monotonic() - start_time < timeout:
+				if abs(read_pressure() - baseline) > threshold:
+					return time.monotonic() - start_time
+			return None
+
+		open_times: List[float] = []
+		close_times: List[float] = []
+		for _ in range(repetitions):
+			result = time_response(1)
+			if result is not None:
+				open_times.append(result)
+			time.sleep(settle_time)
+			result = time_response(0)
+			if result is not None:
+				close_times.append(result)
+			time.sleep(settle_time)
+
+		open_lead = statistics.median(open_times) if open_times else None
+		close_lead = statistics.median(close_times) if close_times else None
+		return open_lead, close_lead
+
+
+if __name__ == "__main__":
+	# Calibration: python3 valve_latency.py <key> [<key> ...]
+	import sys
+	from gpio import GPIO
+	from animatronic_movements import Movement
+	from system_info import SystemInfo
+
+	keys = sys.argv[1:]
+	if not keys:
+		print("Usage: python3 valve_latency.py <movement key> [<movement key> ...]")
+		sys.exit(1)
+
+	latency = ValveLatency()
+	movements = Movement(GPIO())
+	system_info = SystemInfo(False)
+	print("Add or update these lines in the [ValveLatency] section of config.cfg:")
+	for key in keys:
+		open_lead, close_lead = latency.measure(movements, key, system_info.get_pressure_counts)
+		if open_lead is None or close_lead is None:
+			print(f"# {key}: no pressure response detected, check the air supply and sensor")
+		else:
+			print(f"{key} = {open_lead:.3f}, {close_lead:.3f}")
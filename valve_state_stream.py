@@ -0,0 +1,56 @@
+import threading
+import time
+from typing import Any, Dict, List
+
+class ValveStateStream:
+	"""
+	Mirrors what the valves are doing to the web page, whatever is driving them (the keypad, a show,
+	lip-sync or an idle animation). Each frame is the GPIO expanders' output latches, one bit per
+	valve, so it costs a few bytes however busy the body is. Frames go out at most fps times a second,
+	only when a valve changed, plus a keyframe every keyframe_seconds for pages that just connected.
+	"""
+	def __init__(self, gpio: Any, movements: Any, web_server: Any, fps: float = 15, keyframe_seconds: float = 1.0) -> None:
+		self.gpio = gpio
+		self.movements = movements
+		self.web_server = web_server
+		self.fps: float = fps
+		self.keyframe_seconds: float = keyframe_seconds
+		self.b_running: bool = fps > 0
+
+		# The layout never changes, so the broadcast hub hands it to every page once.
+		self.web_server.broadcast('valveLayout', self.get_layout())
+
+		if self.b_running:
+			self.thread = threading.Thread(target=self.run, daemon=True)
+			self.thread.start()
+
+	def get_layout(self) -> List[Dict[str, Any]]:
+		"""Which latch bits belong to each movement: pin1 drives it one way, pin2 (if any) the other."""
+		layout = []
+		for movement in self.movements.all:
+			if not movement.output_pin1:
+				continue
+			layout.append({
+				"description": movement.description,
+				"pin1": self.gpio.get_bit_index(*movement.output_pin1),
+				"pin2": self.gpio.get_bit_index(*movement.output_pin2) if movement.output_pin2 else -1,
+			})
+		return layout
+
+	def run(self) -> None:
+		interval = 1.0 / self.fps
+		last_state = b""
+		last_sent_time = 0.0
+		next_frame_time = time.monotonic()
+		while self.b_running:
+			now = time.monotonic()
+			state = self.gpio.get_latches()
+			if state != last_state or now - last_sent_time >= self.keyframe_seconds:
+				self.web_server.emit_all('valveState', state)
+				last_state = state
+				last_sent_time = now
+			next_frame_time += interval
+			time.sleep(max(0.0, next_frame_time - time.monotonic()))
+
+	def shutdown(self) -> None:
+		self.b_running = False
@@ -0,0 +1,129 @@
+import abc
+import math
+import numpy as np
+from typing import Any, Dict, Optional, Type
+
+class VoiceActivityDetector(abc.ABC):
+	"""Decides, one capture frame at a time, whether the frame contains speech. Subclass to add a backend."""
+	def __init__(self, sample_rate: int, frame_length: int) -> None:
+		self.sample_rate: int = sample_rate
+		self.frame_length: int = frame_length
+
+	@abc.abstractmethod
+	def is_speech(self, frame: np.ndarray) -> bool:
+		"""Return True if the frame (frame_length int16 samples) contains speech."""
+
+	def reset(self) -> None:
+		pass
+
+class EnergyVAD(VoiceActivityDetector):
+	"""
+	Compares each frame's level against a noise floor that follows the room: it drops straight to
+	any quieter frame and creeps back up slowly, so steady background noise is absorbed while
+	speech stands out above it by at least margin_db.
+	"""
+	def __init__(self, sample_rate: int, frame_length: int, margin_db: float = 10.0, floor_rise_db: float = 2.0,
+				 min_floor_db: float = 30.0) -> None:
+		super().__init__(sample_rate, frame_length)
+		self.margin_db: float = margin_db
+		self.floor_rise_per_frame: float = floor_rise_db * frame_length / sample_rate  # floor_rise_db is per second
+		self.min_floor_db: float = min_floor_db  # Never treat the floor as quieter than this (dB re. 1 LSB)
+		self.noise_floor_db: Optional[float] = None
+		self.level_db: float = 0.0
+		self.energy_buffer: np.ndarray = np.zeros(frame_length, dtype=np.float32)
+
+	def frame_level_db(self, frame: np.ndarray) -> float:
+		np.copyto(self.energy_buffer[:len(frame)], frame, casting='unsafe')
+		energy = float(np.dot(self.energy_buffer[:len(frame)], self.energy_buffer[:len(frame)])) / max(1, len(frame))
+		return 10.0 * math.log10(energy + 1.0)
+
+	def is_speech(self, frame: np.ndarray) -> bool:
+		self.level_db = self.frame_level_db(frame)
+		if self.noise_floor_db is None:
+			self.noise_floor_db = self.level_db
+		else:
+			self.noise_floor_db = min(self.level_db, self.noise_floor_db + self.floor_rise_per_frame)
+		return self.level_db > max(self.noise_floor_db, self.min_floor_db) + self.margin_db
+
+class WebRtcVAD(VoiceActivityDetector):
+	"""WebRTC's GMM speech detector. Votes across the 10 ms chunks that fit in a capture frame."""
+	def __init__(self, sample_rate: int, frame_length: int, aggressiveness: int = 2) -> None:
+		super().__init__(sample_rate, frame_length)
+		import webrtcvad  # Optional dependency: pip install webrtcvad
+		self.vad = webrtcvad.Vad(aggressiveness)
+		self.chunk_length: int = sample_rate // 100
+
+	def is_speech(self, frame: np.ndarray) -> bool:
+		data = np.ascontiguousarray(frame, dtype=np.int16).tobytes()
+		chunk_bytes = self.chunk_length * 2
+		votes = [self.vad.is_speech(data[i:i + chunk_bytes], self.sample_rate)
+				 for i in range(0, len(data) - chunk_bytes + 1, chunk_bytes)]
+		return sum(votes) * 2 > len(votes)
+
+DETECTORS: Dict[str, Type[VoiceActivityDetector]] = {
+	"energy": EnergyVAD,
+	"webrtc": WebRtcVAD,
+}
+
+def create_detector(engine: str, sample_rate: int, frame_length: int, **options: Any) -> VoiceActivityDetector:
+	"""Build the named detector, falling back to EnergyVAD if it is unknown or cannot be loaded."""
+	detector_class = DETECTORS.get(engine.lower())
+	if detector_class is None:
+		print(f"Unknown voice activity engine '{engine}'. Using energy detection.")
+	else:
+		try:
+			return detector_class(sample_rate, frame_length, **options)
+		except Exception as e:
+			print(f"Could not start '{engine}' voice activity detection ({e}). Using energy detection.")
+	return EnergyVAD(sample_rate, frame_length)
+
+class SpeechEndpointer:
+	"""
+	Follows one utterance frame by frame. Speech has to last min_speech_seconds to count as started,
+	and the turn ends once it has been quiet for hangover_seconds. The detector keeps learning the
+	room between utterances through observe().
+	"""
+	END_OF_SPEECH = "endOfSpeech"
+	NO_SPEECH = "noSpeech"
+	MAX_LENGTH = "maxLength"
+
+	def __init__(self, detector: VoiceActivityDetector, hangover_seconds: float = 0.5, start_timeout_seconds: float = 5.0,
+				 max_seconds: float = 10.0, min_speech_seconds: float = 0.15) -> None:
+		self.detector: VoiceActivityDetector = detector
+		frame_seconds = detector.frame_length / detector.sample_rate
+		to_frames = lambda seconds: max(1, int(round(seconds / frame_seconds)))
+		self.hangover_frames: int = to_frames(hangover_seconds)
+		self.start_timeout_frames: int = to_frames(start_timeout_seconds)
+		self.max_frames: int = to_frames(max_seconds)
+		self.min_speech_frames: int = to_frames(min_speech_seconds)
+		self.reset()
+
+	def reset(self) -> None:
+		self.frames: int = 0
+		self.speech_run: int = 0  # Consecutive speech frames
+		self.silent_run: int = 0  # Consecutive non-speech frames since speech started
+		self.b_started: bool = False
+
+	def observe(self, frame: np.ndarray) -> None:
+		"""Feed a frame outside an utterance so the detector keeps tracking the background."""
+		self.detector.is_speech(frame)
+
+	def process(self, frame: np.ndarray) -> Optional[str]:
+		"""Returns None while the utterance continues, otherwise why it ended."""
+		self.frames += 1
+		if self.detector.is_speech(frame):
+			self.speech_run += 1
+			self.silent_run = 0
+			if self.speech_run >= self.min_speech_frames:
+				self.b_started = True
+		else:
+			self.speech_run = 0
+			self.silent_run += 1
+
+		if self.b_started and self.silent_run >= self.hangover_frames:
+			return self.END_OF_SPEECH
+		if not self.b_started and self.frames >= self.start_timeout_frames:
+			return self.NO_SPEECH
+		if self.frames >= self.max_frames:
+			return self.MAX_LENGTH
+		return None
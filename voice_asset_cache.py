@@ -0,0 +1,179 @@
+import os
+import json
+import numpy as np
+from audio_engine import decode_file
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+@dataclass
+class VoiceClip:
+	name: str = ""  # File name of the source asset (e.g. numero_7.wav)
+	pcm: Optional[np.ndarray] = None  # Mixer-ready int16 samples, shape (frames, channels)
+	sample_rate: int = 44100
+	envelope: Optional[np.ndarray] = None  # Normalized RMS per puppeteering interval
+
+	@property
+	def duration(self) -> float:
+		return len(self.pcm) / self.sample_rate
+
+class VoiceAssetCache:
+	"""
+	Decodes the bundled voice assets once and stores their PCM and lip-sync envelope
+	next to the assets, so playback never has to decode or analyze them again.
+	"""
+	SUPPORTED_EXTENSIONS = ('.wav', '.ogg', '.mp3')
+	MANIFEST_NAME = "manifest.json"
+
+	def __init__(self, asset_dir: str, puppeteer: Any, sample_rate: int = 44100, channels: int = 2, cache_dir: Optional[str] = None) -> None:
+		self.asset_dir = asset_dir
+		self.puppeteer = puppeteer  # Used for its RMS envelope settings so cached envelopes match live ones
+		self.sample_rate = sample_rate
+		self.channels = channels
+		self.cache_dir = cache_dir or os.path.join(asset_dir, "cache")
+		self.clips: Dict[str, VoiceClip] = {}
+
+	def _format_key(self) -> Dict[str, Any]:
+		# Anything that changes the cached data invalidates the whole cache.
+		return {
+			'sample_rate': self.sample_rate,
+			'channels': self.channels,
+			'interval_ms': self.puppeteer.interval_ms,
+		}
+
+	def _asset_files(self) -> List[str]:
+		if not os.path.isdir(self.asset_dir):
+			return []
+		return sorted(f for f in os.listdir(self.asset_dir) if f.lower().endswith(self.SUPPORTED_EXTENSIONS))
+
+	def _cache_paths(self, file_name: str) -> List[str]:
+		base_name = os.path.join(self.cache_dir, file_name)
+		return [base_name + ".pcm.npy", base_name + ".env.npy"]
+
+	def _read_manifest(self) -> Dict[str, Any]:
+		try:
+			with open(os.path.join(self.cache_dir, self.MANIFEST_NAME), "r") as f:
+				return json.load(f)
+		except Exception:
+			return {}
+
+	def decode(self, file_path: str) -> np.ndarray:
+		"""Decode an audio file into int16 PCM in the mixer's sample rate and channel layout."""
+		return decode_file(file_path, self.sample_rate, self.channels)
+
+	def build(self, force: bool = False) -> int:
+		"""Precompute PCM and envelopes for any asset that changed since the last build. Returns the number rebuilt."""
+		os.makedirs(self.cache_dir, exist_ok=True)
+		manifest = self._read_manifest()
+		if manifest.get('format') != self._format_key():
+			force = True
+			manifest = {}
+		entries: Dict[str, float] = manifest.get('assets', {})
+
+		rebuilt = 0
+		for file_name in self._asset_files():
+			source_path = os.path.join(self.asset_dir, file_name)
+			mtime = os.path.getmtime(source_path)
+			pcm_path, env_path = self._cache_paths(file_name)
+			if not force and entries.get(file_name) == mtime and os.path.exists(pcm_path) and os.path.exists(env_path):
+				continue
+			try:
+				pcm = self.decode(source_path)
+				envelope = np.asarray(self.puppeteer.calculate_rms(pcm, self.sample_rate), dtype=np.float32)
+				np.save(pcm_path, pcm)
+				np.save(env_path, envelope)
+				entries[file_name] = mtime
+				rebuilt += 1
+			except Exception as e:
+				print(f"Error caching voice asset {file_name}: {e}")
+
+		with open(os.path.join(self.cache_dir, self.MANIFEST_NAME), "w") as f:
+			json.dump({'format': self._format_key(), 'assets': entries}, f)
+		return rebuilt
+
+	def load(self) -> None:
+		"""Memory-map every cached asset so playback only touches pages it actually plays."""
+		clips: Dict[str, VoiceClip] = {}
+		for file_name in self._asset_files():
+			pcm_path, env_path = self._cache_paths(file_name)
+			if not (os.path.exists(pcm_path) and os.path.exists(env_path)):
+				continue
+			try:
+				clips[file_name] = VoiceClip(
+					name=file_name,
+					pcm=np.load(pcm_path, mmap_mode='r'),
+					sample_rate=self.sample_rate,
+					envelope=np.load(env_path),
+				)
+			except Exception as e:
+				print(f"Error loading cached voice asset {file_name}: {e}")
+		self.clips = clips
+		print(f"Loaded {len(self.clips)} cached voice assets.")
+
+	def get(self, file_path: str) -> Optional[VoiceClip]:
+		return self.clips.get(os.path.basename(file_path))
+
+	def trim_bounds(self, pcm: np.ndarray, b_trim_start: bool, b_trim_end: bool, threshold: int = 300, pad_ms: int = 10) -> Tuple[int, int]:
+		"""Find the frame range left after stripping leading/trailing near-silence, so spliced clips sit right against each other."""
+		loud = np.flatnonzero(np.max(np.abs(pcm.astype(np.int32)), axis=1) > threshold)
+		if len(loud) == 0:
+			return 0, len(pcm)
+		pad = int(self.sample_rate * pad_ms / 1000)
+		start = max(0, int(loud[0]) - pad) if b_trim_start else 0
+		end = min(len(pcm), int(loud[-1]) + pad + 1) if b_trim_end else len(pcm)
+		return start, end
+
+	def render_sequence(self, clips: List[VoiceClip], crossfade_ms: int = 15) -> VoiceClip:
+		"""
+		Splice several clips into one PCM buffer with short linear crossfades, and merge their
+		envelopes on the same timeline, so a multi-clip read-out plays as a single stream.
+		"""
+		window_size = int(self.sample_rate * (self.puppeteer.interval_ms / 1000.0))
+		fade_frames = int(self.sample_rate * crossfade_ms / 1000)
+
+		pieces: List[np.ndarray] = []
+		piece_envelopes: List[np.ndarray] = []
+		for i, clip in enumerate(clips):
+			start, end = self.trim_bounds(clip.pcm, i > 0, i < len(clips) - 1)
+			pieces.append(np.asarray(clip.pcm[start:end]))
+			# Reuse the cached envelope, cut to the windows that survived trimming.
+			piece_envelopes.append(np.asarray(clip.envelope[start // window_size:(end + window_size - 1) // window_size]))
+
+		# Work out where each piece starts once neighbouring pieces overlap by the crossfade.
+		offsets: List[int] = []
+		position = 0
+		for i, piece in enumerate(pieces):
+			if i > 0:
+				position -= min(fade_frames, len(pieces[i - 1]), len(piece))
+			offsets.append(max(0, position))
+			position = offsets[-1] + len(piece)
+
+		mix = np.zeros((position, self.channels), dtype=np.float32)
+		envelope = np.zeros((position + window_size - 1) // window_size, dtype=np.float32)
+		for i, (piece, piece_envelope, offset) in enumerate(zip(pieces, piece_envelopes, offsets)):
+			gain = np.ones(len(piece), dtype=np.float32)
+			if i > 0:
+				fade_in = min(fade_frames, len(pieces[i - 1]), len(piece))
+				gain[:fade_in] = np.linspace(0.0, 1.0, fade_in, endpoint=False)
+			if i < len(pieces) - 1:
+				fade_out = min(fade_frames, len(piece), len(pieces[i + 1]))
+				if fade_out:
+					gain[len(piece) - fade_out:] *= np.linspace(1.0, 0.0, fade_out, endpoint=False)
+			mix[offset:offset + len(piece)] += piece.astype(np.float32) * gain[:, None]
+
+			start_window = offset // window_size
+			end_window = min(len(envelope), start_window + len(piece_envelope))
+			envelope[start_window:end_window] = np.maximum(envelope[start_window:end_window], piece_envelope[:end_window - start_window])
+
+		pcm = np.clip(mix, -32768, 32767).astype(np.int16)
+		name = "+".join(clip.name for clip in clips)
+		return VoiceClip(name=name, pcm=pcm, sample_rate=self.sample_rate, envelope=envelope)
+
+
+if __name__ == "__main__":
+	# Build step: python3 voice_asset_cache.py [--force]
+	import sys
+	from automated_puppeteering import AutomatedPuppeteering
+	asset_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "miscAudioAssets")
+	cache = VoiceAssetCache(asset_dir, AutomatedPuppeteering(None))
+	count = cache.build(force="--force" in sys.argv)
+	print(f"Rebuilt {count} voice assets in {cache.cache_dir}")
@@ -1,24 +1,29 @@
 import os
 import subprocess
-import pygame
 import time
+import threading
 from pydispatch import dispatcher
 from wifi_management import WifiManagement
 from system_info import SystemInfo
 from automated_puppeteering import AutomatedPuppeteering
+from voice_asset_cache import VoiceAssetCache
 from typing import Any, List
 
 class VoiceEventHandler:
-	def __init__(self, pygame_instance: Any, voice_input_instance: Any) -> None:
-		self.pygame = pygame_instance
+	def __init__(self, audio_engine: Any, voice_input_instance: Any) -> None:
+		self.audio_engine = audio_engine
 		self.voice_input_processor = voice_input_instance
-		self.puppeteer = AutomatedPuppeteering(pygame_instance)
+		self.puppeteer = AutomatedPuppeteering(audio_engine)
 
 		self.wifi_management = WifiManagement()
 		self.system_info = SystemInfo(False)
 
 		self.audio_path = os.path.join(os.path.dirname(__file__), "miscAudioAssets")
 
+		# Decode and analyze the bundled voice assets once, in the background, so read-outs don't pause between clips.
+		self.asset_cache = VoiceAssetCache(self.audio_path, self.puppeteer, audio_engine.sample_rate, audio_engine.channels)
+		threading.Thread(target=self.prepare_asset_cache, daemon=True).start()
+
 		self.commands = {
 			"PlaySong": self.play_song,
 			"Encore": self.play_encore,
@@ -53,11 +58,31 @@ class VoiceEventHandler:
 		else:
 			print(f"Unknown command: '{command}'")
 
+	def prepare_asset_cache(self) -> None:
+		try:
+			self.asset_cache.build()
+			self.asset_cache.load()
+		except Exception as e:
+			print(f"Voice asset cache unavailable: {e}")
+
 	def play_audio_sequence(self, audio_files: List[str]) -> None:
+		# When every clip is cached, splice them into one stream so the read-out sounds like one sentence.
+		clips = [self.asset_cache.get(file) for file in audio_files]
+		if len(clips) > 1 and all(clip is not None for clip in clips):
+			try:
+				self.puppeteer.play_clip_with_puppeting(self.asset_cache.render_sequence(clips))
+				return
+			except Exception as e:
+				print(f"Error rendering audio sequence, playing clips individually: {e}")
+
 		for file in audio_files:
 			try:
-				self.puppeteer.play_audio_with_puppeting(file)
-			except pygame.error as e:
+				clip = self.asset_cache.get(file)
+				if clip is not None:
+					self.puppeteer.play_clip_with_puppeting(clip)
+				else:
+					self.puppeteer.play_audio_with_puppeting(file)
+			except Exception as e:
 				print(f"Error playing {file}: {e}")
 
 	def play_song(self) -> None:
@@ -103,6 +128,7 @@ class VoiceEventHandler:
 		dispatcher.send(signal="keyEvent", key='s', val=1)
 		time.sleep(0.75)
 		dispatcher.send(signal="keyEvent", key='s', val=0)
+		dispatcher.send(signal="keyEvent", key='a', val=0)  # Release the turn so it doesn't block the operator's next press
 
 	def ai(self) -> None:
 		self.play_audio_sequence([f"{self.audio_path}/ai.ogg"])
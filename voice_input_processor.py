@@ -1,4 +1,3 @@
-from collections import deque
 from datetime import datetime
 import os
 import shutil
@@ -7,29 +6,33 @@ import openai
 import anthropic
 import pvporcupine
 import pvrhino
-import struct
-import subprocess
 import configparser
 import wave
 import tempfile
 import signal
 import threading
-import time
-import requests
 
-from google.cloud import speech
 from elevenlabs.client import ElevenLabs
 from elevenlabs import Voice, VoiceSettings
 from pydispatch import dispatcher
 from automated_puppeteering import AutomatedPuppeteering
-from typing import Any, Optional
+from audio_capture import AudioCapture, CaptureCursor
+from voice_activity import SpeechEndpointer, create_detector
+from speech_recognizer import SpeechRecognizer, create_recognizer_from_config
+from recognition_race import RecognitionRace, RecognitionResult
+from command_router import CommandRouter
+from response_cache import CachedResponse, ResponseCache
+from http_connections import HttpConnections, shared_connections
+from provider_router import ProviderRouter
+from local_tts import LocalTTS, SpeechStream
+from typing import Any, Optional, Tuple
 
 
 class VoiceInputProcessor:
-	def __init__(self, pygame_instance: Any, config_file: str = "config.cfg") -> None:
+	def __init__(self, audio_engine: Any, config_file: str = "config.cfg") -> None:
 		self.b_save_tts: bool = False  # Save TTS files to a directory for examining later for debug purposes.
-		self.pygame = pygame_instance
-		self.puppeteer = AutomatedPuppeteering(pygame_instance)
+		self.audio_engine = audio_engine
+		self.puppeteer = AutomatedPuppeteering(audio_engine)
 		self.config = self.load_config(config_file)
 
 		# PicoVoice and Google Speech-to-Text keys
@@ -37,6 +40,7 @@ class VoiceInputProcessor:
 		self.wakeword_path: str = self.config["PicoVoice"]["WakewordPath"]
 		self.rhino_context_path: str = self.config["PicoVoice"]["RhinoContextPath"]
 		self.google_cloud_key_path: str = self.config["SpeechToText"]["GoogleCloudKeyPath"]
+		self.stt_min_confidence: float = self.config.getfloat("SpeechToText", "MinConfidence", fallback=0.5)
 
 		base_path = os.path.dirname(os.path.realpath(__file__))
 		self.wakeword_path = os.path.join(base_path, self.wakeword_path)
@@ -45,11 +49,14 @@ class VoiceInputProcessor:
 
 		os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = self.google_cloud_key_path
 
+		# Every cloud provider shares one keep-alive connection pool.
+		self.connections: HttpConnections = shared_connections()
+
 		# OpenAI ChatGPT key
 		try:
 			self.openai_api_key: Optional[str] = self.config["ChatGPT"]["OpenAIKey"]
 			openai.api_key = self.openai_api_key
-			self.openai_client = openai.Client(api_key=self.openai_api_key)
+			self.openai_client = openai.Client(api_key=self.openai_api_key, http_client=self.connections.client)
 		except Exception:
 			self.openai_api_key = None
 
@@ -64,15 +71,40 @@ class VoiceInputProcessor:
 			# Anthropic Claude API key and model
 			self.anthropic_api_key: Optional[str] = self.config["Claude"]["AnthropicKey"]
 			self.anthropic_model: str = self.config["Claude"].get("AnthropicModel", "claude-sonnet-4-6")
-			self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key)
+			self.anthropic_client = anthropic.Anthropic(api_key=self.anthropic_api_key, http_client=self.connections.client)
 		except Exception:
 			self.anthropic_api_key = None
 
 		self.ai_context: str = self.config["AI"]["Context"]
+		self.response_cache: Optional[ResponseCache] = self.create_response_cache(base_path)
 
 		# ElevenLabs TTS keys
 		self.elevenlabs_key: str = self.config["TextToSpeech"]["ElevenLabsKey"]
 		self.elevenlabs_voice_id: str = self.config["TextToSpeech"]["ElevenLabsVoiceID"]
+		self.elevenlabs_client: Optional[ElevenLabs] = None
+		try:
+			self.elevenlabs_client = ElevenLabs(api_key=self.elevenlabs_key, httpx_client=self.connections.client)
+		except Exception as e:
+			print(f"ElevenLabs client unavailable: {e}")
+
+		# Open TLS connections to the configured providers now, rather than on the first question.
+		for key, url in ((self.anthropic_api_key, "https://api.anthropic.com"),
+						 (self.openai_api_key, "https://api.openai.com"),
+						 (self.deepseek_api_key, "https://api.deepseek.com"),
+						 (self.elevenlabs_key, "https://api.elevenlabs.io")):
+			if self._is_key_valid(key):
+				self.connections.register(url)
+		self.connections.warm_up()
+
+		# Piper stays loaded in its own worker so offline speech starts without reloading the model each time.
+		self.local_tts: LocalTTS = LocalTTS(os.path.join(base_path, "en_US-ryan-low.onnx"),
+											os.path.join(base_path, "en_US-ryan-low.json"))
+
+		# Latency- and error-aware choice between AI providers, and between TTS voices in order of preference.
+		self.llm_router: ProviderRouter = ProviderRouter(["Claude", "ChatGPT", "DeepSeek"])
+		self.tts_router: ProviderRouter = ProviderRouter(["ElevenLabs", "Piper"], b_prefer_order=True)
+		self.llm_hedge_seconds: float = self.config.getfloat("ProviderRouting", "HedgeSeconds", fallback=6.0)
+		self.tts_deadline_seconds: float = self.config.getfloat("ProviderRouting", "TTSDeadlineSeconds", fallback=5.0)
 
 		self.sample_rate: int = 16000
 
@@ -95,14 +127,16 @@ class VoiceInputProcessor:
 		except Exception:
 			print("Rhino access key or path not set in config.cfg")
 
-		self.pre_wakeword_buffer: deque = deque(maxlen=10)  # Store ~1 second of pre-wakeword audio
 		self.frame_length: int = self.porcupine.frame_length
 		self.frame_size: int = self.frame_length * 2
-		self.speech_client: Optional[speech.SpeechClient] = None
-		try:
-			self.speech_client = speech.SpeechClient()
-		except Exception:
-			print("Problem with GoogleCloudKeyPath in config.cfg")
+		self.pre_wakeword_frames: int = 10  # Include ~0.3 seconds of audio from before the wakeword
+		self.endpointer: SpeechEndpointer = self.create_endpointer()
+		# Streaming speech-to-text backend chosen by [SpeechToText] Engine in config.cfg.
+		self.recognizer: Optional[SpeechRecognizer] = create_recognizer_from_config(self.config, self.sample_rate)
+		if self.recognizer is None:
+			print("Speech-to-text unavailable. Check the [SpeechToText] section of config.cfg.")
+		self.b_partial_shown: bool = False  # Whether this utterance has already announced "transcribing"
+		self.command_router: CommandRouter = CommandRouter()  # Answers known phrasings locally, before the LLM
 
 		# Create a temporary directory
 		self.temp_dir: tempfile.TemporaryDirectory = tempfile.TemporaryDirectory()
@@ -113,6 +147,10 @@ class VoiceInputProcessor:
 
 		self.running: bool = True  # Control flag for the main thread
 
+		# One long-lived microphone stream; the wakeword stage follows it with its own cursor.
+		self.capture: AudioCapture = AudioCapture(self.sample_rate, self.frame_length)
+		self.wakeword_cursor: Optional[CaptureCursor] = None
+
 		# Start the assistant in its own thread
 		self.thread: threading.Thread = threading.Thread(target=self.run_thread, daemon=True)
 		self.thread.start()
@@ -125,6 +163,27 @@ class VoiceInputProcessor:
 		config.read(config_path)
 		return config
 
+	def create_response_cache(self, base_path: str) -> Optional[ResponseCache]:
+		"""Build the answer cache from the [ResponseCache] section of config.cfg."""
+		section = "ResponseCache"
+		if not self.config.getboolean(section, "Enabled", fallback=True):
+			return None
+		try:
+			return ResponseCache(
+				os.path.join(base_path, self.config.get(section, "CacheDir", fallback="responseCache")),
+				ttl_seconds=self.config.getfloat(section, "TTLHours", fallback=168) * 3600,
+				max_entries=self.config.getint(section, "MaxEntries", fallback=200),
+				max_megabytes=self.config.getfloat(section, "MaxMegabytes", fallback=100),
+				context=self.ai_context,
+				b_use_embeddings=self.config.getboolean(section, "UseEmbeddings", fallback=False),
+				similarity_threshold=self.config.getfloat(section, "SimilarityThreshold", fallback=0.9),
+				embedding_model=self.config.get(section, "EmbeddingModel", fallback="all-MiniLM-L6-v2"),
+				skip_words=self.config.get(section, "SkipWords", fallback="time, date, today, tomorrow, weather").replace(",", " ").split(),
+			)
+		except Exception as e:
+			print(f"Response cache disabled: {e}")
+			return None
+
 	def set_voice_command(self, command_id: str, value: Any = None) -> None:
 		self.voiceStatus = {
 			'id': command_id,
@@ -135,75 +194,99 @@ class VoiceInputProcessor:
 	def get_last_voice_command(self) -> Any:
 		return self.voiceStatus
 
-	def record_audio_stream(self) -> Optional[subprocess.Popen]:
-		"""Start an audio recording stream."""
-		command = [
-			"arecord",
-			"-D", "plughw:CARD=Device,DEV=0",
-			"-f", "S16_LE",
-			"-r", str(self.sample_rate),
-			"-c", "1",
-			"--buffer-size=1920"
-		]
-		try:
-			with open(os.devnull, 'w') as devnull:
-				self.process = subprocess.Popen(
-					command,
-					stdout=subprocess.PIPE,
-					stderr=subprocess.PIPE
-				)
-				return self.process
-		except Exception as e:
-			print(f"Error starting audio stream: {e}")
-			return None
+	def create_endpointer(self) -> SpeechEndpointer:
+		"""Build the end-of-speech detector from the [VoiceActivity] section of config.cfg."""
+		section = "VoiceActivity"
+		engine = self.config.get(section, "Engine", fallback="energy")
+		options = {}
+		if engine.lower() == "energy":
+			options["margin_db"] = self.config.getfloat(section, "SpeechMarginDb", fallback=10.0)
+			options["floor_rise_db"] = self.config.getfloat(section, "NoiseFloorRiseDbPerSecond", fallback=2.0)
+		elif engine.lower() == "webrtc":
+			options["aggressiveness"] = self.config.getint(section, "Aggressiveness", fallback=2)
+		detector = create_detector(engine, self.sample_rate, self.frame_length, **options)
+		return SpeechEndpointer(
+			detector,
+			hangover_seconds=self.config.getfloat(section, "HangoverSeconds", fallback=0.5),
+			start_timeout_seconds=self.config.getfloat(section, "StartTimeoutSeconds", fallback=5.0),
+			max_seconds=self.config.getfloat(section, "MaxUtteranceSeconds", fallback=10.0),
+			min_speech_seconds=self.config.getfloat(section, "MinSpeechSeconds", fallback=0.15),
+		)
+
+	def start_recognition(self) -> RecognitionRace:
+		"""Start Rhino and streaming speech-to-text racing each other on the coming utterance."""
+		transcriber = None
+		self.b_partial_shown = False
+		if self.recognizer is not None:
+			transcriber = self.recognizer.create_session()
+			transcriber.on_partial = self.on_partial_transcript
+		return RecognitionRace(self.rhino, transcriber, self.stt_min_confidence)
+
+	def on_partial_transcript(self, text: str) -> None:
+		"""The first partial starts the "transcribing" animations while the user is still talking."""
+		if not self.b_partial_shown:
+			self.b_partial_shown = True
+			self.set_voice_command("transcribing", text)
+		else:
+			self.set_voice_command("partialTranscript", text)
 
-	def process_audio_stream(self, process: subprocess.Popen) -> Optional[bytearray]:
-		"""Process audio for wakeword detection and transition seamlessly to intent capture."""
+	def process_audio_stream(self, cursor: CaptureCursor) -> Optional[Tuple[bytearray, RecognitionRace]]:
+		"""
+		Process audio for wakeword detection, then stream the utterance to the recognizers while it is
+		being spoken. Returns the utterance audio and the race, which may still be waiting on a result.
+		"""
 		wakeword_detected = False
-		intent_audio = bytearray()
-		silent_frames = 0
-		timeout_time = 5  # The initial default time (in seconds) between the wakeword and when speaking starts
-
-		while True:
-			chunk = process.stdout.read(self.frame_size)
-			if len(chunk) < self.frame_size:
-				break
-
-			self.pre_wakeword_buffer.append(chunk)
-			audio_frame = struct.unpack_from(f"{self.frame_length}h", chunk)
-
-			if not wakeword_detected and self.porcupine.process(audio_frame) >= 0:
-				print("Wakeword detected!")
-				self.set_voice_command("wakeWord")
-				timeout_time = 5
-				wakeword_detected = True
-				intent_audio.extend(b"".join(self.pre_wakeword_buffer))
-				self.pre_wakeword_buffer.clear()
-
-			if wakeword_detected:
-				intent_audio.extend(chunk)
-				max_silent_frames = int(self.sample_rate * timeout_time / self.frame_length)  # 1.5 seconds of silence
-
-				# Check for silence
-				rms = sum(x * x for x in audio_frame) / len(audio_frame)  # Root Mean Square
-				if rms < 500000:  # Silence threshold (adjustable)
-					silent_frames += 1
-				else:
-					timeout_time = 1.5
-					silent_frames = 0
-
-				if silent_frames > max_silent_frames:
-					print("User stopped speaking.")
-					process.terminate()
-					process.wait()
-					return intent_audio
-
-				# Stop after 10 seconds of audio regardless
-				if len(intent_audio) >= self.sample_rate * 10 * 2:
-					print(f"Maximum recording duration reached. Silence frames: {silent_frames}")
-					process.terminate()
-					process.wait()
-					return intent_audio
+		intent_start = 0
+		race: Optional[RecognitionRace] = None
+
+		while self.running:
+			# A zero-copy view of the next frame in the capture ring.
+			audio_frame = cursor.read(timeout=1.0)
+			if audio_frame is None:
+				if not self.capture.running:
+					if race is not None:
+						race.cancel()
+					return None
+				continue
+
+			if not wakeword_detected:
+				# Keep the noise floor current while waiting, so it is right the moment the wakeword lands.
+				self.endpointer.observe(audio_frame)
+				if self.porcupine.process(audio_frame) >= 0:
+					print("Wakeword detected!")
+					self.set_voice_command("wakeWord")
+					# Re-open any provider connections that went cold while the user is still talking.
+					self.connections.warm_up(b_only_idle=True)
+					wakeword_detected = True
+					self.endpointer.reset()
+					# Start the utterance a little before the wakeword, straight from the ring.
+					intent_start = max(self.capture.oldest_position(), cursor.position - 1 - self.pre_wakeword_frames)
+					race = self.start_recognition()
+					for position in range(intent_start, cursor.position):
+						race.feed(self.capture.frame_at(position, 0))
+				continue
+
+			race.feed(audio_frame)
+			if race.has_winner():
+				# Rhino recognized a command; no need to wait for the speaker to fall silent.
+				return self.capture.get_range(intent_start, cursor.position), race
+
+			result = self.endpointer.process(audio_frame)
+			if result == SpeechEndpointer.END_OF_SPEECH:
+				print("User stopped speaking.")
+			elif result == SpeechEndpointer.MAX_LENGTH:
+				print("Maximum recording duration reached.")
+			elif result == SpeechEndpointer.NO_SPEECH:
+				print("No speech after the wakeword.")
+				race.cancel()
+				self.set_voice_command("timeout")
+				return None
+			if result is not None:
+				race.finish()
+				return self.capture.get_range(intent_start, cursor.position), race
+
+		if race is not None:
+			race.cancel()
 		return None
 
 	def save_audio_to_file(self, audio_data: bytes, filename: str) -> str:
@@ -217,202 +300,193 @@ class VoiceInputProcessor:
 			wf.writeframes(audio_data)
 		return filepath
 
-	def transcribe_audio(self, audio_data: bytes) -> Optional[str]:
-		"""Send audio to Google Speech-to-Text."""
-		if isinstance(audio_data, bytearray):
-			audio_data = bytes(audio_data)
+	def request_chatgpt(self, text: str) -> str:
+		"""Ask ChatGPT and return its answer."""
+		response = self.openai_client.chat.completions.create(
+			model="gpt-4",
+			messages=[
+				{"role": "system", "content": self.ai_context},
+				{"role": "user", "content": text},
+			],
+		)
+		return response.choices[0].message.content
 
-		audio = speech.RecognitionAudio(content=audio_data)
-		config = speech.RecognitionConfig(
-			encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
-			sample_rate_hertz=self.sample_rate,
-			language_code="en-US",
+	def request_deepseek(self, text: str) -> str:
+		"""Ask DeepSeek and return its answer."""
+		headers = {
+			"Authorization": f"Bearer {self.deepseek_api_key}",
+			"Content-Type": "application/json",
+		}
+		data = {
+			"model": self.deepseek_model,
+			"messages": [
+				{"role": "system", "content": self.ai_context},
+				{"role": "user", "content": text},
+			],
+		}
+		response = self.connections.client.post(
+			"https://api.deepseek.com/v1/chat/completions",
+			headers=headers,
+			json=data,
 		)
-		try:
-			print("Sending audio to Google Speech-to-Text...")
-			response = self.speech_client.recognize(config=config, audio=audio)
-			if response.results:
-				transcript = response.results[0].alternatives[0].transcript
-				return transcript
-			else:
-				self.set_voice_command("noTranscription")
-				print("No transcription result from Google.")
-				return None
-		except Exception as e:
-			print(f"Error during transcription: {e}")
-			self.set_voice_command("error")
-			return None
+		response.raise_for_status()
+		return response.json()["choices"][0]["message"]["content"]
+
+	def request_claude(self, text: str) -> str:
+		"""Ask Claude (Anthropic) and return its answer."""
+		response = self.anthropic_client.messages.create(
+			model=self.anthropic_model,
+			max_tokens=1024,
+			system=self.ai_context,
+			messages=[
+				{"role": "user", "content": text},
+			],
+		)
+		return response.content[0].text
 
-	def send_to_chatgpt(self, text: str) -> Optional[str]:
-		"""Send text to ChatGPT and generate a response."""
-		print(f"Sending text to ChatGPT: {text}")
-		self.set_voice_command("llmSend", text)
-		try:
-			response = self.openai_client.chat.completions.create(
-				model="gpt-4",
-				messages=[
-					{"role": "system", "content": self.ai_context},
-					{"role": "user", "content": text},
-				],
-			)
-			chat_response = response.choices[0].message.content
-			self.set_voice_command("llmReceive", chat_response)
-			print(f"ChatGPT Response: {chat_response}")
-			# Generate and play TTS audio
-			self.generate_and_play_tts(chat_response)
-			return chat_response
-		except Exception as e:
-			self.set_voice_command("error")
-			print(f"Failed to get response from ChatGPT: {e}")
-			return None
+	def _is_key_valid(self, key: Optional[str]) -> bool:
+		"""Check whether an API key looks like a real key rather than a config placeholder."""
+		return bool(key) and "your" not in key
 
-	def send_to_deepseek(self, text: str) -> Optional[str]:
-		"""Send text to DeepSeek and generate a response."""
-		print(f"Sending text to DeepSeek: {text}")
-		self.set_voice_command("llmSend", text)
-		try:
-			headers = {
-				"Authorization": f"Bearer {self.deepseek_api_key}",
-				"Content-Type": "application/json",
-			}
-			data = {
-				"model": self.deepseek_model,
-				"messages": [
-					{"role": "system", "content": self.ai_context},
-					{"role": "user", "content": text},
-				],
-			}
-			response = requests.post(
-				"https://api.deepseek.com/v1/chat/completions",
-				headers=headers,
-				json=data,
-			)
-			response.raise_for_status()
-			deepseek_response = response.json()["choices"][0]["message"]["content"]
-			self.set_voice_command("llmReceive", deepseek_response)
-			print(f"DeepSeek Response: {deepseek_response}")
-			# Generate and play TTS audio
-			self.generate_and_play_tts(deepseek_response)
-			return deepseek_response
-		except Exception as e:
+	def send_to_ai(self, text: str) -> Optional[str]:
+		"""
+		Answer transcribed text with the fastest healthy AI provider that has a key configured,
+		hedging to the next one if it is slow, then speak the answer.
+		"""
+		cached = self.response_cache.get(text) if self.response_cache is not None else None
+		if cached is not None:
+			return self.play_cached_response(cached)
+
+		providers = {}
+		if self._is_key_valid(self.anthropic_api_key):
+			providers["Claude"] = lambda: self.request_claude(text)
+		if self._is_key_valid(self.openai_api_key):
+			providers["ChatGPT"] = lambda: self.request_chatgpt(text)
+		if self._is_key_valid(self.deepseek_api_key):
+			providers["DeepSeek"] = lambda: self.request_deepseek(text)
+		if not providers:
+			print("No valid AI provider API key configured in config.cfg.")
 			self.set_voice_command("error")
-			print(f"Failed to get response from DeepSeek: {e}")
 			return None
 
-	def send_to_claude(self, text: str) -> Optional[str]:
-		"""Send text to Claude (Anthropic) and generate a response."""
-		print(f"Sending text to Claude: {text}")
+		print(f"Sending text to AI: {text}")
 		self.set_voice_command("llmSend", text)
-		try:
-			response = self.anthropic_client.messages.create(
-				model=self.anthropic_model,
-				max_tokens=1024,
-				system=self.ai_context,
-				messages=[
-					{"role": "user", "content": text},
-				],
-			)
-			claude_response = response.content[0].text
-			self.set_voice_command("llmReceive", claude_response)
-			print(f"Claude Response: {claude_response}")
-			# Generate and play TTS audio
-			self.generate_and_play_tts(claude_response)
-			return claude_response
-		except Exception as e:
+		result = self.llm_router.call(providers, hedge_after=self.llm_hedge_seconds)
+		if result is None:
 			self.set_voice_command("error")
-			print(f"Failed to get response from Claude: {e}")
+			print("Failed to get a response from any AI provider.")
 			return None
 
-	def _is_key_valid(self, key: Optional[str]) -> bool:
-		"""Check whether an API key looks like a real key rather than a config placeholder."""
-		return bool(key) and "your" not in key
-
-	def send_to_ai(self, text: str) -> Optional[str]:
-		"""Route transcribed text to the first available AI provider: Claude, then OpenAI, then DeepSeek."""
-		if self._is_key_valid(self.anthropic_api_key):
-			return self.send_to_claude(text)
-		elif self._is_key_valid(self.openai_api_key):
-			return self.send_to_chatgpt(text)
-		elif self._is_key_valid(self.deepseek_api_key):
-			return self.send_to_deepseek(text)
-		print("No valid AI provider API key configured in config.cfg.")
-		self.set_voice_command("error")
-		return None
-
-	def generate_and_play_tts(self, text: str) -> None:
-		"""Generate audio using ElevenLabs TTS API and play directly as MP3."""
-		try:
-			client = ElevenLabs(api_key=self.elevenlabs_key)
-			stability = 0.7
-			similarity_boost = 0.4
-			style_exaggeration = 0.4
-			# Generate the audio (stream=True to receive a generator)
-			audio_generator = client.generate(
-				text=text,
-				stream=True,  # Stream the audio as a generator
-				model="eleven_multilingual_v2",
-				voice=Voice(
-					voice_id=self.elevenlabs_voice_id,
-					settings=VoiceSettings(
-						stability=stability,
-						similarity_boost=similarity_boost,
-						style=style_exaggeration,
-						use_speaker_boost=True,
-					),
+		provider, ai_response = result
+		self.set_voice_command("llmReceive", ai_response)
+		print(f"{provider} Response: {ai_response}")
+		# Generate and play TTS audio
+		self.generate_and_play_tts(ai_response, text)
+		return ai_response
+
+	def play_cached_response(self, cached: CachedResponse) -> str:
+		"""Answer a repeated question from the response cache, with no AI or TTS round trip."""
+		print(f"Cached Response ({cached.hits} hits): {cached.text}")
+		self.set_voice_command("llmReceive", cached.text)
+		self.set_voice_command("speaking")
+		self.puppeteer.play_audio_with_puppeting(self.response_cache.audio_path(cached))
+		self.set_voice_command("ttsComplete")
+		return cached.text
+
+	def synthesize_elevenlabs(self, text: str) -> str:
+		"""Generate speech with the ElevenLabs TTS API and return the path of the MP3."""
+		client = self.elevenlabs_client
+		if client is None:
+			raise RuntimeError("ElevenLabs client not created")
+		stability = 0.7
+		similarity_boost = 0.4
+		style_exaggeration = 0.4
+		# Generate the audio (stream=True to receive a generator)
+		audio_generator = client.generate(
+			text=text,
+			stream=True,  # Stream the audio as a generator
+			model="eleven_multilingual_v2",
+			voice=Voice(
+				voice_id=self.elevenlabs_voice_id,
+				settings=VoiceSettings(
+					stability=stability,
+					similarity_boost=similarity_boost,
+					style=style_exaggeration,
+					use_speaker_boost=True,
 				),
-			)
-			# Collect the audio chunks into a byte array
-			audio_data = b"".join(audio_generator)
-			# Save the audio as an MP3 file in the temporary directory
-			temp_audio_file = os.path.join(self.temp_dir.name, "tts_audio.mp3")
-			with open(temp_audio_file, "wb") as f:
-				f.write(audio_data)
-			# Use the AutomatedPuppeteering class to play the MP3 with puppeting
-			self.set_voice_command("speaking")
-			self.puppeteer.play_audio_with_puppeting(temp_audio_file)
+			),
+		)
+		# Collect the audio chunks into a byte array
+		audio_data = b"".join(audio_generator)
+		# Save the audio as an MP3 file in the temporary directory
+		temp_audio_file = os.path.join(self.temp_dir.name, "tts_audio.mp3")
+		with open(temp_audio_file, "wb") as f:
+			f.write(audio_data)
+		return temp_audio_file
+
+	def synthesize_piper(self, text: str) -> SpeechStream:
+		"""Start speaking locally with the resident Piper voice. Returns once the first sentence is ready."""
+		stream = self.local_tts.stream(text)
+		stream.wait_for_audio()
+		return stream
+
+	def generate_and_play_tts(self, text: str, question: Optional[str] = None) -> None:
+		"""
+		Speak text with ElevenLabs, falling back to Piper if ElevenLabs fails, has been failing, or
+		misses the TTS deadline. When the text answers a question and ElevenLabs spoke it, the answer
+		and its audio are added to the response cache; the Piper fallback is never cached, so one
+		outage doesn't leave the offline voice answering that question until the entry expires.
+		"""
+		voices = {"Piper": lambda: self.synthesize_piper(text)}
+		if self.elevenlabs_client is not None:
+			voices["ElevenLabs"] = lambda: self.synthesize_elevenlabs(text)
+		# A Piper stream that loses the hedge would otherwise keep the local voice busy synthesizing it.
+		result = self.tts_router.call(voices, hedge_after=self.tts_deadline_seconds,
+									  discard=lambda voice, audio: audio.cancel() if isinstance(audio, SpeechStream) else None)
+		if result is None:
+			print("No text-to-speech engine produced audio.")
+			self.set_voice_command("error")
+			return
+		voice, audio = result
+		if voice != "ElevenLabs":
+			print(f"Using {voice} for tts.")
+
+		# Use the AutomatedPuppeteering class to play the audio with puppeting
+		self.set_voice_command("speaking")
+		if isinstance(audio, SpeechStream):
+			# Local speech plays sentence by sentence while the rest is still being synthesized.
+			self.puppeteer.perform_stream(audio, audio.sample_rate)
 			self.set_voice_command("ttsComplete")
-			# Save the TTS audio file for later examination if desired.
-			if self.b_save_tts:
-				save_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_saved")
-				os.makedirs(save_dir, exist_ok=True)
-				timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-				file_extension = os.path.splitext(temp_audio_file)[1]
-				new_filename = f"tts_{timestamp}{file_extension}"
-				dest_path = os.path.join(save_dir, new_filename)
-				shutil.copy(temp_audio_file, dest_path)
-		except Exception as e:
-			print("Elevenlabs not functional. Using Piper instead for tts.")
-			print(e)
-			script_dir = os.path.dirname(os.path.realpath(__file__))
-			piper_model = os.path.join(script_dir, "en_US-ryan-low.onnx")
-			piper_config = os.path.join(script_dir, "en_US-ryan-low.json")
-			temp_audio_file = os.path.join(self.temp_dir.name, "tts_audio.wav")
-			subprocess.run(
-				[
-					"piper",
-					"-m", piper_model,
-					"-c", piper_config,
-					"-f", temp_audio_file,
-				],
-				input=text,
-				text=True,
-				check=True,
-			)
+			if audio.error is not None:
+				print(f"Local TTS stopped early: {audio.error}")
+				return
+			if not self.b_save_tts:
+				return
+			temp_audio_file = audio.save_wav(os.path.join(self.temp_dir.name, "tts_audio.wav"))
+		else:
+			temp_audio_file = audio
 			self.puppeteer.play_audio_with_puppeting(temp_audio_file)
+			self.set_voice_command("ttsComplete")
+		if question is not None and self.response_cache is not None and voice == "ElevenLabs":
+			self.response_cache.put(question, text, temp_audio_file)
+		# Save the TTS audio file for later examination if desired.
+		if self.b_save_tts:
+			save_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_saved")
+			os.makedirs(save_dir, exist_ok=True)
+			timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+			file_extension = os.path.splitext(temp_audio_file)[1]
+			new_filename = f"tts_{timestamp}{file_extension}"
+			dest_path = os.path.join(save_dir, new_filename)
+			shutil.copy(temp_audio_file, dest_path)
 
 	def shutdown(self, *args: Any) -> None:
 		"""Clean up resources and terminate gracefully."""
 		self.running = False  # Stop the thread's loop
 		try:
-			if hasattr(self, 'process') and self.process is not None:
-				self.process.terminate()
-				for _ in range(50):  # Wait up to 5 seconds for termination
-					if self.process.poll() is not None:
-						break
-					time.sleep(0.1)
-				else:
-					self.process.kill()
-				self.process = None
+			self.llm_router.shutdown()
+			self.tts_router.shutdown()
+			self.local_tts.shutdown()
+			self.capture.shutdown()
 			self.porcupine.delete()
 			self.rhino.delete()
 			self.temp_dir.cleanup()
@@ -421,6 +495,15 @@ class VoiceInputProcessor:
 
 	def run_thread(self) -> None:
 		"""Run the assistant's main loop in a separate thread."""
+		if not AudioCapture.has_microphone():
+			print("No microphone detected. Exiting voice assistant.")
+			self.set_voice_command("micNotFound")
+			self.running = False
+			return
+
+		# The microphone stays open from here on; utterances are cut out of the ring buffer.
+		self.capture.start()
+		self.wakeword_cursor = self.capture.cursor()
 		while self.running:
 			try:
 				self.run()
@@ -429,86 +512,63 @@ class VoiceInputProcessor:
 
 	def run(self) -> None:
 		"""Main loop to handle wakeword detection and audio processing."""
-		mic_check_command = ["arecord", "-l"]
-		try:
-			result = subprocess.run(
-				mic_check_command,
-				stdout=subprocess.PIPE,
-				stderr=subprocess.PIPE,
-				text=True,
-			)
-			if "card" not in result.stdout.lower():
-				print("No microphone detected. Exiting voice assistant.")
-				self.set_voice_command("micNotFound")
-				self.running = False
-				return
-		except Exception as e:
-			print(f"Error checking microphone: {e}")
-			self.set_voice_command("micNotFound")
-			self.running = False
-			return
-
 		self.set_voice_command("idle")
 		print("Waiting for 'Hey chef' wakeword...")
-		stream_process = self.record_audio_stream()
-		if not stream_process:
-			print("Failed to start audio stream.")
+
+		# The wakeword cursor carries on from where the last utterance ended, so nothing said meanwhile is lost.
+		utterance = self.process_audio_stream(self.wakeword_cursor)
+		if utterance is None:
 			return
+		intent_audio, race = utterance
+
+		self.save_audio_to_file(intent_audio, "speech.wav")
 
-		intent_audio = self.process_audio_stream(stream_process)
-		if intent_audio is None:
+		if not race.has_winner() and not self.b_partial_shown:
+			print("No intent detected yet. Waiting for the transcript...")
+			self.b_partial_shown = True
+			self.set_voice_command("transcribing")
+		result: Optional[RecognitionResult] = race.wait(timeout=10)
+
+		if result is not None and result.source == "intent":
+			print(f"Intent detected: {result.intent}")
+			print(f"Slots: {result.slots}")
+			self.set_voice_command("command", result.intent)
 			return
 
-		trim_frames = int(self.sample_rate * 0.1 * 2)  # 100 ms worth of frames
-		if len(intent_audio) > trim_frames:
-			intent_audio = intent_audio[trim_frames:]
-
-		filepath = self.save_audio_to_file(intent_audio, "speech_trimmed.wav")
-
-		if self.rhino is not None:
-			frame_length = self.rhino.frame_length
-			frame_size = frame_length * 2
-			for i in range(0, len(intent_audio), frame_size):
-				frame = intent_audio[i : i + frame_size]
-				if len(frame) == frame_size:
-					audio_frame = struct.unpack_from(f"{frame_length}h", frame)
-					if self.rhino.process(audio_frame):
-						inference = self.rhino.get_inference()
-						if inference.is_understood:
-							print(f"Intent detected: {inference.intent}")
-							print(f"Slots: {inference.slots}")
-							self.set_voice_command("command", inference.intent)
-							return
-
-		print("No intent detected. Transcribing audio...")
-		self.set_voice_command("transcribing")
-		transcription = self.transcribe_audio(intent_audio)
+		transcription = result.text if result is not None else None
 		if transcription:
-			lower_transcript = transcription.lower()
-			parts = transcription.strip().split(maxsplit=1)
-			print(parts)
-			if parts and parts[0].lower() == "say" and len(parts) > 1:
-				# If the first word was "say", we just repeat the rest of the sentence.
-				dispatcher.send(signal="webTTSEvent", val=parts[1])
-			elif "your ip address" in lower_transcript:
-				self.set_voice_command("command", "IPAddress")
-			elif "your wi-fi network" in lower_transcript:
-				self.set_voice_command("command", "WifiNetwork")
-			elif "activate hotspot" in lower_transcript:
-				self.set_voice_command("command", "HotspotStart")
-			elif "deactivate hotspot" in lower_transcript:
-				self.set_voice_command("command", "HotspotEnd")
-			elif lower_transcript in ["stop", "stop singing", "stop show"]:
-				dispatcher.send(signal="showStop")
-			else:
-				self.send_to_ai(transcription)
+			self.route_transcript(transcription)
 		else:
+			if race.transcriber is not None and race.transcriber.error is not None:
+				self.set_voice_command("error")
+			else:
+				print("No transcription result.")
+				self.set_voice_command("noTranscription")
 			self.set_voice_command("timeout")
 
+	def route_transcript(self, transcription: str) -> None:
+		"""Handle a transcript locally if it matches the command table, otherwise ask the AI."""
+		print(f"Transcript: {transcription}")
+		match = self.command_router.match(transcription)
+		if match is None:
+			self.send_to_ai(transcription)
+			return
+
+		print(f"Matched local command: {match.rule.name} {match.slots}")
+		if match.rule.action == "say":
+			# Repeat back whatever followed "say".
+			dispatcher.send(signal="webTTSEvent", val=match.slots.get("text", ""))
+		elif match.rule.action == "signal":
+			dispatcher.send(signal=match.rule.name)
+		else:
+			self.set_voice_command("command", match.rule.name)
+
 
 if __name__ == "__main__":
+	from audio_engine import MIXER_BUFFER_FRAMES, AudioEngine
 	try:
-		assistant = VoiceInputProcessor(pygame_instance=pygame)
+		pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=MIXER_BUFFER_FRAMES)
+		assistant = VoiceInputProcessor(audio_engine=AudioEngine(pygame))
 		# Keep the main thread alive while the assistant runs
 		while assistant.thread.is_alive():
 			assistant.thread.join(0.1)
@@ -2,10 +2,14 @@ import os
 import socket
 import threading
 import logging
-from flask import Flask, request, Response
+from flask import Flask, request, Response, jsonify
 from flask_socketio import SocketIO
 from pydispatch import dispatcher
-from typing import Any
+from typing import Any, Callable, Optional
+from key_protocol import KeyProtocol
+from broadcast_hub import BroadcastHub
+from static_assets import StaticAssets
+from sequence_scheduler import SequenceScheduler
 
 # Turn off extra log messages
 log = logging.getLogger('werkzeug')
@@ -19,20 +23,77 @@ socketio = SocketIO(app, async_mode='threading', ping_timeout=30, logger=False,
 
 
 class WebServer:
+	key_protocol: Optional[KeyProtocol] = None  # Decodes binary key messages straight into the movement table
+	hub: Optional[BroadcastHub] = None  # Sends each client only the topics that changed
+	assets: Optional[StaticAssets] = None  # Pre-compressed, ETagged copies of everything in webpage/
+	sequences: Optional[SequenceScheduler] = None  # Runs timed sequences posted to /api/sequences
+
 	@app.route("/")
 	def index() -> Response:
-		return app.send_static_file('index.html')
+		return WebServer.send_asset('index.html')
+
+	@staticmethod
+	def send_asset(path: str) -> Response:
+		result = WebServer.assets.respond(path, request.args.get('v'), request.headers)
+		if result is None:
+			return Response("Not Found", status=404)
+		body = result.chunks() if result.file_path else result.body
+		return Response(body, status=result.status, headers=result.headers)
 
 	def broadcast(self, signal_id: str, data: Any) -> None:
+		WebServer.hub.publish(signal_id, data)
+
+	def broadcast_changes(self, signal_id: str, changes: dict) -> None:
+		WebServer.hub.update(signal_id, changes)
+
+	def emit_to(self, signal_id: str, data: Any, sid: str, callback: Callable[..., None]) -> None:
+		with app.app_context():
+			socketio.emit(signal_id, data, to=sid, callback=callback)
+
+	def emit_all(self, signal_id: str, data: Any) -> None:
+		"""Emit straight to every client, bypassing the hub, for streams that pace themselves."""
 		with app.app_context():
 			try:
-				socketio.emit(signal_id, data, broadcast=True)
+				socketio.emit(signal_id, data)
 			except Exception as e:
 				print(f"Broadcast error: {e}")
 
+	@app.route('/api/sequences', methods=['GET', 'POST'])
+	def sequences_endpoint() -> Response:
+		if WebServer.sequences is None:
+			return jsonify(error="Sequence API unavailable"), 503
+		if request.method == 'GET':
+			return jsonify(WebServer.sequences.statuses())
+		try:
+			job = WebServer.sequences.submit(request.get_json(force=True, silent=True))
+		except ValueError as e:
+			return jsonify(error=str(e)), 400
+		except RuntimeError as e:
+			return jsonify(error=str(e)), 429
+		return jsonify(job.status()), 201, {'Location': f"/api/sequences/{job.id}"}
+
+	@app.route('/api/sequences/<job_id>', methods=['GET', 'DELETE'])
+	def sequence_endpoint(job_id: str) -> Response:
+		if WebServer.sequences is None:
+			return jsonify(error="Sequence API unavailable"), 503
+		job = WebServer.sequences.cancel(job_id) if request.method == 'DELETE' else WebServer.sequences.get(job_id)
+		if job is None:
+			return jsonify(error="No such sequence"), 404
+		return jsonify(job.status())
+
 	@app.route('/<path:path>')
 	def static_proxy(path: str) -> Response:
-		return app.send_static_file(path)
+		return WebServer.send_asset(path)
+
+	@socketio.on('connect')
+	def client_connect(auth: Any = None) -> None:
+		WebServer.hub.add_client(request.sid)
+
+	@socketio.on('disconnect')
+	def client_disconnect(*args: Any) -> None:
+		WebServer.hub.remove_client(request.sid)
+		if WebServer.key_protocol:
+			WebServer.key_protocol.release_source(f"web:{request.sid}")
 
 	@socketio.on('onConnect')
 	def connect_event(msg: Any) -> None:
@@ -65,7 +126,17 @@ class WebServer:
 
 	@socketio.on('onKeyPress')
 	def web_key_event(data: dict) -> None:
-		dispatcher.send(signal="keyEvent", key=data["keyVal"], val=int(data["val"]))
+		dispatcher.send(signal="keyEvent", key=data["keyVal"], val=int(data["val"]), source=f"web:{request.sid}")
+
+	@socketio.on('onKeyBytes')
+	def web_key_bytes_event(data: bytes) -> None:
+		if WebServer.key_protocol:
+			WebServer.key_protocol.apply_events(data, f"web:{request.sid}")
+
+	@socketio.on('onPose')
+	def web_pose_event(data: bytes) -> None:
+		if WebServer.key_protocol:
+			WebServer.key_protocol.apply_pose(data, f"web:{request.sid}")
 
 	@socketio.on('onConnectToWifi')
 	def connect_to_wifi(data: dict) -> None:
@@ -80,13 +151,22 @@ class WebServer:
 	def web_tts_submit(inputText: str) -> None:
 		dispatcher.send(signal="webTTSEvent", val=inputText)
 
-	def __init__(self) -> None:
+	def __init__(self, broadcast_tick_seconds: float = 0.1) -> None:
+		WebServer.hub = BroadcastHub(self.emit_to, broadcast_tick_seconds)
+		WebServer.assets = StaticAssets(app.static_folder, os.path.join(app.root_path, 'webpageCache'))
+
 		# Create a thread for HTTP server only
 		self.threads: list[threading.Thread] = []
 		http_thread = threading.Thread(target=self.run_http, daemon=True)
 		self.threads.append(http_thread)
 		http_thread.start()
 
+	def set_key_protocol(self, key_protocol: KeyProtocol) -> None:
+		WebServer.key_protocol = key_protocol
+
+	def set_sequence_scheduler(self, sequences: SequenceScheduler) -> None:
+		WebServer.sequences = sequences
+
 	def run_http(self) -> None:
 		try:
 			print("Starting HTTP server on port 80...")
@@ -96,7 +176,7 @@ class WebServer:
 
 	def shutdown(self) -> None:
 		print("Shutting down server...")
-		# Implement shutdown logic if needed.
+		WebServer.hub.shutdown()
 
 
 if __name__ == "__main__":
@@ -12,6 +12,27 @@ socket.on('connect', () => {
 	socket.emit('onConnect', { data: "I'm connected!" });
 });
 
+// Broadcast topics arrive as {v: value}, or as {d: changedFields, r: removedFields} for objects that only
+// partly changed. Each frame is acknowledged so the server knows this page is ready for the next one.
+const topicState = {};
+
+function onTopic(topic, handler) {
+	socket.on(topic, (frame, ack) => {
+		if ('v' in frame) {
+			topicState[topic] = frame.v;
+		} else {
+			const state = Object.assign({}, topicState[topic], frame.d);
+			frame.r.forEach(field => delete state[field]);
+			topicState[topic] = state;
+		}
+		if (ack) {
+			ack();
+		}
+		const value = topicState[topic];
+		handler(value && value.constructor === Object ? Object.assign({}, value) : value);
+	});
+}
+
 /**
  * Truncate a string to a specified maximum length, adding ellipsis if truncated.
  * @param {string} str - The string to truncate.
@@ -59,7 +80,7 @@ function handleMobileKeypadVisibility() {
 let bHotspotActive = false;
 
 // Update system information displayed on the page
-socket.on('systemInfo', (msg) => {
+onTopic('systemInfo', (msg) => {
 	bHotspotActive = msg.hotspot_status;
 	if (bHotspotActive === true) {
 		setHotspotLinkText("Deactivate Hotspot");
@@ -76,6 +97,7 @@ socket.on('systemInfo', (msg) => {
 			RAM: ${msg.ram}%<br>
 			Disk Usage: ${msg.disk}%<br>
 			Temp: ${msg.temperature}°C<br>
+			Suppressed Inputs: ${msg.suppressed_inputs}<br>
 		</p>
 	`;
 	const sysInfoElement = document.getElementById("sysInfo");
@@ -95,6 +117,51 @@ socket.on('systemInfo', (msg) => {
 	}
 });
 
+// Live valve state: each frame is the GPIO expanders' output latches, one bit per valve.
+let valveLayout = [];
+let valveIndicators = [];
+
+onTopic('valveLayout', (layout) => {
+	valveLayout = layout;
+	const container = document.getElementById('valveState');
+	if (!container) {
+		console.warn('Valve State element not found!');
+		return;
+	}
+	container.innerHTML = '';
+	valveIndicators = layout.map(movement => {
+		const row = document.createElement('div');
+		const indicator = document.createElement('span');
+		indicator.textContent = '\u25CF ';
+		row.appendChild(indicator);
+		row.appendChild(document.createTextNode(movement.description));
+		container.appendChild(row);
+		return indicator;
+	});
+});
+
+function isLatchBitSet(latches, bit) {
+	return bit >= 0 && (latches[bit >> 3] >> (bit & 7)) & 1;
+}
+
+socket.on('valveState', (buffer) => {
+	const latches = new Uint8Array(buffer);
+	valveLayout.forEach((movement, index) => {
+		const indicator = valveIndicators[index];
+		if (!indicator) {
+			return;
+		}
+		// pin1 drives the movement, pin2 (where fitted) drives it back the other way.
+		let color = '#555';
+		if (isLatchBitSet(latches, movement.pin1)) {
+			color = '#4c4';
+		} else if (isLatchBitSet(latches, movement.pin2)) {
+			color = '#c84';
+		}
+		indicator.style.color = color;
+	});
+});
+
 /**
  * Update the voice command status displayed on the page.
  * @param {string} id - The status identifier.
@@ -159,7 +226,7 @@ socket.on('voiceCommandUpdate', ({ id, value }) => updateVoiceCommandStatus(id,
 
 // Handle show list loading
 let showList = [];
-socket.on('showListLoaded', (data) => {
+onTopic('showListLoaded', (data) => {
 	showList = ["-- Select A Show! --", ...data];
 
 	const dropdown = document.querySelector('select[name="Show List"]');
@@ -222,12 +289,48 @@ function setupShowControlButtons() {
 	}
 }
 
+// Binary key events: one byte per event, the low 7 bits index the server's key table and the high bit is the state.
+let keyTable = {};
+let pendingKeyBytes = [];
+
+onTopic('keyTable', (keys) => {
+	keyTable = {};
+	keys.forEach((key, index) => { keyTable[key] = index; });
+});
+
+function flushKeyBytes() {
+	socket.emit('onKeyBytes', new Uint8Array(pendingKeyBytes).buffer);
+	pendingKeyBytes = [];
+}
+
 // Simplified key press handling (MIDI and gamepad code removed)
 function sendKey(key, value) {
-	if (bInvertHeadNod && key.toLowerCase() === 's') {
+	key = key.toLowerCase();
+	if (bInvertHeadNod && key === 's') {
 		value = 1 - value;
 	}
-	socket.emit('onKeyPress', { keyVal: key.toLowerCase(), val: value });
+	const index = keyTable[key];
+	if (index === undefined) {
+		socket.emit('onKeyPress', { keyVal: key, val: value });
+		return;
+	}
+	// Events from the same input burst (several fingers at once) go out together in one message.
+	if (pendingKeyBytes.length === 0) {
+		queueMicrotask(flushKeyBytes);
+	}
+	pendingKeyBytes.push(index | (value ? 0x80 : 0));
+}
+
+// Send the whole pose as a bitmask over the key table (bit i in byte i >> 3).
+function sendPose(keys) {
+	const pose = new Uint8Array(Math.ceil(Object.keys(keyTable).length / 8));
+	keys.forEach(key => {
+		const index = keyTable[key.toLowerCase()];
+		if (index !== undefined) {
+			pose[index >> 3] |= 1 << (index & 7);
+		}
+	});
+	socket.emit('onPose', pose.buffer);
 }
 
 // Handle keyboard events
@@ -262,6 +365,14 @@ function doKeyUp(event) {
 document.addEventListener('keydown', doKeyDown);
 document.addEventListener('keyup', doKeyUp);
 
+// Key releases are lost while the page is in the background, so release everything held when it loses focus.
+window.addEventListener('blur', () => {
+	if (down.size > 0) {
+		down.clear();
+		sendPose(bInvertHeadNod ? ['s'] : []);
+	}
+});
+
 // Mode Handling (Mirrored & Retro)
 function setupModeCheckboxes() {
 	const mirroredModeCheckbox = document.getElementById('mirroredModeCheckbox');
@@ -528,7 +639,7 @@ let wifiSSIDs = [];
 let selectedSSID = null;
 
 
-socket.on('wifiScan', function(data){
+onTopic('wifiScan', function(data){
     wifiSSIDs = data
 });
 
@@ -2,13 +2,14 @@ import configparser
 import os
 import subprocess
 import socket
-import requests
+import httpx
 import re
 import threading
 import pywifi
 import time
 from pywifi import const
 from typing import Optional, List, Dict, Any
+from http_connections import shared_connections
 
 class WifiManagement:
 	def __init__(self, config_file: str = "config.cfg") -> None:
@@ -259,9 +260,10 @@ dhcp-range=192.168.4.2,192.168.4.20,255.255.255.0,24h
 	def is_internet_available(self, url: str = "https://www.google.com", timeout: int = 5) -> bool:
 		"""Check if there is a valid internet connection."""
 		try:
-			response = requests.head(url, timeout=timeout)
+			# Reuses the shared keep-alive pool, so a repeat check doesn't need a new TLS handshake.
+			response = shared_connections().client.head(url, timeout=timeout)
 			return response.status_code == 200
-		except requests.RequestException:
+		except httpx.HTTPError:
 			return False
 
 	def get_wifi_access_points(self) -> Optional[List[Dict[str, Any]]]: